@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from kombu import Queue
 
 # Load environment variables from .env file
 load_dotenv()
@@ -55,6 +56,7 @@ AUTH_USER_MODEL = 'core.User'
 
 
 MIDDLEWARE = [
+    "core.jobs.CorrelationIdMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -138,6 +140,26 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Every log line carries the correlation id of the request or task it belongs to
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'correlation_id': {'()': 'core.jobs.CorrelationIdFilter'},
+    },
+    'formatters': {
+        'default': {'format': '%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'filters': ['correlation_id'],
+            'formatter': 'default',
+        },
+    },
+    'root': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')},
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -166,4 +188,63 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Workers log through LOGGING above, with correlation ids
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
+
+# Task routing: interactive /api/compile/ runs must not queue behind graded
+# submissions, and bulk rejudges must not starve either. Workers pick their
+# queues through the profiles in start-celery.sh.
+CELERY_TASK_QUEUES = (
+    Queue('interactive', routing_key='interactive'),
+    Queue('judge', routing_key='judge'),
+    Queue('rejudge', routing_key='rejudge'),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'interactive'
+CELERY_TASK_ROUTES = {
+    'core.tasks.run_code_job': {'queue': 'interactive', 'priority': 0},
+    'core.tasks.evaluate_submission': {'queue': 'judge', 'priority': 3},
+    'core.tasks.rejudge_problem': {'queue': 'rejudge', 'priority': 6},
+    'core.tasks.reconcile_leaderboards': {'queue': 'rejudge', 'priority': 9},
+}
+# Periodic tasks, sent by `celery -A backend beat` (CELERY_WORKER_PROFILE=beat in start-celery.sh)
+LEADERBOARD_RECONCILE_INTERVAL = int(os.environ.get('LEADERBOARD_RECONCILE_INTERVAL', 3600))
+CELERY_BEAT_SCHEDULE = {
+    'reconcile-leaderboards': {
+        'task': 'core.tasks.reconcile_leaderboards',
+        'schedule': LEADERBOARD_RECONCILE_INTERVAL,
+    },
+}
+# Redis transport: priority 0 is served first; bucket priorities into 4 lists per queue
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': [0, 3, 6, 9],
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+# Executions are long and uneven: never hoard tasks behind a busy child process
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.environ.get('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+CELERY_TASK_ACKS_LATE = True
+
+# Redis for shared state outside Celery (execution limiter, caches, pub/sub)
+REDIS_URL = os.environ.get('REDIS_URL', CELERY_BROKER_URL)
+
+# Execution backpressure across all web processes and replicas
+EXECUTION_GLOBAL_LIMIT = int(os.environ.get('EXECUTION_GLOBAL_LIMIT', 20))
+EXECUTION_USER_LIMIT = int(os.environ.get('EXECUTION_USER_LIMIT', 2))
+# Leases of running tasks not renewed within this many seconds (crashed worker) are reclaimed
+EXECUTION_LEASE_TTL = int(os.environ.get('EXECUTION_LEASE_TTL', 120))
+# Lifetime of a new lease, which has to last while its task waits in the queue
+EXECUTION_QUEUE_TTL = int(os.environ.get('EXECUTION_QUEUE_TTL', 900))
+# Retry-After hint sent with 429 responses
+EXECUTION_RETRY_AFTER = int(os.environ.get('EXECUTION_RETRY_AFTER', 2))
+
+# Judging
+# Stop judging a submission at its first failing test case
+JUDGE_FAIL_FAST = os.environ.get('JUDGE_FAIL_FAST', 'true').lower() == 'true'
+# Test cases of one submission judged at once; 0 means one per CPU available to the worker
+# (executors may allow fewer, see Executor.max_parallel_runs)
+JUDGE_PARALLELISM = int(os.environ.get('JUDGE_PARALLELISM', 0))
+# Pin each parallel run to its own core so runs do not compete for one
+JUDGE_PIN_CPUS = os.environ.get('JUDGE_PIN_CPUS', 'false').lower() == 'true'
+# Executor submissions are judged on (core.executors.EXECUTORS): subprocess, kubernetes-job or kubernetes-pool
+JUDGE_EXECUTOR = os.environ.get('JUDGE_EXECUTOR', 'subprocess')
 
@@ -1,15 +1,65 @@
+from django import forms
 from django.contrib import admin
 from .models import Problem, TestCase, Submission, User
 
+class TestCaseForm(forms.ModelForm):
+    """
+    Test data is uploaded as files (or pasted as text) and stored in the blob store
+    """
+    input_file = forms.FileField(required=False)
+    input_text = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}), strip=False)
+    expected_file = forms.FileField(required=False)
+    expected_text = forms.CharField(required=False, widget=forms.Textarea(attrs={'rows': 3}), strip=False)
+
+    class Meta:
+        model = TestCase
+        fields = ['is_hidden']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for name in ('input', 'expected'):
+            given = cleaned_data.get(f'{name}_file') or cleaned_data.get(f'{name}_text')
+            if not given and not getattr(self.instance, f'{name}_blob'):
+                self.add_error(f'{name}_file', 'Upload a file or enter the text.')
+        return cleaned_data
+
+    def save(self, commit=True):
+        test_case = super().save(commit=False)
+        input_source = self.cleaned_data.get('input_file') or self.cleaned_data.get('input_text')
+        if input_source:
+            test_case.set_input(input_source)
+        expected_source = self.cleaned_data.get('expected_file') or self.cleaned_data.get('expected_text')
+        if expected_source:
+            test_case.set_expected_output(expected_source)
+        if commit:
+            test_case.save()
+        return test_case
+
 class TestCaseInline(admin.TabularInline):  # or admin.StackedInline for a different look
     model = TestCase
+    form = TestCaseForm
+    readonly_fields = ('input_blob', 'input_size', 'expected_blob', 'expected_size')
     extra = 1  # Number of empty forms to display
 
 @admin.register(Problem)
 class ProblemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'difficulty')
+    list_display = ('id', 'title', 'difficulty', 'checker')
     inlines = [TestCaseInline]
+    actions = ['rejudge_submissions']
+
+    @admin.action(description='Rejudge all submissions')
+    def rejudge_submissions(self, request, queryset):
+        from .tasks import rejudge_problem
+        for problem in queryset:
+            rejudge_problem.delay(problem.id)
+        self.message_user(request, f'Queued rejudge for {queryset.count()} problem(s).')
+
+@admin.register(TestCase)
+class TestCaseAdmin(admin.ModelAdmin):
+    form = TestCaseForm
+    list_display = ('id', 'problem', 'is_hidden', 'input_size', 'expected_size')
+    list_select_related = ('problem',)
+    readonly_fields = ('input_blob', 'input_size', 'expected_blob', 'expected_size')
 
-admin.site.register(TestCase)
 admin.site.register(Submission)
 admin.site.register(User)
\ No newline at end of file
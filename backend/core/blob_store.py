@@ -0,0 +1,267 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+# Content-addressed storage for test data. A blob is named after the SHA-256
+# of its bytes, so identical files are stored once however many test cases
+# use them. BLOB_STORE_BACKEND selects the implementation:
+#   local - files under BLOB_STORE_DIR (development, single node)
+#   s3    - BLOB_STORE_BUCKET on S3 or any S3-compatible service such as MinIO
+#           (BLOB_STORE_ENDPOINT_URL); needs boto3. Workers keep a local
+#           mirror of the blobs they used in BLOB_STORE_CACHE_DIR, trimmed
+#           least recently used first. A mirrored blob is pinned by a shared
+#           flock while it is open, and eviction skips pinned blobs.
+BLOB_STORE_BACKEND = os.environ.get('BLOB_STORE_BACKEND', 'local').lower()
+BLOB_STORE_DIR = os.environ.get(
+    'BLOB_STORE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blobs'))
+BLOB_STORE_BUCKET = os.environ.get('BLOB_STORE_BUCKET', 'algozen-testdata')
+BLOB_STORE_PREFIX = os.environ.get('BLOB_STORE_PREFIX', 'testdata/')
+BLOB_STORE_ENDPOINT_URL = os.environ.get('BLOB_STORE_ENDPOINT_URL') or None
+BLOB_STORE_CACHE_DIR = os.environ.get(
+    'BLOB_STORE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'algozen-blob-cache'))
+BLOB_STORE_CACHE_MAX_BYTES = int(os.environ.get('BLOB_STORE_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+CHUNK_SIZE = 1024 * 1024
+
+
+def _chunks(source):
+    if isinstance(source, str):
+        source = source.encode()
+    if isinstance(source, bytes):
+        yield source
+        return
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def _spool(source, directory):
+    """
+    Copy source (bytes, str or a file object) into a temporary file in directory
+    while hashing it. Returns (temp path, digest, size).
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'.tmp-{uuid.uuid4().hex}')
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in _chunks(source):
+            digest.update(chunk)
+            size += len(chunk)
+            f.write(chunk)
+    return path, digest.hexdigest(), size
+
+
+def _place(src, dst):
+    # Always a copy: a link would let a program write through its stdin
+    # (/proc/self/fd/0) into the stored blob
+    shutil.copyfile(src, dst)
+
+
+class LocalBlobStore:
+    def __init__(self, root=BLOB_STORE_DIR):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, source):
+        """
+        Store source and return (digest, size); storing known content is a no-op
+        """
+        tmp_path, digest, size = _spool(source, self.root)
+        path = self._path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(tmp_path, path)
+        return digest, size
+
+    def exists(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def open(self, digest):
+        return open(self._path(digest), 'rb')
+
+    def local_path(self, digest):
+        """
+        Path of the blob on this machine's filesystem
+        """
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'Blob {digest} not found')
+        return path
+
+    def fetch(self, digest, dest_path):
+        _place(self.local_path(digest), dest_path)
+
+
+class S3BlobStore:
+    def __init__(self, bucket=BLOB_STORE_BUCKET, prefix=BLOB_STORE_PREFIX, endpoint_url=BLOB_STORE_ENDPOINT_URL,
+                 cache_dir=BLOB_STORE_CACHE_DIR, cache_max_bytes=BLOB_STORE_CACHE_MAX_BYTES):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                import boto3
+                # Credentials come from the usual AWS_* environment variables
+                self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+            return self._client
+
+    def _key(self, digest):
+        return f'{self.prefix}{digest[:2]}/{digest}'
+
+    def exists(self, digest):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put(self, source):
+        tmp_path, digest, size = _spool(source, self.cache_dir)
+        try:
+            if not self.exists(digest):
+                self.client.upload_file(tmp_path, self.bucket, self._key(digest))
+        finally:
+            os.remove(tmp_path)
+        return digest, size
+
+    def _mirror_path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def open(self, digest):
+        """
+        The blob from this worker's mirror, downloading it on first use. It
+        stays pinned until the file is closed, so evict() cannot remove it
+        while it is being read.
+        """
+        path = self._mirror_path(digest)
+        while True:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                return self._download(digest, path)
+            fcntl.flock(f, fcntl.LOCK_SH)
+            if os.fstat(f.fileno()).st_nlink:
+                # Mark as most recently used
+                os.utime(f.fileno())
+                return f
+            # Evicted between the open and the lock
+            f.close()
+
+    def _download(self, digest, path):
+        """
+        Download the blob into the mirror and return it open and pinned. It is
+        pinned before it appears under path, and it is exempt from the eviction
+        that follows, even when it alone is larger than cache_max_bytes.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            self.client.download_file(self.bucket, self._key(digest), tmp_path)
+            f = open(tmp_path, 'rb')
+            try:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                os.rename(tmp_path, path)
+            except BaseException:
+                f.close()
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict(keep=path)
+        return f
+
+    def fetch(self, digest, dest_path):
+        with self.open(digest) as source, open(dest_path, 'wb') as dest:
+            shutil.copyfileobj(source, dest, CHUNK_SIZE)
+
+    def evict(self, keep=None):
+        """
+        Drop least recently used blobs until the mirror fits in cache_max_bytes,
+        skipping pinned blobs and keep (the blob just downloaded)
+        """
+        blobs = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        blobs.sort()
+        for mtime, size, path in blobs:
+            if total <= self.cache_max_bytes:
+                break
+            if path != keep and _remove_unpinned(path):
+                total -= size
+
+
+def _remove_unpinned(path):
+    """
+    Remove path unless a reader holds it open; readers that opened it but
+    have not locked it yet see it unlinked and look again
+    """
+    try:
+        with open(path, 'rb') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            os.remove(path)
+    except OSError:
+        return False
+    return True
+
+
+BLOB_STORES = {
+    'local': LocalBlobStore,
+    's3': S3BlobStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """
+    Process-wide blob store for BLOB_STORE_BACKEND
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BLOB_STORES[BLOB_STORE_BACKEND]()
+        return _store
+
+
+def set_blob_store(store):
+    """
+    Replace the blob store, e.g. with a LocalBlobStore in a temporary directory
+    """
+    global _store
+    with _store_lock:
+        _store = store
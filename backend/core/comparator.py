@@ -0,0 +1,239 @@
+import io
+import math
+import os
+import shutil
+import sys
+from itertools import zip_longest
+
+from .sandbox import run_measured
+from .workspace import workspace
+
+# Output checkers, selected per problem through Problem.checker:
+#   token  - whitespace-insensitive token comparison (default)
+#   exact  - byte-for-byte identical output
+#   line   - line by line, ignoring trailing whitespace and trailing blank lines
+#   float  - like token, but numeric tokens may differ by Problem.float_tolerance
+#            (absolute or relative)
+#   custom - Problem.checker_code, a Python script run as
+#            `checker.py <input> <expected> <output>`; exit status 0 accepts.
+#            It runs like a submission (run_measured: rlimits, sandbox user)
+#            in a workspace of its own, on copies of the program's files.
+# Everything except custom streams both sides in CHUNK_SIZE pieces.
+CHUNK_SIZE = 64 * 1024
+# CPU seconds and address space of a custom checker
+CHECKER_TIMEOUT = 10
+CHECKER_MEMORY_LIMIT_MB = 512
+
+
+def iter_token_batches(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of whitespace-separated byte tokens from a binary stream, one list
+    per chunk read, so the whole output is never held in memory. A token cut
+    across chunks is kept as a list of its pieces and joined once, so even a
+    single token as long as the whole output costs linear time.
+    """
+    pending = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts = chunk.split()
+        batch = []
+        if pending:
+            if parts and not chunk[:1].isspace():
+                pending.append(parts.pop(0))
+                if not parts and not chunk[-1:].isspace():
+                    # The whole chunk is the middle of one long token
+                    continue
+            batch.append(b''.join(pending))
+            pending = []
+        # A chunk that does not end in whitespace may have cut a token in half
+        if parts and not chunk[-1:].isspace():
+            pending.append(parts.pop())
+        batch.extend(parts)
+        if batch:
+            yield batch
+    if pending:
+        yield [b''.join(pending)]
+
+
+def iter_tokens(stream, chunk_size=CHUNK_SIZE):
+    for batch in iter_token_batches(stream, chunk_size):
+        yield from batch
+
+
+def iter_lines(stream, chunk_size=CHUNK_SIZE):
+    """
+    Yield lines without trailing whitespace, dropping blank lines at the very end.
+    Lines are read in chunk_size pieces; a line cut across pieces is joined once
+    it ends, so cuts never pass for line breaks or trailing whitespace.
+    """
+    blank = 0
+    pieces = []
+    while True:
+        piece = stream.readline(chunk_size)
+        if piece and not piece.endswith(b'\n'):
+            pieces.append(piece)
+            continue
+        if pieces:
+            pieces.append(piece)
+            piece = b''.join(pieces)
+            pieces = []
+        if not piece:
+            break
+        line = piece.rstrip()
+        if not line:
+            # Only emit blank lines once something non-blank follows them
+            blank += 1
+            continue
+        for _ in range(blank):
+            yield b''
+        blank = 0
+        yield line
+
+
+def _open(source):
+    if isinstance(source, str):
+        return io.BytesIO(source.encode())
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return source
+
+
+def _batched_match(actual, expected, tokens_equal=None):
+    """
+    Compare two streams of token batches. Equal prefixes are compared as whole
+    lists (C speed); tokens_equal is only consulted for tokens that differ.
+    """
+    actual_batches = iter_token_batches(actual)
+    expected_batches = iter_token_batches(expected)
+    a, e = [], []
+    while True:
+        if not a:
+            a = next(actual_batches, None)
+        if not e:
+            e = next(expected_batches, None)
+        if a is None or e is None:
+            # Both sides must run out together
+            return a is None and e is None
+        n = min(len(a), len(e))
+        if a[:n] != e[:n]:
+            if tokens_equal is None:
+                return False
+            for x, y in zip(a[:n], e[:n]):
+                if x != y and not tokens_equal(x, y):
+                    return False
+        a, e = a[n:], e[n:]
+
+
+def tokens_match(actual, expected):
+    """
+    Whitespace-insensitive, chunk-by-chunk comparison of two outputs.
+    Each side may be a binary stream, bytes or str.
+    """
+    return _batched_match(_open(actual), _open(expected))
+
+
+def floats_match(actual, expected, tolerance):
+    """
+    Token comparison where numbers may differ by tolerance (absolute or relative)
+    """
+    def tokens_equal(x, y):
+        try:
+            a, e = float(x), float(y)
+        except ValueError:
+            return False
+        if math.isnan(a) or math.isnan(e):
+            return math.isnan(a) and math.isnan(e)
+        return abs(a - e) <= tolerance or abs(a - e) <= tolerance * abs(e)
+
+    return _batched_match(_open(actual), _open(expected), tokens_equal)
+
+
+def lines_match(actual, expected):
+    for a, e in zip_longest(iter_lines(_open(actual)), iter_lines(_open(expected))):
+        if a != e:
+            return False
+    return True
+
+
+def _read_full(stream, size):
+    """
+    size bytes from stream, fewer only at its end (a read may return less)
+    """
+    data = stream.read(size)
+    if not data or len(data) == size:
+        return data
+    pieces = [data]
+    size -= len(data)
+    while size:
+        data = stream.read(size)
+        if not data:
+            break
+        pieces.append(data)
+        size -= len(data)
+    return b''.join(pieces)
+
+
+def exact_match(actual, expected):
+    actual, expected = _open(actual), _open(expected)
+    while True:
+        a = _read_full(actual, CHUNK_SIZE)
+        e = _read_full(expected, CHUNK_SIZE)
+        if a != e:
+            return False
+        if not a:
+            return True
+
+
+def _copy_in(path, dest_path):
+    # The program may have replaced its files with links to anything the worker can read
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+    with os.fdopen(fd, 'rb') as source, open(dest_path, 'wb') as dest:
+        shutil.copyfileobj(source, dest, CHUNK_SIZE)
+
+
+def run_custom_checker(checker_code, input_path, output_path, expected):
+    """
+    Run a problem's checker script; it decides the verdict through its exit status.
+    It never sees the program's directory, only copies of its input and output.
+    """
+    with workspace() as checker_dir:
+        paths = {name: os.path.join(checker_dir, name)
+                 for name in ('checker.py', 'input.txt', 'expected.txt', 'output.txt')}
+        with open(paths['checker.py'], 'w') as f:
+            f.write(checker_code)
+        with open(paths['expected.txt'], 'wb') as f:
+            source = _open(expected)
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+        try:
+            _copy_in(input_path, paths['input.txt'])
+            _copy_in(output_path, paths['output.txt'])
+        except OSError:
+            return False
+        result = run_measured(
+            [sys.executable, paths['checker.py'], paths['input.txt'], paths['expected.txt'], paths['output.txt']],
+            os.devnull, os.devnull, os.devnull, checker_dir, CHECKER_TIMEOUT, CHECKER_MEMORY_LIMIT_MB)
+    return result.returncode == 0 and result.timeout is None
+
+
+def output_file_matches(output_path, expected, problem=None, input_path=None):
+    """
+    Compare a program's output file against the expected output (str, bytes or
+    binary stream) using the checker configured on problem (token by default)
+    """
+    mode = problem.checker if problem is not None else 'token'
+    if mode == 'custom':
+        return run_custom_checker(problem.checker_code, input_path, output_path, expected)
+    with open(output_path, 'rb') as actual:
+        if mode == 'exact':
+            return exact_match(actual, expected)
+        if mode == 'line':
+            return lines_match(actual, expected)
+        if mode == 'float':
+            return floats_match(actual, expected, problem.float_tolerance)
+        return tokens_match(actual, expected)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Local, content-addressed cache of compiled artifacts (C++ binaries, Java classes).
+# Entries are directories named after the cache key; recency is tracked through
+# the directory mtime and the oldest entries are evicted once the cache grows
+# past COMPILE_CACHE_MAX_BYTES. Artifacts are only ever copied in and out, never
+# linked, so nothing a program does to its workspace reaches the cache. Entries
+# are read-only and carry a manifest of their files' SHA-256 digests, checked on
+# every fetch; an entry that does not match is dropped. Run programs under
+# another uid (SANDBOX_UID) so they cannot write the cache, owned by the worker.
+COMPILE_CACHE_DIR = os.environ.get(
+    'COMPILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'algozen-compile-cache'))
+COMPILE_CACHE_MAX_BYTES = int(os.environ.get('COMPILE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+COMPILE_CACHE_ENABLED = os.environ.get('COMPILE_CACHE_ENABLED', 'true').lower() == 'true'
+
+
+def cache_key(language, flags, code, toolchain='local'):
+    """
+    Key a compilation by (language, compiler flags, SHA-256 of the source).
+    toolchain keeps binaries built by different compilers (local vs. container image) apart.
+    """
+    digest = hashlib.sha256()
+    digest.update(language.lower().encode())
+    digest.update(b'\0')
+    digest.update(toolchain.encode())
+    digest.update(b'\0')
+    digest.update(' '.join(flags).encode())
+    digest.update(b'\0')
+    digest.update(code.encode())
+    return digest.hexdigest()
+
+
+MANIFEST = '.manifest'
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_verified(src, dst, expected, mode):
+    """
+    Copy src to dst, hashing on the way; True when the copy matches expected
+    """
+    digest = hashlib.sha256()
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        for chunk in iter(lambda: fsrc.read(1024 * 1024), b''):
+            digest.update(chunk)
+            fdst.write(chunk)
+    os.chmod(dst, mode)
+    return digest.hexdigest() == expected
+
+
+def _remove_entry(path):
+    # Entries are read-only; make them writable again to delete them
+    try:
+        os.chmod(path, 0o755)
+    except OSError:
+        pass
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class CompileCache:
+    def __init__(self, root=COMPILE_CACHE_DIR, max_bytes=COMPILE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def fetch(self, key, dest_dir):
+        """
+        Copy the cached artifacts for key into dest_dir.
+        Returns the list of artifact names, or None on a miss.
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, MANIFEST)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            if os.path.isdir(entry):
+                # Entry from before manifests were kept; rebuild it
+                _remove_entry(entry)
+            return None
+        except (OSError, ValueError):
+            return None
+        placed = []
+        try:
+            for name, (digest, mode) in manifest.items():
+                dst = os.path.join(dest_dir, name)
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                placed.append(dst)
+                if not _copy_verified(os.path.join(entry, name), dst, digest, mode):
+                    logger.warning('Compile cache entry %s does not match its manifest; dropping it', key)
+                    _remove_entry(entry)
+                    raise FileNotFoundError(name)
+            # Mark as most recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another worker while we were reading it, or corrupt
+            for dst in placed:
+                try:
+                    os.remove(dst)
+                except OSError:
+                    pass
+            return None
+        return list(manifest)
+
+    def store(self, key, src_dir, names):
+        """
+        Copy the named artifacts from src_dir into the cache under key
+        """
+        if not names:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        staging = os.path.join(self.root, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        try:
+            manifest = {}
+            for name in names:
+                src = os.path.join(src_dir, name)
+                dst = os.path.join(staging, name)
+                shutil.copyfile(src, dst)
+                manifest[name] = [_file_digest(dst), os.stat(src).st_mode & 0o755]
+                os.chmod(dst, 0o444)
+            with open(os.path.join(staging, MANIFEST), 'w') as f:
+                json.dump(manifest, f)
+            os.chmod(os.path.join(staging, MANIFEST), 0o444)
+            os.chmod(staging, 0o555)
+            # Atomic publish; losing the race to another worker is fine
+            os.rename(staging, entry)
+        except OSError:
+            _remove_entry(staging)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        total = 0
+        try:
+            keys = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for key in keys:
+            if key.startswith('.'):
+                continue
+            entry = self._entry(key)
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                mtime = os.path.getmtime(entry)
+            except OSError:
+                continue
+            entries.append((mtime, size, entry))
+            total += size
+        entries.sort()
+        for mtime, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            _remove_entry(entry)
+            total -= size
+
+
+compile_cache = CompileCache()
@@ -0,0 +1,526 @@
+import contextvars
+import fnmatch
+import io
+import logging
+import math
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+from .compile_cache import compile_cache, cache_key, COMPILE_CACHE_ENABLED
+from .python_pool import get_python_pool, python_pool_enabled
+from .java_runtime import compile_java, cds_archive
+from .precompiled_headers import include_dir
+from .kube_client import get_kube_clients, KUBERNETES_NAMESPACE
+from .jobs import new_job_id, job_name as make_job_name, get_correlation_id
+from .languages import get_language, format_cmd
+from .sandbox import (
+    Execution, Cancelled, run_measured, output_limit_exceeded, read_bounded, wall_timeout,
+    DEFAULT_TIME_LIMIT, DEFAULT_MEMORY_LIMIT_MB, CANCEL_POLL_INTERVAL,
+)
+from .workspace import workspace
+
+logger = logging.getLogger(__name__)
+
+# Executors run programs described by core.languages in three phases:
+#   compile(language, code, work_dir) - write the source into the workspace and
+#       build it once; returns a program dict, or {'error': ..., 'compile_error': True}
+#   run(program, stdin_path, stdout_path, stderr_path, work_dir, ...) - run it
+#       once on one input under the limits; returns a sandbox.Execution, or
+#       raises sandbox.Cancelled once the optional cancel event is set
+#   cleanup(program) - release what compile() acquired
+#   max_parallel_runs(program) - how many runs of program may go at once when
+#       judging (None: as many as the worker's CPUs allow)
+# Implementations are registered in EXECUTORS:
+#   subprocess      - local child processes under rlimits (warm interpreters
+#                     for languages with warm_pool)
+#   kubernetes-job  - a Kubernetes Job per run, mounting the workspace as a hostPath
+#   kubernetes-pool - a pre-warmed runner pod (core.kube_pool) per program,
+#                     falling back to a Job when no pod is idle
+# /api/compile/ runs pick one from USE_KUBERNETES and KUBERNETES_EXECUTOR;
+# judging uses settings.JUDGE_EXECUTOR.
+
+# Least time to wait for a Kubernetes job's pod to finish (longer for Jobs
+# with a later deadline)
+KUBERNETES_WATCH_TIMEOUT = int(os.environ.get('KUBERNETES_WATCH_TIMEOUT', 45))
+# Seconds a Job gets on top of its time limit for pod scheduling and image
+# pulls; the limit itself is enforced inside the pod
+KUBERNETES_STARTUP_SLACK = int(os.environ.get('KUBERNETES_STARTUP_SLACK', 30))
+# 'job' creates a Job per execution, 'pool' dispatches to pre-warmed runner pods
+KUBERNETES_EXECUTOR = os.environ.get('KUBERNETES_EXECUTOR', 'job').lower()
+# Memory limit of runner pods; runtimes without an address space limit
+# (the JVM) get three quarters of it as heap, leaving room for the rest
+POD_MEMORY_LIMIT_MB = 256
+POD_WORK_DIR = '/code'
+# Seconds an exec in a warm runner pod may take past the run's wall-clock
+# timeout (shipping files over the API server) before it is given up on
+POD_EXEC_SLACK = 5
+
+
+def compiled_artifacts(language, work_dir):
+    """
+    Names of the files in work_dir matching the language's artifact patterns
+    """
+    names = os.listdir(work_dir)
+    return sorted({name for pattern in language.artifacts for name in fnmatch.filter(names, pattern)})
+
+
+def write_source(language, code, work_dir):
+    with open(os.path.join(work_dir, language.source_file), 'w') as f:
+        f.write(code)
+
+
+def pod_heap_mb(language):
+    return POD_MEMORY_LIMIT_MB if language.address_space_limit else POD_MEMORY_LIMIT_MB * 3 // 4
+
+
+def pod_limited(cmd, time_limit, pid_file=None):
+    """
+    cmd (an argument list) wrapped to enforce the limits inside a pod, where
+    the clock is not shared with scheduling or image pulls: SIGXCPU after
+    time_limit seconds of CPU time (ulimit -t) and killed once the wall-clock
+    timeout (sandbox.wall_timeout) passes. See pod_timeout for the exit codes.
+    With pid_file, the id of the run's process group (timeout(1) leads one)
+    is written there, for kube_pool.kill_in_pod.
+    """
+    script = (f'ulimit -S -t {math.ceil(time_limit)} && '
+              f'exec timeout -k 1 {math.ceil(wall_timeout(time_limit))} "$@"')
+    if pid_file:
+        script = f'echo $$ > {shlex.quote(pid_file)} && {script}'
+    return ['/bin/sh', '-c', script, 'sh', *cmd]
+
+
+def pod_timeout(exit_code):
+    """
+    Execution.timeout for the exit code of a pod_limited command: timeout(1)
+    exits with 124 when the wall clock runs out, and a program stopped by
+    SIGXCPU exits with 128 + SIGXCPU
+    """
+    if exit_code == 124:
+        return 'wall'
+    if exit_code == 128 + signal.SIGXCPU:
+        return 'cpu'
+    return None
+
+
+def container_exit_code(pod):
+    statuses = pod.status.container_statuses or []
+    if not statuses or not statuses[0].state or not statuses[0].state.terminated:
+        return None
+    return statuses[0].state.terminated.exit_code
+
+
+class Executor:
+    name = None
+
+    def compile(self, language, code, work_dir):
+        raise NotImplementedError
+
+    def run(self, program, stdin_path, stdout_path, stderr_path, work_dir,
+            time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+        raise NotImplementedError
+
+    def cleanup(self, program):
+        pass
+
+    def max_parallel_runs(self, program):
+        return None
+
+
+class SubprocessExecutor(Executor):
+    name = 'subprocess'
+
+    def compile(self, language, code, work_dir):
+        """
+        Compiled artifacts are served from the compile cache when the same
+        source was already built with the same command. Languages with a
+        compile server are built on the warm one of core.java_runtime, and
+        precompiled headers are put first on the include path. Compilation
+        gets the language's compile_timeout, not the problem's time limit.
+        """
+        write_source(language, code, work_dir)
+        program = {'language': language, 'work_dir': work_dir, 'code': code, 'cached': False}
+        if language.compile is None:
+            program['pooled'] = language.warm_pool and python_pool_enabled()
+            return program
+
+        key = cache_key(language.name, language.compile, code)
+        cached = COMPILE_CACHE_ENABLED and compile_cache.fetch(key, work_dir) is not None
+        if not cached:
+            cmd = format_cmd(language.compile, work_dir, language.source_file)
+            headers = include_dir(language)
+            if headers:
+                cmd = [cmd[0], '-I', headers, *cmd[1:]]
+            result = None
+            if language.compile_server:
+                result = compile_java(cmd, os.path.join(work_dir, language.source_file), work_dir,
+                                      language.compile_timeout)
+            if result is None:
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=language.compile_timeout,
+                    cwd=work_dir
+                )
+            if result.returncode != 0:
+                return {'error': f'Compilation error: {result.stderr}', 'compile_error': True}
+            if COMPILE_CACHE_ENABLED:
+                compile_cache.store(key, work_dir, compiled_artifacts(language, work_dir))
+        program['cached'] = cached
+        return program
+
+    def run(self, program, stdin_path, stdout_path, stderr_path, work_dir,
+            time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+        """
+        Run under the CPU time and memory limits, on a warm interpreter when
+        possible. stdin is streamed from stdin_path and stdout/stderr go
+        straight to files capped at OUTPUT_LIMIT_BYTES, so large inputs and
+        runaway output never pass through worker memory. work_dir is the cwd;
+        cpu optionally pins the run to one core.
+        """
+        if program.get('pooled'):
+            return get_python_pool().run(program['code'], stdin_path, stdout_path, stderr_path,
+                                         time_limit, memory_limit_mb, cpu, cancel)
+        language = program['language']
+        cmd = format_cmd(language.run, program['work_dir'], language.source_file, memory_limit_mb)
+        archive = cds_archive() if language.class_data_sharing else None
+        if archive:
+            cmd = [cmd[0], f'-XX:SharedArchiveFile={archive}', *cmd[1:]]
+        if not language.address_space_limit:
+            memory_limit_mb = None
+        return run_measured(cmd, stdin_path, stdout_path, stderr_path, work_dir, time_limit, memory_limit_mb, cpu,
+                            cancel)
+
+
+class KubernetesJobExecutor(Executor):
+    name = 'kubernetes-job'
+
+    def compile(self, language, code, work_dir):
+        """
+        Build once in a Job of its own, before any test runs; the artifacts
+        land in the workspace that every run Job mounts. Sources already
+        built are served from the compile cache.
+        """
+        write_source(language, code, work_dir)
+        program = {'language': language, 'work_dir': work_dir, 'code': code}
+        if not language.compile:
+            return program
+        key = cache_key(language.name, language.compile, code, toolchain=language.image)
+        if COMPILE_CACHE_ENABLED and compile_cache.fetch(key, work_dir) is not None:
+            return program
+
+        cmd = format_cmd(language.compile, POD_WORK_DIR, language.source_file, pod_heap_mb(language))
+        phase, exit_code, _, logs = self._run_job(
+            language, work_dir, f'exec timeout {language.compile_timeout} {shlex.join(cmd)}',
+            language.compile_timeout + KUBERNETES_STARTUP_SLACK)
+        if phase not in ('Succeeded', 'Failed') or exit_code == 124:
+            raise subprocess.TimeoutExpired(language.compile, language.compile_timeout)
+        if phase == 'Failed':
+            return {'error': f'Compilation error: {logs}', 'compile_error': True}
+        if COMPILE_CACHE_ENABLED:
+            compile_cache.store(key, work_dir, compiled_artifacts(language, work_dir))
+        return program
+
+    def run(self, program, stdin_path, stdout_path, stderr_path, work_dir,
+            time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+        """
+        The limits are enforced inside the pod (see pod_limited); the Job's
+        deadline only adds room for scheduling and image pulls. Pods report no
+        CPU usage or peak memory: the wall time stands in for the CPU time and
+        memory is 0. Pod logs (stdout and stderr together) go to stdout_path
+        on success and to stderr_path on failure.
+        """
+        language = program['language']
+        stdin_in_pod = os.path.join(POD_WORK_DIR, os.path.relpath(stdin_path, program['work_dir']))
+        cmd = pod_limited(format_cmd(language.run, POD_WORK_DIR, language.source_file, pod_heap_mb(language)),
+                          time_limit)
+        deadline = math.ceil(wall_timeout(time_limit)) + KUBERNETES_STARTUP_SLACK
+        phase, exit_code, wall_time, logs = self._run_job(
+            language, program['work_dir'], f'{shlex.join(cmd)} < {shlex.quote(stdin_in_pod)}', deadline, cancel)
+        if phase not in ('Succeeded', 'Failed'):
+            return Execution(None, wall_time, wall_time, 0, 'wall')
+        with open(stdout_path if phase == 'Succeeded' else stderr_path, 'w') as f:
+            f.write(logs)
+        if phase == 'Succeeded':
+            return Execution(0, wall_time, wall_time, 0, None)
+        return Execution(exit_code or 1, wall_time, wall_time, 0, pod_timeout(exit_code))
+
+    def _run_job(self, language, root, script, deadline, cancel=None):
+        """
+        Run script with /bin/sh in a Job on the language's image, with root
+        mounted at POD_WORK_DIR, and wait for its pod to finish or for the
+        Job's deadline (whole seconds). Returns (pod phase, container exit
+        code, wall time, logs); the phase is 'Deleted' or None when the pod
+        never finished. Raises sandbox.Cancelled once cancel is set.
+        """
+        from kubernetes import client, watch
+
+        batch_v1, core_v1 = get_kube_clients()
+        job_name = make_job_name(new_job_id())
+        labels = {"job-name": job_name}
+        correlation_id = get_correlation_id()
+        if correlation_id:
+            labels["algozen/correlation-id"] = correlation_id
+
+        container = client.V1Container(
+            name="runner",
+            image=language.image,
+            command=["/bin/sh", "-c", script],
+            resources=client.V1ResourceRequirements(
+                limits={"cpu": "1", "memory": f"{POD_MEMORY_LIMIT_MB}Mi"},
+                requests={"cpu": "0.2", "memory": "128Mi"}
+            ),
+            volume_mounts=[client.V1VolumeMount(
+                mount_path=POD_WORK_DIR,
+                name="code-volume"
+            )],
+            security_context=client.V1SecurityContext(
+                run_as_user=1000,
+                run_as_group=3000,
+                allow_privilege_escalation=False,
+                capabilities=client.V1Capabilities(drop=["ALL"]),
+                read_only_root_filesystem=True
+            ),
+            tty=False
+        )
+        volume = client.V1Volume(
+            name="code-volume",
+            host_path=client.V1HostPathVolumeSource(path=root)
+        )
+        pod_spec = client.V1PodSpec(
+            containers=[container],
+            restart_policy="Never",
+            volumes=[volume],
+            security_context=client.V1PodSecurityContext(
+                run_as_non_root=True,
+                seccomp_profile=client.V1SeccompProfile(type="RuntimeDefault")
+            )
+        )
+        job = client.V1Job(
+            api_version="batch/v1",
+            kind="Job",
+            metadata=client.V1ObjectMeta(name=job_name, labels=labels),
+            spec=client.V1JobSpec(
+                template=client.V1PodTemplateSpec(metadata=client.V1ObjectMeta(labels=labels), spec=pod_spec),
+                backoff_limit=0,
+                active_deadline_seconds=deadline
+            )
+        )
+
+        logger.info('Creating Kubernetes job %s', job_name)
+        start = time.monotonic()
+        batch_v1.create_namespaced_job(body=job, namespace=KUBERNETES_NAMESPACE)
+        finished = threading.Event()
+        if cancel is not None:
+            threading.Thread(target=self._stop_on_cancel, args=(cancel, finished, job_name), daemon=True).start()
+        try:
+            # Block on pod events instead of polling; the watch starts with the
+            # current state so nothing created before it is missed
+            pod = None
+            pod_phase = None
+            w = watch.Watch()
+            for event in w.stream(
+                core_v1.list_namespaced_pod,
+                namespace=KUBERNETES_NAMESPACE,
+                label_selector=f"job-name={job_name}",
+                timeout_seconds=max(KUBERNETES_WATCH_TIMEOUT, deadline)
+            ):
+                pod = event['object']
+                # The job controller deletes the pod once active_deadline_seconds passes
+                pod_phase = 'Deleted' if event['type'] == 'DELETED' else pod.status.phase
+                if pod_phase in ['Succeeded', 'Failed', 'Deleted']:
+                    w.stop()
+                    break
+            wall_time = time.monotonic() - start
+
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            if pod is None:
+                raise RuntimeError('Pod not created')
+            if pod_phase not in ['Succeeded', 'Failed']:
+                return pod_phase, None, wall_time, ''
+            try:
+                logs = core_v1.read_namespaced_pod_log(name=pod.metadata.name, namespace=KUBERNETES_NAMESPACE)
+            except Exception:
+                logs = ''
+            return pod_phase, container_exit_code(pod), wall_time, logs
+        finally:
+            finished.set()
+            batch_v1.delete_namespaced_job(
+                name=job_name,
+                namespace=KUBERNETES_NAMESPACE,
+                body=client.V1DeleteOptions(propagation_policy='Foreground')
+            )
+
+    @staticmethod
+    def _stop_on_cancel(cancel, finished, job_name):
+        """
+        Delete the job's pod once cancel is set, which ends the watch on it
+        """
+        while not finished.wait(CANCEL_POLL_INTERVAL):
+            if cancel.is_set():
+                get_kube_clients()[1].delete_collection_namespaced_pod(
+                    namespace=KUBERNETES_NAMESPACE, label_selector=f"job-name={job_name}", grace_period_seconds=0)
+                return
+
+
+class KubernetesPoolExecutor(Executor):
+    name = 'kubernetes-pool'
+
+    def compile(self, language, code, work_dir):
+        """
+        Claim an idle runner pod, ship the source into it and compile there.
+        Without an idle pod the program goes to a Job instead.
+        """
+        from . import kube_pool
+
+        pod_name = kube_pool.claim_pod(language.name)
+        # Top the pool back up off the request path
+        threading.Thread(target=contextvars.copy_context().run, args=(kube_pool.replenish_pool, language),
+                         daemon=True).start()
+        if not pod_name:
+            program = get_executor('kubernetes-job').compile(language, code, work_dir)
+            program['fallback'] = True
+            return program
+
+        program = {'language': language, 'work_dir': work_dir, 'code': code, 'pod': pod_name}
+        steps = [format_cmd(language.compile, POD_WORK_DIR, language.source_file)] if language.compile else []
+        errors = io.BytesIO()
+        try:
+            returncode, exceeded = kube_pool.exec_in_pod(
+                pod_name, steps, {language.source_file: code.encode()}, timeout=language.compile_timeout,
+                stderr=errors)
+        except Exception:
+            kube_pool.release_pod(pod_name)
+            raise
+        if returncode != 0:
+            kube_pool.release_pod(pod_name)
+            if returncode is None and not exceeded:
+                raise subprocess.TimeoutExpired(language.compile or [], language.compile_timeout)
+            return {'error': f'Compilation error: {errors.getvalue().decode(errors="replace")}',
+                    'compile_error': True}
+        return program
+
+    def run(self, program, stdin_path, stdout_path, stderr_path, work_dir,
+            time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+        """
+        The limits are enforced inside the pod (see pod_limited). Pods report
+        no CPU usage or peak memory: the wall time stands in for the CPU time
+        and memory is 0
+        """
+        from . import kube_pool
+
+        if program.get('fallback'):
+            return get_executor('kubernetes-job').run(
+                program, stdin_path, stdout_path, stderr_path, work_dir, time_limit, memory_limit_mb, cpu, cancel)
+        language = program['language']
+        # Each test ships its own input file, removed from the pod after the run
+        stdin_file = os.path.relpath(stdin_path, program['work_dir'])
+        pid_file = os.path.join(os.path.dirname(stdin_file), 'run.pid')
+        run = pod_limited(format_cmd(language.run, POD_WORK_DIR, language.source_file, pod_heap_mb(language)),
+                          time_limit, pid_file)
+        kube_pool.renew_lease(program['pod'])
+        start = time.monotonic()
+        with open(stdout_path, 'wb') as stdout, open(stderr_path, 'wb') as stderr:
+            returncode, exceeded = kube_pool.exec_in_pod(
+                program['pod'], [run], {stdin_file: stdin_path}, timeout=wall_timeout(time_limit) + POD_EXEC_SLACK,
+                stdin_file=stdin_file, cancel=cancel, stdout=stdout, stderr=stderr, keep_files=False)
+        wall_time = time.monotonic() - start
+        if exceeded:
+            # Reported like a local run stopped by RLIMIT_FSIZE (see sandbox.output_limit_exceeded)
+            kube_pool.kill_in_pod(program['pod'], pid_file)
+            return Execution(-signal.SIGXFSZ, wall_time, wall_time, 0, None)
+        if returncode is None:
+            return Execution(None, wall_time, wall_time, 0, 'wall')
+        return Execution(returncode, wall_time, wall_time, 0, pod_timeout(returncode))
+
+    def max_parallel_runs(self, program):
+        """
+        Every run of a program goes to the one pod it was compiled in, whose
+        single CPU parallel runs would share (and be timed against)
+        """
+        return None if program.get('fallback') else 1
+
+    def cleanup(self, program):
+        """
+        Runner pods are single use
+        """
+        from . import kube_pool
+
+        if program.get('pod'):
+            kube_pool.release_pod(program['pod'])
+
+
+EXECUTORS = {
+    'subprocess': SubprocessExecutor,
+    'kubernetes-job': KubernetesJobExecutor,
+    'kubernetes-pool': KubernetesPoolExecutor,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def default_executor_name():
+    """
+    Executor for /api/compile/ runs, from USE_KUBERNETES and KUBERNETES_EXECUTOR
+    """
+    if os.environ.get('USE_KUBERNETES', 'false').lower() != 'true':
+        return 'subprocess'
+    return 'kubernetes-pool' if KUBERNETES_EXECUTOR == 'pool' else 'kubernetes-job'
+
+
+def get_executor(name=None):
+    """
+    Process-wide executor registered under name (default_executor_name() by default)
+    """
+    name = name or default_executor_name()
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = EXECUTORS[name]()
+        return _executors[name]
+
+
+def run_code(language_name, code, stdin, executor=None):
+    """
+    Compile and run code once on stdin in a fresh workspace; returns
+    {'output', 'execution_time', 'memory'} or {'error': ...}
+    """
+    language = get_language(language_name)
+    if language is None:
+        return {'error': 'Unsupported language'}
+    executor = executor or get_executor()
+
+    try:
+        with workspace() as work_dir:
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w') as f:
+                f.write(stdin)
+            output_path = os.path.join(work_dir, 'output.txt')
+            error_path = os.path.join(work_dir, 'error.txt')
+
+            program = executor.compile(language, code, work_dir)
+            if 'error' in program:
+                return {'error': program['error']}
+            try:
+                result = executor.run(program, input_path, output_path, error_path, work_dir)
+            finally:
+                executor.cleanup(program)
+
+            if output_limit_exceeded(result.returncode, output_path):
+                return {'error': 'Output limit exceeded'}
+            if result.timeout:
+                return {'error': 'Time limit exceeded'}
+            if result.returncode == 0:
+                return {
+                    'output': read_bounded(output_path),
+                    'execution_time': result.cpu_time,
+                    'memory': result.memory,
+                }
+            return {'error': f'Runtime error: {read_bounded(error_path)}'}
+    except Exception as e:
+        return {'error': f'Execution error: {str(e)}'}
@@ -0,0 +1,53 @@
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStream;
+import java.io.StringWriter;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.List;
+
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+
+/**
+ * Warm javac used by core.java_runtime.
+ *
+ * Each request is one line on stdin, "<source file>\t<output directory>"; the
+ * source is compiled in this JVM with the output directory as class path and
+ * the answer is written to stdout as "<status> <length>\n" followed by length
+ * bytes of UTF-8 diagnostics (status 0 means compiled). The compiler and its
+ * file manager stay loaded and JIT-compiled between requests, so a request
+ * costs a fraction of starting javac. Exits at the end of stdin.
+ */
+public class CompileServer {
+    public static void main(String[] args) throws IOException {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        StandardJavaFileManager fileManager = compiler.getStandardFileManager(null, null, StandardCharsets.UTF_8);
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        OutputStream out = System.out;
+
+        String line;
+        while ((line = in.readLine()) != null) {
+            String[] request = line.split("\t");
+            StringWriter diagnostics = new StringWriter();
+            boolean compiled;
+            try {
+                Iterable<? extends JavaFileObject> units = fileManager.getJavaFileObjects(request[0]);
+                // No annotation processing: nothing on the class path but user code
+                List<String> options = Arrays.asList(
+                    "-d", request[1], "-cp", request[1], "-encoding", "UTF-8", "-proc:none");
+                compiled = compiler.getTask(diagnostics, fileManager, null, options, null, units).call();
+            } catch (RuntimeException e) {
+                diagnostics.write(e.toString());
+                compiled = false;
+            }
+            byte[] text = diagnostics.toString().getBytes(StandardCharsets.UTF_8);
+            out.write(((compiled ? 0 : 1) + " " + text.length + "\n").getBytes(StandardCharsets.UTF_8));
+            out.write(text);
+            out.flush();
+        }
+    }
+}
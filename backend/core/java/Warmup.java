@@ -0,0 +1,78 @@
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintWriter;
+import java.math.BigInteger;
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.List;
+import java.util.Map;
+import java.util.PriorityQueue;
+import java.util.Scanner;
+import java.util.StringTokenizer;
+import java.util.TreeMap;
+import java.util.stream.Collectors;
+
+/**
+ * Typical judge program used by core.java_runtime to record which JDK classes
+ * submissions load, for the class-data-sharing archive. Reads a count and
+ * that many integers from stdin, once through BufferedReader/StringTokenizer
+ * and once through Scanner, and exercises the usual collections.
+ */
+public class Warmup {
+    public static void main(String[] args) throws IOException {
+        BufferedReader reader = new BufferedReader(new InputStreamReader(System.in));
+        StringBuilder input = new StringBuilder();
+        String line;
+        while ((line = reader.readLine()) != null) {
+            input.append(line).append('\n');
+        }
+
+        StringTokenizer tokens = new StringTokenizer(input.toString());
+        int n = Integer.parseInt(tokens.nextToken());
+        long[] values = new long[n];
+        for (int i = 0; i < n; i++) {
+            values[i] = Long.parseLong(tokens.nextToken());
+        }
+        Scanner scanner = new Scanner(input.toString());
+        int m = scanner.nextInt();
+        List<Integer> list = new ArrayList<>();
+        for (int i = 0; i < m; i++) {
+            list.add(scanner.nextInt());
+        }
+        scanner.close();
+
+        Arrays.sort(values);
+        Collections.sort(list, Collections.reverseOrder());
+        Map<Integer, Integer> counts = new HashMap<>();
+        TreeMap<Integer, Integer> ordered = new TreeMap<>();
+        for (int value : list) {
+            counts.merge(value % 10, 1, Integer::sum);
+            ordered.put(value, ordered.getOrDefault(value, 0) + 1);
+        }
+        PriorityQueue<long[]> heap = new PriorityQueue<>((a, b) -> Long.compare(a[0], b[0]));
+        ArrayDeque<Integer> deque = new ArrayDeque<>();
+        for (int i = 0; i < n; i++) {
+            heap.add(new long[]{values[i], i});
+            deque.addLast(i);
+        }
+        HashSet<Long> seen = new HashSet<>();
+        BigInteger total = BigInteger.ZERO;
+        while (!heap.isEmpty()) {
+            long[] top = heap.poll();
+            seen.add(top[0]);
+            total = total.add(BigInteger.valueOf(top[0]));
+        }
+
+        PrintWriter out = new PrintWriter(System.out);
+        out.println(total);
+        out.println(String.format("%d %.3f", seen.size(), Math.sqrt(n)));
+        out.println(list.stream().filter(v -> v % 2 == 0).map(String::valueOf).collect(Collectors.joining(" ")));
+        out.println(counts + " " + ordered.firstKey() + " " + deque.pollFirst());
+        out.flush();
+    }
+}
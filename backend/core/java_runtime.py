@@ -0,0 +1,280 @@
+import fcntl
+import hashlib
+import logging
+import os
+import random
+import select
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Java startup, paid twice per submission before (javac is a JVM too):
+# - Compilation goes to a long-lived compile server per worker process
+#   (core/java/CompileServer.java, javax.tools in a warm JVM) instead of a
+#   javac process per submission. The server is replaced after
+#   JAVA_COMPILE_SERVER_MAX_USES compilations or when a compilation times out.
+# - Programs start from a class-data-sharing archive of the JDK classes that
+#   typical submissions and the compiler load (recorded by running
+#   core/java/Warmup.java and the compile server once), so the JVM maps them
+#   instead of loading and verifying them at every start.
+# Both are built once per host and JDK under JAVA_RUNTIME_DIR when the worker
+# starts (`manage.py build_runtimes`, run by start-celery.sh), never while a
+# submission waits. When they were not built, submissions fall back to javac
+# and a plain JVM. Both are off by default until `manage.py benchmark_java`
+# has been run on the target JDK.
+JAVA_RUNTIME_DIR = os.environ.get('JAVA_RUNTIME_DIR', os.path.join(tempfile.gettempdir(), 'algozen-java'))
+JAVA_COMPILE_SERVER = os.environ.get('JAVA_COMPILE_SERVER', 'false').lower() == 'true'
+JAVA_COMPILE_SERVER_MAX_USES = int(os.environ.get('JAVA_COMPILE_SERVER_MAX_USES', 500))
+JAVA_COMPILE_SERVER_HEAP_MB = int(os.environ.get('JAVA_COMPILE_SERVER_HEAP_MB', 256))
+JAVA_CDS = os.environ.get('JAVA_CDS', 'false').lower() == 'true'
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'java')
+ARCHIVE_NAME = 'algozen.jsa'
+
+
+def _jdk_key():
+    """
+    Runtime files are only valid for the JDK that built them
+    """
+    result = subprocess.run(['java', '-version'], capture_output=True, text=True, timeout=30)
+    return hashlib.sha256(result.stderr.encode()).hexdigest()[:16]
+
+
+def _class_names(path):
+    """
+    Names of the recorded JDK classes. Warmup and CompileServer themselves are
+    left out so the archive works with any class path, and so are the ids and
+    @-directives that would clash between two merged lists.
+    """
+    names = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip() or line.startswith(('@', '#')):
+                continue
+            name = line.split()[0]
+            if '/' in name:
+                names.append(name)
+    return names
+
+
+def _warmup_input():
+    rng = random.Random(0)
+    values = [rng.randint(-10**6, 10**6) for _ in range(1000)]
+    return f"{len(values)}\n{' '.join(map(str, values))}\n"
+
+
+def _build(build_dir):
+    sources = [os.path.join(SOURCE_DIR, name) for name in ('CompileServer.java', 'Warmup.java')]
+    subprocess.run(['javac', '-d', build_dir, *sources], check=True, capture_output=True, timeout=120)
+    if not JAVA_CDS:
+        return
+
+    # Classes loaded by a typical program, then by a compilation on the server
+    program_list = os.path.join(build_dir, 'program.lst')
+    subprocess.run(
+        ['java', '-Xshare:off', f'-XX:DumpLoadedClassList={program_list}', '-cp', build_dir, 'Warmup'],
+        input=_warmup_input(), check=True, capture_output=True, text=True, timeout=60)
+    compiler_list = os.path.join(build_dir, 'compiler.lst')
+    warm_out = os.path.join(build_dir, 'warmup-classes')
+    os.mkdir(warm_out)
+    subprocess.run(
+        ['java', '-Xshare:off', f'-XX:DumpLoadedClassList={compiler_list}', '-cp', build_dir, 'CompileServer'],
+        input=f"{os.path.join(SOURCE_DIR, 'Warmup.java')}\t{warm_out}\n",
+        check=True, capture_output=True, text=True, timeout=120)
+    shutil.rmtree(warm_out)
+
+    class_list = os.path.join(build_dir, 'classes.lst')
+    with open(class_list, 'w') as f:
+        f.writelines(f'{name}\n' for name in dict.fromkeys(_class_names(program_list) + _class_names(compiler_list)))
+    # Dumped from an empty directory, with nothing on the class path
+    empty = os.path.join(build_dir, 'dump')
+    os.mkdir(empty)
+    subprocess.run(
+        ['java', '-Xshare:dump', f'-XX:SharedClassListFile={class_list}',
+         f'-XX:SharedArchiveFile={os.path.join(build_dir, ARCHIVE_NAME)}'],
+        check=True, capture_output=True, timeout=300, cwd=empty)
+    os.rmdir(empty)
+
+
+_runtime = {}
+_runtime_lock = threading.Lock()
+
+
+def java_runtime_enabled():
+    return JAVA_COMPILE_SERVER or JAVA_CDS
+
+
+def _runtime_value(runtime_dir):
+    archive = os.path.join(runtime_dir, ARCHIVE_NAME)
+    return {'dir': runtime_dir, 'archive': archive if os.path.exists(archive) else None}
+
+
+def build_runtime():
+    """
+    Build the compile server and, with JAVA_CDS, the class-data-sharing archive
+    for this host's JDK unless they are already there. Run once at worker
+    startup; concurrent builders on the host wait for the first one. Returns
+    the runtime as get_runtime does, or None without a JDK.
+    """
+    value = None
+    try:
+        os.makedirs(JAVA_RUNTIME_DIR, exist_ok=True)
+        runtime_dir = os.path.join(JAVA_RUNTIME_DIR, _jdk_key())
+        with open(f'{runtime_dir}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.isdir(runtime_dir):
+                build_dir = tempfile.mkdtemp(prefix='build-', dir=JAVA_RUNTIME_DIR)
+                try:
+                    started = time.monotonic()
+                    _build(build_dir)
+                    os.chmod(build_dir, 0o755)
+                    os.rename(build_dir, runtime_dir)
+                    logger.info('Built Java runtime in %s (%.1fs)', runtime_dir, time.monotonic() - started)
+                finally:
+                    shutil.rmtree(build_dir, ignore_errors=True)
+        value = _runtime_value(runtime_dir)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning('Java runtime unavailable, using javac and a plain JVM: %s', e)
+    with _runtime_lock:
+        _runtime['value'] = value
+    return value
+
+
+def get_runtime():
+    """
+    Directory with the compiled compile server and, when it was built, the
+    class-data-sharing archive ({'dir', 'archive'}). None when build_runtime
+    has not built it for this JDK: submissions never wait for a build.
+    """
+    with _runtime_lock:
+        if 'value' in _runtime:
+            return _runtime['value']
+        value = None
+        try:
+            runtime_dir = os.path.join(JAVA_RUNTIME_DIR, _jdk_key())
+            if os.path.isdir(runtime_dir):
+                value = _runtime_value(runtime_dir)
+            else:
+                logger.warning('Java runtime not built (manage.py build_runtimes), using javac and a plain JVM')
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning('Java runtime unavailable, using javac and a plain JVM: %s', e)
+        _runtime['value'] = value
+        return value
+
+
+def cds_archive():
+    """
+    Path of the class-data-sharing archive, or None
+    """
+    runtime = get_runtime() if JAVA_CDS else None
+    return runtime and runtime['archive']
+
+
+class CompileServer:
+    def __init__(self, runtime):
+        options = ['-XX:+UseSerialGC', f'-Xmx{JAVA_COMPILE_SERVER_HEAP_MB}m', '-XX:-UsePerfData', '-Xshare:auto']
+        if runtime['archive']:
+            options.append(f"-XX:SharedArchiveFile={runtime['archive']}")
+        self.uses = 0
+        self.proc = subprocess.Popen(
+            ['java', *options, '-cp', runtime['dir'], 'CompileServer'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=runtime['dir'],
+            start_new_session=True
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def compile(self, source_path, out_dir, timeout):
+        """
+        Returns (status, diagnostics); raises TimeoutError past timeout seconds
+        and BrokenPipeError if the server is gone
+        """
+        self.uses += 1
+        deadline = time.monotonic() + timeout
+        self.proc.stdin.write(f'{source_path}\t{out_dir}\n'.encode())
+        self.proc.stdin.flush()
+
+        fd = self.proc.stdout.fileno()
+        data = b''
+        while True:
+            header, newline, body = data.partition(b'\n')
+            if newline:
+                status, length = map(int, header.split())
+                if len(body) >= length:
+                    return status, body[:length].decode(errors='replace')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise BrokenPipeError('Compile server exited')
+            data += chunk
+
+    def close(self):
+        if self.alive():
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+_server = None
+_server_pid = None
+_server_lock = threading.Lock()
+
+
+def compile_java(cmd, source_path, out_dir, timeout):
+    """
+    Compile source_path into out_dir on this process's compile server.
+    Returns a subprocess.CompletedProcess (cmd is only recorded in it) like
+    running javac would, raising subprocess.TimeoutExpired the same way, or
+    None when there is no compile server and javac should be run instead.
+    Compilations in one process take turns on its server.
+    """
+    global _server, _server_pid
+    if not JAVA_COMPILE_SERVER:
+        return None
+    runtime = get_runtime()
+    if runtime is None:
+        return None
+
+    with _server_lock:
+        for attempt in range(2):
+            if _server is None or _server_pid != os.getpid() or not _server.alive():
+                # Servers inherited through fork belong to the parent
+                _server = CompileServer(runtime)
+                _server_pid = os.getpid()
+            try:
+                status, diagnostics = _server.compile(source_path, out_dir, timeout)
+                break
+            except TimeoutError:
+                _server.close()
+                _server = None
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            except (BrokenPipeError, ValueError):
+                # Died (or answered garbage) between requests: one fresh server
+                _server.close()
+                _server = None
+                if attempt:
+                    raise
+        if _server.uses >= JAVA_COMPILE_SERVER_MAX_USES:
+            _server.close()
+            _server = None
+    return subprocess.CompletedProcess(cmd, status, '', diagnostics)
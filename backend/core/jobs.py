@@ -0,0 +1,84 @@
+import contextvars
+import logging
+import os
+import re
+import time
+
+# Job identity. Every execution gets a ULID: 48 bits of millisecond timestamp
+# then 80 random bits, so ids sort by creation time and do not collide across
+# processes or replicas however many are made in the same millisecond. They
+# are lower-case Crockford base32 (26 characters), valid in Kubernetes names.
+#
+# A correlation id follows one API request through the web process, the
+# Celery tasks it queues (as a task header) and the executor (as a label on
+# Kubernetes Jobs), and is added to every log record as %(correlation_id)s.
+# Clients may send their own in X-Request-ID; it is echoed in the response.
+CORRELATION_HEADER = 'X-Request-ID'
+# Celery task header carrying the correlation id (AMQP's own correlation_id is the task id)
+TASK_HEADER = 'request_correlation_id'
+# Also a valid Kubernetes label value
+_VALID_CORRELATION_ID = re.compile(r'^[A-Za-z0-9]([A-Za-z0-9_.-]{0,61}[A-Za-z0-9])?$')
+_CROCKFORD = '0123456789abcdefghjkmnpqrstvwxyz'
+
+_correlation_id = contextvars.ContextVar('correlation_id', default=None)
+
+
+def new_job_id():
+    value = (int(time.time() * 1000) << 80) | int.from_bytes(os.urandom(10), 'big')
+    chars = []
+    for _ in range(26):
+        value, index = divmod(value, 32)
+        chars.append(_CROCKFORD[index])
+    return ''.join(reversed(chars))
+
+
+def job_name(job_id):
+    """
+    Kubernetes Job name of an execution
+    """
+    return f'oj-job-{job_id}'
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+def set_correlation_id(value):
+    """
+    Make value (or a new id when it is missing or malformed) the current
+    correlation id; returns a token for reset_correlation_id()
+    """
+    if not value or not _VALID_CORRELATION_ID.match(value):
+        value = new_job_id()
+    return _correlation_id.set(value)
+
+
+def reset_correlation_id(token):
+    _correlation_id.reset(token)
+
+
+def clear_correlation_id():
+    _correlation_id.set(None)
+
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = _correlation_id.get() or '-'
+        return True
+
+
+class CorrelationIdMiddleware:
+    """
+    Take the correlation id from X-Request-ID or start a new one for each request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_correlation_id(request.headers.get(CORRELATION_HEADER))
+        try:
+            response = self.get_response(request)
+            response[CORRELATION_HEADER] = get_correlation_id()
+            return response
+        finally:
+            reset_correlation_id(token)
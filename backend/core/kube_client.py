@@ -0,0 +1,57 @@
+import os
+import threading
+
+KUBERNETES_NAMESPACE = os.environ.get('KUBERNETES_NAMESPACE', 'default')
+# Upper bound on concurrent HTTP connections to the API server per process
+KUBERNETES_POOL_MAXSIZE = int(os.environ.get('KUBERNETES_POOL_MAXSIZE', 16))
+
+_clients = None
+_configuration = None
+_clients_lock = threading.Lock()
+
+
+def get_kube_clients():
+    """
+    Return the process-wide (BatchV1Api, CoreV1Api) pair.
+    Config is loaded once and both APIs share one pooled ApiClient.
+    Tests can inject fakes with set_kube_clients().
+    """
+    global _clients, _configuration
+    with _clients_lock:
+        if _clients is None:
+            from kubernetes import client, config
+            configuration = client.Configuration()
+            try:
+                config.load_kube_config(client_configuration=configuration)
+            except Exception:
+                config.load_incluster_config(client_configuration=configuration)
+            configuration.connection_pool_maxsize = KUBERNETES_POOL_MAXSIZE
+            api_client = client.ApiClient(configuration)
+            _configuration = configuration
+            _clients = (client.BatchV1Api(api_client), client.CoreV1Api(api_client))
+        return _clients
+
+
+def get_exec_api():
+    """
+    CoreV1Api for exec/attach streams. kubernetes.stream.stream() temporarily swaps
+    the request method of the ApiClient it is given, so streams must not use the
+    shared client that other threads are issuing requests on.
+    """
+    from kubernetes import client
+
+    batch_v1, core_v1 = get_kube_clients()
+    if _configuration is None:
+        # Injected clients (tests): nothing to copy the config from
+        return core_v1
+    return client.CoreV1Api(client.ApiClient(_configuration))
+
+
+def set_kube_clients(batch_v1, core_v1):
+    """
+    Replace the shared clients, e.g. with mocks or clients pointed at a fake API server
+    """
+    global _clients, _configuration
+    with _clients_lock:
+        _clients = (batch_v1, core_v1) if batch_v1 is not None else None
+        _configuration = None
@@ -0,0 +1,334 @@
+import io
+import logging
+import math
+import os
+import shlex
+import tarfile
+import threading
+import time
+
+from .kube_client import get_kube_clients, get_exec_api, KUBERNETES_NAMESPACE
+from .redis_client import get_redis
+from .sandbox import Cancelled, CANCEL_POLL_INTERVAL, OUTPUT_LIMIT_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Warm runner pods: instead of a Job per execution, keep KUBERNETES_POOL_SIZE
+# idle pods per language running `sleep infinity`. A program claims an idle
+# pod, streams its source and inputs into it over exec (as tar archives, like
+# `kubectl cp`, so runner images need tar), compiles and runs there, then
+# deletes the pod and starts a replacement (see executors.KubernetesPoolExecutor).
+# A claimed pod carries a lease (the time it was claimed or last used, in
+# LEASE_ANNOTATION); busy pods whose lease is older than
+# KUBERNETES_POD_LEASE_TTL seconds belong to a worker that died and are
+# deleted the next time the pool is replenished. Replenishing runs once per
+# language at a time across all workers.
+KUBERNETES_POOL_SIZE = int(os.environ.get('KUBERNETES_POOL_SIZE', 2))
+KUBERNETES_POD_LEASE_TTL = int(os.environ.get('KUBERNETES_POD_LEASE_TTL', 600))
+RUNNER_LABEL = 'algozen/runner'
+LANGUAGE_LABEL = 'algozen/language'
+STATE_LABEL = 'algozen/state'
+LEASE_ANNOTATION = 'algozen/leased-at'
+REPLENISH_LOCK_KEY = 'kube_pool:replenish:{}'
+REPLENISH_LOCK_TIMEOUT = 60
+# Runner pods keep their workspace in memory, which counts against the pod's
+# memory limit. It is sized for one test input of up to
+# KUBERNETES_POD_INPUT_LIMIT_MB (inputs are removed after their run), a file
+# of OUTPUT_LIMIT_BYTES written by the program, and the source and compiled
+# program; the pod's memory limit is the program's (executors.POD_MEMORY_LIMIT_MB)
+# plus the workspace.
+KUBERNETES_POD_INPUT_LIMIT_MB = int(os.environ.get('KUBERNETES_POD_INPUT_LIMIT_MB', 64))
+POD_PROGRAM_MB = 32
+# Bytes shipped into a pod per websocket message
+STDIN_CHUNK_BYTES = 64 * 1024
+
+
+def pod_workspace_mb():
+    return KUBERNETES_POD_INPUT_LIMIT_MB + math.ceil(OUTPUT_LIMIT_BYTES / (1024 * 1024)) + POD_PROGRAM_MB
+
+
+def _selector(language, state):
+    return f'{RUNNER_LABEL}=true,{LANGUAGE_LABEL}={language},{STATE_LABEL}={state}'
+
+
+def build_runner_pod(language):
+    """
+    Locked-down, idle runner pod for one language (a languages.LanguageDescriptor)
+    """
+    from kubernetes import client
+    from .executors import POD_MEMORY_LIMIT_MB
+
+    container = client.V1Container(
+        name="runner",
+        image=language.image,
+        command=["sleep", "infinity"],
+        working_dir="/code",
+        resources=client.V1ResourceRequirements(
+            limits={"cpu": "1", "memory": f"{POD_MEMORY_LIMIT_MB + pod_workspace_mb()}Mi"},
+            requests={"cpu": "0.2", "memory": "128Mi"}
+        ),
+        volume_mounts=[client.V1VolumeMount(
+            mount_path="/code",
+            name="code-volume"
+        )],
+        security_context=client.V1SecurityContext(
+            run_as_user=1000,
+            run_as_group=3000,
+            allow_privilege_escalation=False,
+            capabilities=client.V1Capabilities(drop=["ALL"]),
+            read_only_root_filesystem=True
+        ),
+    )
+    # Root filesystem is read-only, so the workspace lives in a memory-backed emptyDir
+    volume = client.V1Volume(
+        name="code-volume",
+        empty_dir=client.V1EmptyDirVolumeSource(medium="Memory", size_limit=f"{pod_workspace_mb()}Mi")
+    )
+    return client.V1Pod(
+        api_version="v1",
+        kind="Pod",
+        metadata=client.V1ObjectMeta(
+            generate_name=f"oj-runner-{language.name}-",
+            labels={RUNNER_LABEL: 'true', LANGUAGE_LABEL: language.name, STATE_LABEL: 'idle'}
+        ),
+        spec=client.V1PodSpec(
+            containers=[container],
+            restart_policy="Never",
+            volumes=[volume],
+            automount_service_account_token=False,
+            enable_service_links=False,
+            security_context=client.V1PodSecurityContext(
+                run_as_non_root=True,
+                seccomp_profile=client.V1SeccompProfile(type="RuntimeDefault")
+            )
+        )
+    )
+
+
+def _leased_at(pod):
+    leased = (pod.metadata.annotations or {}).get(LEASE_ANNOTATION)
+    if leased is not None:
+        return float(leased)
+    return pod.metadata.creation_timestamp.timestamp()
+
+
+def reap_pods(language):
+    """
+    Delete the language's busy pods whose lease expired and idle pods that
+    stopped running
+    """
+    core_v1 = get_kube_clients()[1]
+    now = time.time()
+    busy = core_v1.list_namespaced_pod(namespace=KUBERNETES_NAMESPACE, label_selector=_selector(language.name, 'busy'))
+    for pod in busy.items:
+        if now - _leased_at(pod) > KUBERNETES_POD_LEASE_TTL:
+            logger.warning('Reclaiming runner pod %s, its lease expired', pod.metadata.name)
+            release_pod(pod.metadata.name)
+    idle = core_v1.list_namespaced_pod(namespace=KUBERNETES_NAMESPACE, label_selector=_selector(language.name, 'idle'))
+    for pod in idle.items:
+        if pod.status.phase not in ('Pending', 'Running'):
+            release_pod(pod.metadata.name)
+
+
+_replenishing = set()
+_replenishing_lock = threading.Lock()
+
+
+def replenish_pool(language):
+    """
+    Reap dead pods, then create idle runner pods until the language has
+    KUBERNETES_POOL_SIZE of them. Skipped while another replenish of the
+    language runs in this process or, through a Redis lock, any other worker;
+    without Redis only the process guard applies.
+    """
+    with _replenishing_lock:
+        if language.name in _replenishing:
+            return
+        _replenishing.add(language.name)
+    try:
+        lock = None
+        try:
+            lock = get_redis().lock(REPLENISH_LOCK_KEY.format(language.name), timeout=REPLENISH_LOCK_TIMEOUT)
+            if not lock.acquire(blocking=False):
+                return
+        except Exception as e:
+            logger.warning('Replenish lock unavailable, replenishing anyway: %s', e)
+            lock = None
+        try:
+            reap_pods(language)
+            core_v1 = get_kube_clients()[1]
+            pods = core_v1.list_namespaced_pod(
+                namespace=KUBERNETES_NAMESPACE,
+                label_selector=_selector(language.name, 'idle')
+            )
+            alive = [p for p in pods.items if p.status.phase in ('Pending', 'Running')]
+            for _ in range(KUBERNETES_POOL_SIZE - len(alive)):
+                core_v1.create_namespaced_pod(namespace=KUBERNETES_NAMESPACE, body=build_runner_pod(language))
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except Exception:
+                    # Expired or Redis went away; it times out on its own
+                    pass
+    finally:
+        with _replenishing_lock:
+            _replenishing.discard(language.name)
+
+
+def claim_pod(language):
+    """
+    Atomically mark one running idle pod as busy, leased from now, and return its name, or None.
+    The label patch carries the pod's resourceVersion, so two workers racing
+    for the same pod cannot both win (the loser gets 409 Conflict).
+    """
+    from kubernetes.client.rest import ApiException
+
+    core_v1 = get_kube_clients()[1]
+    pods = core_v1.list_namespaced_pod(
+        namespace=KUBERNETES_NAMESPACE,
+        label_selector=_selector(language, 'idle'),
+        field_selector='status.phase=Running'
+    )
+    for pod in pods.items:
+        patch = {'metadata': {
+            'resourceVersion': pod.metadata.resource_version,
+            'labels': {STATE_LABEL: 'busy'},
+            'annotations': {LEASE_ANNOTATION: str(time.time())},
+        }}
+        try:
+            core_v1.patch_namespaced_pod(pod.metadata.name, KUBERNETES_NAMESPACE, patch)
+        except ApiException as e:
+            if e.status in (404, 409):
+                continue
+            raise
+        return pod.metadata.name
+    return None
+
+
+class _StdinWriter:
+    """
+    File-like writer that sends what it is given to an exec's stdin
+    """
+    def __init__(self, resp):
+        self.resp = resp
+
+    def write(self, data):
+        self.resp.write_stdin(data)
+        return len(data)
+
+
+def _send_workspace_tar(resp, files):
+    """
+    Stream files ({relative path: bytes, or the path of a local file}) to the
+    exec's stdin as a tar archive, a chunk at a time
+    """
+    with tarfile.open(fileobj=_StdinWriter(resp), mode='w|', bufsize=STDIN_CHUNK_BYTES) as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.mtime = int(time.time())
+            if isinstance(data, bytes):
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+            else:
+                with open(data, 'rb') as f:
+                    info.size = os.fstat(f.fileno()).st_size
+                    tar.addfile(info, f)
+
+
+def exec_in_pod(pod_name, steps, files, timeout, stdin_file=None, cancel=None, stdout=None, stderr=None,
+                keep_files=True):
+    """
+    Ship files ({relative path: bytes, or the path of a local file}) into the
+    pod's /code and run steps (argument lists) there one after the other,
+    stopping at the first failure, with stdin from stdin_file. Unless
+    keep_files, the shipped files are removed once the steps finish.
+    The steps' stdout and stderr are written to the binary files stdout and
+    stderr (dropped when None), at most OUTPUT_LIMIT_BYTES of each; nothing
+    is held in memory. Returns (returncode, exceeded): returncode is None
+    when the wall-clock timeout was hit or, with exceeded set, when an output
+    reached the limit and reading stopped. Raises sandbox.Cancelled once
+    cancel (a threading.Event) is set.
+    """
+    from kubernetes.stream import stream
+
+    exec_api = get_exec_api()
+    # tar stops reading at the end-of-archive marker, then the steps run
+    script = 'tar xmf - -C /code && cd /code'
+    if steps:
+        script += f" && ({' && '.join(shlex.join(step) for step in steps)})"
+        if stdin_file:
+            script += f' < {shlex.quote(stdin_file)}'
+    if not keep_files and files:
+        script += f'; status=$?; rm -f -- {shlex.join(files)}; exit $status'
+    resp = stream(
+        exec_api.connect_get_namespaced_pod_exec,
+        pod_name,
+        KUBERNETES_NAMESPACE,
+        command=['/bin/sh', '-c', script],
+        stdin=True, stdout=True, stderr=True, tty=False,
+        binary=True,
+        _preload_content=False
+    )
+    written = {'stdout': 0, 'stderr': 0}
+
+    def save(name, sink, data):
+        room = OUTPUT_LIMIT_BYTES - written[name]
+        if sink is not None:
+            sink.write(data[:room])
+        written[name] += min(len(data), room)
+        return written[name] < OUTPUT_LIMIT_BYTES
+
+    try:
+        _send_workspace_tar(resp, files)
+        deadline = time.monotonic() + timeout
+        while resp.is_open():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None, False
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            resp.update(timeout=min(remaining, 1 if cancel is None else CANCEL_POLL_INTERVAL))
+            if resp.peek_stdout() and not save('stdout', stdout, resp.read_stdout()):
+                return None, True
+            if resp.peek_stderr() and not save('stderr', stderr, resp.read_stderr()):
+                return None, True
+        return resp.returncode, False
+    finally:
+        resp.close()
+
+
+def kill_in_pod(pod_name, pid_file):
+    """
+    Kill the process group whose leader wrote its pid to pid_file (relative
+    to /code), e.g. a run whose output is no longer read (see executors.pod_limited)
+    """
+    script = f'kill -KILL -"$(cat {shlex.quote(pid_file)})"'
+    try:
+        exec_in_pod(pod_name, [['/bin/sh', '-c', script]], {}, timeout=10)
+    except Exception as e:
+        logger.warning('Could not stop the run in runner pod %s: %s', pod_name, e)
+
+
+def renew_lease(pod_name):
+    """
+    Restart the lease of a claimed pod, so one judging a long submission is not reaped
+    """
+    core_v1 = get_kube_clients()[1]
+    patch = {'metadata': {'annotations': {LEASE_ANNOTATION: str(time.time())}}}
+    try:
+        core_v1.patch_namespaced_pod(pod_name, KUBERNETES_NAMESPACE, patch)
+    except Exception as e:
+        logger.warning('Could not renew the lease of runner pod %s: %s', pod_name, e)
+
+
+def release_pod(pod_name):
+    """
+    Runner pods are single use: delete immediately, no grace period
+    """
+    core_v1 = get_kube_clients()[1]
+    try:
+        core_v1.delete_namespaced_pod(pod_name, KUBERNETES_NAMESPACE, grace_period_seconds=0)
+    except Exception:
+        pass
+
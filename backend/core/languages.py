@@ -0,0 +1,79 @@
+from collections import namedtuple
+
+# Declarative runtime descriptors, one per language users can submit in.
+# Commands are argument lists with placeholders filled per run:
+#   {dir}     - the program's workspace (/code inside Kubernetes pods)
+#   {source}  - {dir}/<source_file>
+#   {memory}  - the run's memory limit in MB
+# compile is None for interpreted languages. artifacts are the compiler's
+# outputs (glob patterns, relative to {dir}) kept in the compile cache.
+# compile_timeout is the compile-time budget in seconds of wall time, separate
+# from (and not counted against) the problem's time limit for the run.
+# address_space_limit=False is for runtimes such as the JVM that reserve far
+# more address space than they use; they get the limit through their own
+# flag ({memory}) instead of RLIMIT_AS. Under the subprocess executor,
+# warm_pool runs the program in a pre-started interpreter (core.python_pool),
+# compile_server compiles through the warm javac of core.java_runtime instead
+# of running the compile command, and class_data_sharing starts the JVM from
+# core.java_runtime's class-data-sharing archive. precompiled_headers are
+# headers compiled once with the compile command's flags (core.precompiled_headers)
+# so that submissions including them skip parsing them.
+# A new runtime (PyPy, other compiler flags) is one more entry here; the
+# executors and the judge need no changes.
+LanguageDescriptor = namedtuple('LanguageDescriptor', [
+    'name', 'source_file', 'image', 'compile', 'run', 'artifacts',
+    'compile_timeout', 'address_space_limit', 'warm_pool', 'compile_server',
+    'class_data_sharing', 'precompiled_headers',
+], defaults=[(), 10, True, False, False, False, ()])
+
+LANGUAGES = {
+    'python': LanguageDescriptor(
+        name='python',
+        source_file='user_code.py',
+        image='python:3.10-slim',
+        compile=None,
+        run=['python', '{source}'],
+        warm_pool=True,
+    ),
+    'cpp': LanguageDescriptor(
+        name='cpp',
+        source_file='user_code.cpp',
+        image='gcc:latest',
+        compile=['g++', '-O2', '-std=c++17', '{source}', '-o', '{dir}/a.out'],
+        run=['{dir}/a.out'],
+        artifacts=('a.out',),
+        precompiled_headers=('bits/stdc++.h',),
+    ),
+    'java': LanguageDescriptor(
+        name='java',
+        source_file='UserCode.java',
+        image='openjdk:latest',
+        compile=['javac', '{source}'],
+        # Judged programs are short-lived and single-threaded: the serial
+        # collector starts fastest and has no GC threads, no perf-data file is
+        # mapped, and JVM warnings go to stderr so they never mix with output
+        run=['java', '-Xmx{memory}m', '-XX:+UseSerialGC', '-XX:-UsePerfData', '-Xshare:auto',
+             '-Xlog:disable', '-Xlog:all=warning:stderr', '-cp', '{dir}', 'UserCode'],
+        artifacts=('*.class',),
+        address_space_limit=False,
+        compile_server=True,
+        class_data_sharing=True,
+    ),
+}
+
+
+def get_language(name):
+    """
+    Descriptor for a language name (case-insensitive), or None if unsupported
+    """
+    return LANGUAGES.get((name or '').lower())
+
+
+def format_cmd(template, work_dir, source_file, memory_limit_mb=None):
+    values = {
+        'dir': work_dir,
+        'source': f'{work_dir}/{source_file}',
+        'memory': memory_limit_mb,
+    }
+    return [part.format(**values) for part in template]
+
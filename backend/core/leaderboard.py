@@ -0,0 +1,176 @@
+import logging
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+
+from .models import SolvedProblem
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Leaderboards kept in Redis sorted sets, scored by the number of problems a
+# user has solved: one global board, one per User.university and one per
+# User.year_of_passing. Scores move by ZINCRBY when a SolvedProblem is created
+# or deleted (see core/signals.py), so ranking never scans the users table;
+# reconcile_leaderboards() rebuilds every board from the database to repair
+# drift (missed updates while Redis was down, users changing university).
+# Users on the same score share a rank.
+GLOBAL_KEY = 'leaderboard:global'
+UNIVERSITY_KEY = 'leaderboard:university:{}'
+YEAR_KEY = 'leaderboard:year:{}'
+# Every board key written, so reconciliation can drop boards nobody is on any more
+BOARDS_KEY = 'leaderboard:boards'
+SCOPES = ('global', 'university', 'year')
+RECONCILE_BATCH_SIZE = 1000
+
+
+def board_key(scope, value=None):
+    """
+    Redis key of a board; None for a university or year board without a value
+    """
+    if scope == 'global':
+        return GLOBAL_KEY
+    value = (value or '').strip()
+    if not value:
+        return None
+    if scope == 'university':
+        return UNIVERSITY_KEY.format(value)
+    if scope == 'year':
+        return YEAR_KEY.format(value)
+    raise ValueError(f'Unknown leaderboard scope: {scope}')
+
+
+def user_boards(university, year_of_passing):
+    """
+    {scope: (value, key)} of the boards a user with these profile fields is on
+    """
+    boards = {'global': (None, GLOBAL_KEY)}
+    for scope, value in (('university', university), ('year', year_of_passing)):
+        key = board_key(scope, value)
+        if key:
+            boards[scope] = (value.strip(), key)
+    return boards
+
+
+def record_solve(user_id, delta=1):
+    """
+    Move a user's score on each of their boards by delta (one round trip).
+    Fails open: a missed update is repaired by the next reconciliation.
+    """
+    profile = get_user_model().objects.filter(pk=user_id).values_list(
+        'university', 'year_of_passing').first()
+    if profile is None:
+        return
+    keys = [key for value, key in user_boards(*profile).values()]
+    try:
+        pipe = get_redis().pipeline()
+        for key in keys:
+            pipe.zincrby(key, delta, user_id)
+        pipe.sadd(BOARDS_KEY, *keys)
+        if delta < 0:
+            # A user back at zero solved problems is not ranked at all
+            for key in keys:
+                pipe.zremrangebyscore(key, '-inf', 0)
+        pipe.execute()
+    except Exception:
+        logger.warning('Leaderboard unavailable, score of user %s not updated', user_id, exc_info=True)
+
+
+def remove_user(user):
+    """
+    Take a user off all of their boards, e.g. once the account is deleted
+    """
+    try:
+        pipe = get_redis().pipeline()
+        for value, key in user_boards(user.university, user.year_of_passing).values():
+            pipe.zrem(key, user.pk)
+        pipe.execute()
+    except Exception:
+        logger.warning('Leaderboard unavailable, user %s not removed', user.pk, exc_info=True)
+
+
+def top(scope='global', value=None, limit=50):
+    """
+    Highest scores on a board: [{'rank', 'user_id', 'username', 'solved'}]
+    """
+    key = board_key(scope, value)
+    if key is None:
+        return []
+    entries = get_redis().zrevrange(key, 0, limit - 1, withscores=True)
+    user_ids = [int(member) for member, score in entries]
+    usernames = dict(get_user_model().objects.filter(pk__in=user_ids).values_list('id', 'username'))
+    results = []
+    rank = 0
+    previous = None
+    for position, (user_id, (member, score)) in enumerate(zip(user_ids, entries), start=1):
+        if score != previous:
+            rank, previous = position, score
+        results.append({
+            'rank': rank,
+            'user_id': user_id,
+            'username': usernames.get(user_id),
+            'solved': int(score),
+        })
+    return results
+
+
+def user_ranks(user):
+    """
+    A user's rank and score on each of their boards, in two round trips.
+    Each lookup is O(log n): ZSCORE, then ZCOUNT of the strictly higher scores.
+    """
+    boards = user_boards(user.university, user.year_of_passing)
+    pipe = get_redis().pipeline(transaction=False)
+    for value, key in boards.values():
+        pipe.zscore(key, user.pk)
+    scores = pipe.execute()
+    pipe = get_redis().pipeline(transaction=False)
+    for (value, key), score in zip(boards.values(), scores):
+        if score is not None:
+            pipe.zcount(key, f'({score}', '+inf')
+            pipe.zcard(key)
+    counts = iter(pipe.execute())
+    ranks = {}
+    for (scope, (value, key)), score in zip(boards.items(), scores):
+        if score is None:
+            ranks[scope] = {'value': value, 'rank': None, 'solved': 0, 'total': None}
+            continue
+        ahead, total = next(counts), next(counts)
+        ranks[scope] = {'value': value, 'rank': ahead + 1, 'solved': int(score), 'total': total}
+    return ranks
+
+
+def reconcile_leaderboards():
+    """
+    Rebuild every board from SolvedProblem. Boards are written under temporary
+    keys and swapped in with RENAME, so readers never see a half-built board.
+    Returns the number of users ranked and boards written.
+    """
+    client = get_redis()
+    suffix = f':rebuild:{uuid.uuid4().hex}'
+    rows = SolvedProblem.objects.values(
+        'user_id', 'user__university', 'user__year_of_passing').annotate(solved=Count('id')).order_by()
+    boards = set()
+    users = 0
+    pipe = client.pipeline(transaction=False)
+    for row in rows.iterator():
+        for value, key in user_boards(row['user__university'], row['user__year_of_passing']).values():
+            pipe.zadd(key + suffix, {row['user_id']: row['solved']})
+            boards.add(key)
+        users += 1
+        if len(pipe) >= RECONCILE_BATCH_SIZE:
+            pipe.execute()
+    pipe.execute()
+
+    stale = {member.decode() for member in client.smembers(BOARDS_KEY)} - boards
+    pipe = client.pipeline()
+    for key in boards:
+        pipe.rename(key + suffix, key)
+    if stale:
+        pipe.delete(*stale)
+    pipe.delete(BOARDS_KEY)
+    if boards:
+        pipe.sadd(BOARDS_KEY, *boards)
+    pipe.execute()
+    return {'users': users, 'boards': len(boards), 'removed': len(stale)}
@@ -0,0 +1,146 @@
+import logging
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Distributed counting semaphore for code executions, shared by every web
+# process, Celery worker and replica. Each key is a sorted set of lease tokens
+# scored by their expiry time, so a lease whose holder crashed without
+# releasing it simply ages out. A new lease lasts EXECUTION_QUEUE_TTL seconds,
+# long enough to wait in the Celery queue; once its task runs, the worker
+# renews it for EXECUTION_LEASE_TTL seconds at a time (hold_execution_slot),
+# so a lease of a crashed worker is reclaimed soon after.
+GLOBAL_KEY = 'limiter:executions:global'
+USER_KEY = 'limiter:executions:user:{}'
+
+_ACQUIRE_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+local ttl = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[3]) then
+    return 0
+end
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now + ttl, ARGV[4])
+    if redis.call('TTL', key) < ttl then
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+return 1
+"""
+
+# Also puts back a lease that already aged out, so a running task is always counted
+_RENEW_SCRIPT = """
+local now = tonumber(redis.call('TIME')[1])
+local ttl = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now + ttl, ARGV[2])
+    if redis.call('TTL', key) < ttl then
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+return 1
+"""
+
+_acquire = None
+_renew = None
+
+
+def acquire_execution_slot(user_id):
+    """
+    Take one global and one per-user execution slot for a signed-in user
+    (views that take slots require authentication; anonymous callers would
+    all share one bucket).
+    Returns a JSON-serializable lease to hand to release_execution_slot(), or None
+    when either limit is reached. Fails open if Redis is unreachable.
+    """
+    global _acquire
+    if user_id is None:
+        raise ValueError('Execution slots are per user; the request must be authenticated')
+    token = uuid.uuid4().hex
+    lease = {'token': token, 'user': user_id}
+    try:
+        client = get_redis()
+        if _acquire is None:
+            _acquire = client.register_script(_ACQUIRE_SCRIPT)
+        granted = _acquire(
+            keys=[GLOBAL_KEY, USER_KEY.format(user_id)],
+            args=[settings.EXECUTION_QUEUE_TTL, settings.EXECUTION_GLOBAL_LIMIT,
+                  settings.EXECUTION_USER_LIMIT, token],
+            client=client
+        )
+    except Exception as e:
+        logger.warning('Execution limiter unavailable, admitting request: %s', e)
+        return lease
+    return lease if granted else None
+
+
+def release_execution_slot(lease):
+    """
+    Give back a lease from acquire_execution_slot(). Safe to call with None or twice.
+    """
+    if not lease:
+        return
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.zrem(GLOBAL_KEY, lease['token'])
+        pipe.zrem(USER_KEY.format(lease['user']), lease['token'])
+        pipe.execute()
+    except Exception as e:
+        logger.warning('Could not release execution slot, it will expire: %s', e)
+
+
+def renew_execution_slot(lease):
+    """
+    Extend a lease to EXECUTION_LEASE_TTL seconds from now. Fails open.
+    """
+    global _renew
+    if not lease:
+        return
+    try:
+        client = get_redis()
+        if _renew is None:
+            _renew = client.register_script(_RENEW_SCRIPT)
+        _renew(keys=[GLOBAL_KEY, USER_KEY.format(lease['user'])],
+               args=[settings.EXECUTION_LEASE_TTL, lease['token']], client=client)
+    except Exception as e:
+        logger.warning('Could not renew execution slot: %s', e)
+
+
+@contextmanager
+def hold_execution_slot(lease, interval=None):
+    """
+    Keep a lease taken for a task while the task runs, renewing it every
+    interval seconds (a third of EXECUTION_LEASE_TTL by default), and
+    release it when the block exits. A None lease is a no-op.
+    """
+    if not lease:
+        yield
+        return
+    interval = interval or settings.EXECUTION_LEASE_TTL / 3
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(interval):
+            renew_execution_slot(lease)
+
+    renew_execution_slot(lease)
+    renewer = threading.Thread(target=renew, daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        done.set()
+        renewer.join()
+        release_execution_slot(lease)
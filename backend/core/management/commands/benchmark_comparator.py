@@ -0,0 +1,46 @@
+import io
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.comparator import exact_match, floats_match, lines_match, tokens_match
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the output checkers on generated multi-megabyte outputs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=float, default=16, help='Approximate output size')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        target = int(options['size_mb'] * 1024 * 1024)
+        lines, size = [], 0
+        while size < target:
+            line = ' '.join(str(rng.randint(-10**9, 10**9)) for _ in range(10)).encode() + b'\n'
+            lines.append(line)
+            size += len(line)
+        data = b''.join(lines)
+        floats = b'\n'.join(b'%.9f' % (rng.random() * 1000) for _ in range(len(data) // 16))
+        floats_off = b'\n'.join(b'%.9f' % (float(x) + 1e-8) for x in floats.split())
+        self.stdout.write(f'{len(data) / 1024 / 1024:.1f} MB of integers, {len(floats) / 1024 / 1024:.1f} MB of floats')
+
+        cases = [
+            ('baseline split()', lambda: data.split() == data.split(), data),
+            ('token', lambda: tokens_match(io.BytesIO(data), io.BytesIO(data)), data),
+            ('exact', lambda: exact_match(io.BytesIO(data), io.BytesIO(data)), data),
+            ('line', lambda: lines_match(io.BytesIO(data), io.BytesIO(data)), data),
+            ('float (identical)', lambda: floats_match(io.BytesIO(floats), io.BytesIO(floats), 1e-6), floats),
+            ('float (all within tolerance)', lambda: floats_match(io.BytesIO(floats_off), io.BytesIO(floats), 1e-6), floats),
+        ]
+        for name, fn, payload in cases:
+            best = None
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                assert fn()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            mb = len(payload) / 1024 / 1024
+            self.stdout.write(f'{name:30s} {best * 1000:9.1f} ms  {mb / best:8.1f} MB/s')
@@ -0,0 +1,90 @@
+import os
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import executors
+from core.executors import get_executor
+from core.languages import LANGUAGES
+from core.precompiled_headers import build_precompiled_headers
+from core.workspace import workspace
+
+# Typical competitive-programming submission and a minimal one, for contrast
+PROGRAMS = {
+    'bits/stdc++.h': '''#include <bits/stdc++.h>
+using namespace std;
+// variant %d
+int main() {
+    ios::sync_with_stdio(false);
+    cin.tie(nullptr);
+    int n;
+    cin >> n;
+    vector<long long> a(n);
+    for (auto &x : a) cin >> x;
+    sort(a.begin(), a.end());
+    map<long long, int> seen;
+    for (auto x : a) seen[x %% 7]++;
+    cout << accumulate(a.begin(), a.end(), 0LL) << ' ' << seen.size() << '\\n';
+}
+''',
+    'cstdio': '''#include <cstdio>
+// variant %d
+int main() {
+    int n;
+    long long sum = 0, x;
+    if (scanf("%%d", &n) != 1) return 0;
+    for (int i = 0; i < n; i++) { scanf("%%lld", &x); sum += x; }
+    printf("%%lld\\n", sum);
+}
+''',
+}
+
+
+class Command(BaseCommand):
+    help = ('Compile time of C++ submissions on the subprocess executor: bare g++, the -O2 -std=c++17 '
+            'profile, and the profile with precompiled headers')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+
+    def handle(self, *args, **options):
+        tuned = LANGUAGES['cpp']
+        profiles = [
+            # How C++ was compiled before
+            ('g++', tuned._replace(compile=['g++', '{source}', '-o', '{dir}/a.out'], precompiled_headers=())),
+            ('-O2 -std=c++17', tuned._replace(precompiled_headers=())),
+            ('-O2 -std=c++17 + PCH', tuned),
+        ]
+        started = time.perf_counter()
+        if build_precompiled_headers(tuned) is None:
+            raise CommandError('Precompiled headers could not be built (see the log)')
+        self.stdout.write(f'Precompiled headers ready in {time.perf_counter() - started:.1f}s '
+                          f'(built once per host, compiler and flags)')
+
+        # Every compilation is of a different source, as separate submissions would be
+        cache_enabled = executors.COMPILE_CACHE_ENABLED
+        executors.COMPILE_CACHE_ENABLED = False
+        try:
+            self.stdout.write(f"{'':22s} {'':16s} {'median':>9s} {'min':>9s} {'max':>9s}  (ms)")
+            for header, program in PROGRAMS.items():
+                for label, language in profiles:
+                    samples = [self.measure(language, program % variant) for variant in range(options['runs'])]
+                    self.stdout.write(f'{label:22s} {header:16s} {statistics.median(samples):9.0f} '
+                                      f'{min(samples):9.0f} {max(samples):9.0f}')
+        finally:
+            executors.COMPILE_CACHE_ENABLED = cache_enabled
+
+    def measure(self, language, code):
+        """
+        Milliseconds of wall time to compile code
+        """
+        with workspace() as work_dir:
+            start = time.perf_counter()
+            program = get_executor('subprocess').compile(language, code, work_dir)
+            elapsed = time.perf_counter() - start
+            if 'error' in program:
+                raise CommandError(program['error'])
+            if not os.path.exists(os.path.join(work_dir, 'a.out')):
+                raise CommandError('No binary produced')
+        return elapsed * 1000
@@ -0,0 +1,109 @@
+import os
+import shutil
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import executors, java_runtime
+from core.executors import get_executor
+from core.languages import LANGUAGES
+from core.workspace import workspace
+
+PROGRAM = '''import java.io.*;
+import java.util.*;
+
+public class UserCode {
+    public static void main(String[] args) throws IOException {
+        // variant %d
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in));
+        int n = Integer.parseInt(in.readLine().trim());
+        StringTokenizer st = new StringTokenizer(in.readLine());
+        long[] a = new long[n];
+        for (int i = 0; i < n; i++) a[i] = Long.parseLong(st.nextToken());
+        Arrays.sort(a);
+        Map<Long, Integer> seen = new HashMap<>();
+        long sum = 0;
+        for (long x : a) { sum += x; seen.merge(x %% 7, 1, Integer::sum); }
+        System.out.println(sum + " " + seen.size());
+    }
+}
+'''
+
+
+class Command(BaseCommand):
+    help = ('Per-run latency of Java submissions on the subprocess executor: javac and a plain JVM '
+            'against the compile server, class-data-sharing archive and tuned JVM flags')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--numbers', type=int, default=1000, help='Integers in the program input')
+
+    def handle(self, *args, **options):
+        if not shutil.which('java') or not shutil.which('javac'):
+            raise CommandError('java and javac must be on PATH')
+        tuned = LANGUAGES['java']
+        # How Java ran before: javac per submission, java with only a heap limit
+        baseline = tuned._replace(
+            run=['java', '-Xmx{memory}m', '-cp', '{dir}', 'UserCode'],
+            compile_server=False,
+            class_data_sharing=False,
+        )
+        stdin = f"{options['numbers']}\n{' '.join(str(i * 7919 % 100003) for i in range(options['numbers']))}\n"
+
+        # Every run compiles a different source, as separate submissions would.
+        # The compile server and archive are measured even while they are
+        # switched off for submissions (JAVA_COMPILE_SERVER, JAVA_CDS).
+        saved = executors.COMPILE_CACHE_ENABLED, java_runtime.JAVA_COMPILE_SERVER, java_runtime.JAVA_CDS
+        executors.COMPILE_CACHE_ENABLED = False
+        java_runtime.JAVA_COMPILE_SERVER = java_runtime.JAVA_CDS = True
+        try:
+            runtime = java_runtime.build_runtime()
+            if runtime is None or not runtime['archive']:
+                self.stderr.write('Compile server or archive unavailable; the tuned runs fall back to javac/plain JVM')
+            # One untimed round so both sides start warm (server started, page cache filled)
+            for language in (baseline, tuned):
+                self.measure(language, 0, stdin)
+            rows = []
+            for language, label in ((baseline, 'javac + java'), (tuned, 'compile server + CDS')):
+                samples = [self.measure(language, run, stdin) for run in range(1, options['runs'] + 1)]
+                rows.append((label, samples))
+        finally:
+            executors.COMPILE_CACHE_ENABLED, java_runtime.JAVA_COMPILE_SERVER, java_runtime.JAVA_CDS = saved
+
+        self.stdout.write(f"{'':24s} {'compile':>10s} {'run':>10s} {'total':>10s} {'total p90':>10s}  (ms, median)")
+        for label, samples in rows:
+            compile_ms = [c * 1000 for c, _ in samples]
+            run_ms = [r * 1000 for _, r in samples]
+            total_ms = sorted((c + r) * 1000 for c, r in samples)
+            p90 = total_ms[min(len(total_ms) - 1, int(len(total_ms) * 0.9))]
+            self.stdout.write(f'{label:24s} {statistics.median(compile_ms):10.1f} {statistics.median(run_ms):10.1f} '
+                              f'{statistics.median(total_ms):10.1f} {p90:10.1f}')
+        before = statistics.median(sum(s) for s in rows[0][1])
+        after = statistics.median(sum(s) for s in rows[1][1])
+        self.stdout.write(f'Median per-run latency {before * 1000:.0f} ms -> {after * 1000:.0f} ms '
+                          f'({before / after:.1f}x)')
+
+    def measure(self, language, variant, stdin):
+        """
+        Wall time of compiling and of running one submission, in seconds
+        """
+        executor = get_executor('subprocess')
+        with workspace() as work_dir:
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w') as f:
+                f.write(stdin)
+            output_path = os.path.join(work_dir, 'output.txt')
+            error_path = os.path.join(work_dir, 'error.txt')
+
+            start = time.perf_counter()
+            program = executor.compile(language, PROGRAM % variant, work_dir)
+            compiled = time.perf_counter()
+            if 'error' in program:
+                raise CommandError(program['error'])
+            result = executor.run(program, input_path, output_path, error_path, work_dir)
+            finished = time.perf_counter()
+            if result.returncode != 0:
+                with open(error_path) as f:
+                    raise CommandError(f'Run failed: {f.read()}')
+        return compiled - start, finished - compiled
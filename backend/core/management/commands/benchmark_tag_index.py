@@ -0,0 +1,113 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Problem
+from core.tag_index import filter_by_tags, rebuild_tag_index, tag_facets
+
+TAGS = [
+    'arrays', 'strings', 'math', 'greedy', 'dp', 'graphs', 'trees', 'dfs', 'bfs', 'binary-search',
+    'sorting', 'two-pointers', 'sliding-window', 'hashing', 'heap', 'stack', 'queue', 'linked-list',
+    'recursion', 'backtracking', 'bit-manipulation', 'geometry', 'number-theory', 'combinatorics',
+    'probability', 'shortest-paths', 'mst', 'union-find', 'segment-tree', 'fenwick-tree', 'trie',
+    'kmp', 'suffix-array', 'game-theory', 'matrices', 'simulation', 'implementation', 'brute-force',
+    'divide-and-conquer', 'flows', 'matching', 'topological-sort', 'scc', 'lca', 'sqrt-decomposition',
+    'meet-in-the-middle', 'interactive', 'constructive', 'bitmask-dp', 'digit-dp',
+]
+
+
+class Command(BaseCommand):
+    help = ('Compare tag filtering on the Problem.tags JSON column with the ProblemTag index '
+            'on generated problems, printing timings and query plans. Runs in a transaction '
+            'that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['problems'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def run(self, count, repeat):
+        rng = random.Random(0)
+        # Skewed tag popularity, like real problem sets
+        weights = [1 / (rank + 1) for rank in range(len(TAGS))]
+        user = get_user_model().objects.create(username='benchmark-tag-index', university_name='benchmark-tag-index')
+        start = time.perf_counter()
+        Problem.objects.bulk_create((
+            Problem(
+                title=f'Problem {i}', description='', constrains='', starter_code='', created_by=user,
+                difficulty=rng.choice(['Easy', 'Medium', 'Hard']),
+                tags=sorted(set(rng.choices(TAGS, weights, k=rng.randint(1, 4)))),
+            ) for i in range(count)
+        ), batch_size=2000)
+        rebuild_tag_index()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'{count} problems generated and indexed in {time.perf_counter() - start:.1f}s '
+                          f'({connection.vendor})\n')
+
+        rare = TAGS[-1]
+        cases = [
+            ('any of [dp, graphs]', ['dp', 'graphs'], 'any'),
+            ('all of [dp, graphs]', ['dp', 'graphs'], 'all'),
+            (f'all of [{rare}]', [rare], 'all'),
+        ]
+        problems = Problem.objects.only('id')
+        for name, tags, match in cases:
+            scan = self.json_filter(problems, tags, match)
+            indexed = filter_by_tags(problems, tags, match)
+            expected = set(scan.values_list('id', flat=True))
+            assert set(indexed.values_list('id', flat=True)) == expected
+            self.compare(f'{name} -> {len(expected)} problems',
+                         lambda: list(scan.values_list('id', flat=True)),
+                         lambda: list(indexed.values_list('id', flat=True)),
+                         scan, indexed, repeat)
+
+        def facets_from_json():
+            counts = Counter()
+            for tags, difficulty in Problem.objects.values_list('tags', 'difficulty').iterator(chunk_size=5000):
+                for tag in tags:
+                    counts[tag, difficulty] += 1
+            return counts
+
+        self.compare('facet counts per tag and difficulty', facets_from_json,
+                     lambda: tag_facets(Problem.objects.all()), None, None, repeat)
+
+    def json_filter(self, queryset, tags, match):
+        """
+        The pre-index approach: containment on the JSON column, or a text match on SQLite
+        """
+        def has_tag(tag):
+            if connection.features.supports_json_field_contains:
+                return queryset.filter(tags__contains=[tag])
+            return queryset.filter(tags__icontains=f'"{tag}"')
+
+        result = has_tag(tags[0])
+        for tag in tags[1:]:
+            result = result | has_tag(tag) if match == 'any' else result & has_tag(tag)
+        return result
+
+    def compare(self, name, scan, indexed, scan_qs, indexed_qs, repeat):
+        timings = [self.best_of(scan, repeat), self.best_of(indexed, repeat)]
+        self.stdout.write(f'{name}\n  JSON column: {timings[0] * 1000:8.1f} ms\n'
+                          f'  tag index:   {timings[1] * 1000:8.1f} ms  ({timings[0] / timings[1]:.1f}x)')
+        if scan_qs is not None:
+            self.stdout.write('  plan (JSON column):\n    ' + scan_qs.explain().replace('\n', '\n    '))
+            self.stdout.write('  plan (tag index):\n    ' + indexed_qs.explain().replace('\n', '\n    '))
+        self.stdout.write('')
+
+    def best_of(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import java_runtime
+from core.languages import LANGUAGES
+from core.precompiled_headers import build_precompiled_headers
+
+
+class Command(BaseCommand):
+    help = ('Build the per-host runtime files of the subprocess executor (Java compile server and '
+            'class-data-sharing archive, precompiled headers) so that no submission waits for them; '
+            'run before the worker starts')
+
+    def handle(self, *args, **options):
+        if not java_runtime.java_runtime_enabled():
+            self.stdout.write('Java runtime: disabled (JAVA_COMPILE_SERVER and JAVA_CDS are off)')
+        else:
+            runtime = java_runtime.build_runtime()
+            if runtime is None:
+                self.stdout.write('Java runtime: unavailable, Java uses javac and a plain JVM')
+            else:
+                self.stdout.write(f"Java runtime: {runtime['dir']} (archive: {runtime['archive'] or 'none'})")
+
+        for language in LANGUAGES.values():
+            if language.precompiled_headers:
+                path = build_precompiled_headers(language)
+                self.stdout.write(f'Precompiled headers for {language.name}: {path or "unavailable"}')
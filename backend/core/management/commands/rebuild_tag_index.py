@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ProblemTag
+from core.tag_index import rebuild_tag_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ProblemTag index from Problem.tags (after bulk edits or loaddata)'
+
+    def handle(self, *args, **options):
+        rebuild_tag_index()
+        self.stdout.write(f'Indexed {ProblemTag.objects.count()} problem tags')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.leaderboard import reconcile_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Redis leaderboards from SolvedProblem'
+
+    def handle(self, *args, **options):
+        stats = reconcile_leaderboards()
+        self.stdout.write(
+            f"Ranked {stats['users']} users on {stats['boards']} boards, removed {stats['removed']} stale boards")
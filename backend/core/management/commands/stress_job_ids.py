@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jobs import new_job_id, job_name, set_correlation_id, get_correlation_id, reset_correlation_id
+from core.workspace import workspace
+
+
+def simulate_request(hold):
+    """
+    What compile_code and the executor do per request: new correlation id and
+    job id, then a workspace that must not be shared with any other job
+    """
+    token = set_correlation_id(None)
+    try:
+        requested_at = time.time()
+        job_id = new_job_id()
+        with workspace() as path:
+            marker = os.path.join(path, 'job')
+            clean = not os.listdir(path)
+            with open(marker, 'w') as f:
+                f.write(job_id)
+            time.sleep(hold)
+            with open(marker) as f:
+                isolated = clean and f.read() == job_id
+        return job_id, get_correlation_id(), path, int(requested_at * 1000), isolated
+    finally:
+        reset_correlation_id(token)
+
+
+def replica(rate, seconds, threads, hold, results):
+    """
+    One web replica issuing `rate` requests per second for `seconds`
+    """
+    interval = 1 / rate
+    start = time.perf_counter()
+    futures = []
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for i in range(int(rate * seconds)):
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(simulate_request, hold))
+    results.put([future.result() for future in futures])
+
+
+class Command(BaseCommand):
+    help = ('Issue job ids, correlation ids and workspaces at a fixed request rate from several '
+            'processes (standing in for replicas) and check that none collide')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=int, default=1000, help='Requests per second, across all processes')
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent requests per process')
+        parser.add_argument('--hold', type=float, default=0.005, help='Seconds each job keeps its workspace')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=replica, args=(
+                options['rate'] / processes, options['seconds'], options['threads'], options['hold'], results))
+            for _ in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        records = [record for _ in workers for record in results.get()]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        job_ids = Counter(record[0] for record in records)
+        names = Counter(job_name(record[0]) for record in records)
+        correlation_ids = Counter(record[1] for record in records)
+        # What the old oj-job-<milliseconds> names would have been
+        millisecond_names = Counter(record[3] for record in records)
+        shared = sum(1 for record in records if not record[4])
+        duplicates = {
+            'job ids': sum(n - 1 for n in job_ids.values()),
+            'Kubernetes job names': sum(n - 1 for n in names.values()),
+            'correlation ids': sum(n - 1 for n in correlation_ids.values()),
+        }
+
+        self.stdout.write(f'{len(records)} requests from {processes} processes in {elapsed:.2f}s '
+                          f'({len(records) / elapsed:.0f} req/s), {len(set(r[2] for r in records))} '
+                          f'workspace directories used')
+        for label, count in duplicates.items():
+            self.stdout.write(f'  duplicate {label}: {count}')
+        self.stdout.write(f'  workspaces seen by another job: {shared}')
+        self.stdout.write(f'  oj-job-<ms> names that would have collided: '
+                          f'{sum(n - 1 for n in millisecond_names.values())}')
+        if shared or any(duplicates.values()):
+            raise CommandError('Collisions found')
+        self.stdout.write('No collisions')
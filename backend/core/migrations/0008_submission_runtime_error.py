@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_solvedproblem"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submission",
+            name="verdict",
+            field=models.CharField(
+                choices=[
+                    ("Pending", "Pending"),
+                    ("Accepted", "Accepted"),
+                    ("Wrong Answer", "Wrong Answer"),
+                    ("Time Limit Exceeded", "Time Limit Exceeded"),
+                    ("Compiler Error", "Compilation Error"),
+                    ("Runtime Error", "Runtime Error"),
+                ],
+                default="Pending",
+                max_length=30,
+            ),
+        ),
+    ]
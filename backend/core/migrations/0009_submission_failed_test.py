@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_submission_runtime_error"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="failed_test",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="1-based number of the first failing test case (visible tests first)",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_submission_output_limit_verdict"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="checker",
+            field=models.CharField(
+                choices=[
+                    ("token", "Tokens (whitespace-insensitive)"),
+                    ("exact", "Exact"),
+                    ("line", "Line by line"),
+                    ("float", "Floating point tolerance"),
+                    ("custom", "Custom checker"),
+                ],
+                default="token",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="checker_code",
+            field=models.TextField(
+                blank=True,
+                help_text="Python script for the custom checker: checker.py <input> <expected> <output>, exit 0 to accept",
+            ),
+        ),
+        migrations.AddField(
+            model_name="problem",
+            name="float_tolerance",
+            field=models.FloatField(
+                default=1e-06,
+                help_text="Absolute or relative error allowed by the float checker",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_problem_checker"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="memory_limit",
+            field=models.PositiveIntegerField(
+                default=256, help_text="Memory limit in MB for code execution"
+            ),
+        ),
+    ]
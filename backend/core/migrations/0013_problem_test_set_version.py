@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_problem_memory_limit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="problem",
+            name="test_set_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Bumped whenever a test case of the problem changes",
+            ),
+        ),
+    ]
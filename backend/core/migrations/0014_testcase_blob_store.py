@@ -0,0 +1,96 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+def move_payloads_to_blob_store(apps, schema_editor):
+    from core.blob_store import get_blob_store
+
+    store = get_blob_store()
+    TestCase = apps.get_model("core", "TestCase")
+    for test_case in TestCase.objects.all().iterator():
+        test_case.input_blob, test_case.input_size = store.put(test_case.input_data)
+        test_case.expected_blob, test_case.expected_size = store.put(
+            test_case.expected_output
+        )
+        test_case.save(
+            update_fields=[
+                "input_blob",
+                "input_size",
+                "expected_blob",
+                "expected_size",
+            ]
+        )
+
+
+def move_payloads_to_rows(apps, schema_editor):
+    from core.blob_store import get_blob_store
+
+    store = get_blob_store()
+    TestCase = apps.get_model("core", "TestCase")
+    for test_case in TestCase.objects.all().iterator():
+        with store.open(test_case.input_blob) as f:
+            test_case.input_data = f.read().decode()
+        with store.open(test_case.expected_blob) as f:
+            test_case.expected_output = f.read().decode()
+        test_case.save(update_fields=["input_data", "expected_output"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_problem_test_set_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testcase",
+            name="input_blob",
+            field=models.CharField(
+                default="",
+                help_text="SHA-256 of the input file in the blob store",
+                max_length=64,
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="input_size",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="expected_blob",
+            field=models.CharField(
+                default="",
+                help_text="SHA-256 of the expected output file in the blob store",
+                max_length=64,
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="expected_size",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(move_payloads_to_blob_store, move_payloads_to_rows),
+        # Defaults let the columns be re-added to populated tables when unapplying
+        migrations.AlterField(
+            model_name="testcase",
+            name="input_data",
+            field=models.TextField(default=""),
+        ),
+        migrations.AlterField(
+            model_name="testcase",
+            name="expected_output",
+            field=models.TextField(default=""),
+        ),
+        migrations.RemoveField(
+            model_name="testcase",
+            name="input_data",
+        ),
+        migrations.RemoveField(
+            model_name="testcase",
+            name="expected_output",
+        ),
+    ]
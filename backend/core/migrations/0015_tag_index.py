@@ -0,0 +1,103 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_tag_index(apps, schema_editor):
+    Problem = apps.get_model("core", "Problem")
+    Tag = apps.get_model("core", "Tag")
+    ProblemTag = apps.get_model("core", "ProblemTag")
+    tag_ids = {}
+    links = []
+    for problem in Problem.objects.only("id", "tags", "difficulty").iterator():
+        for name in {str(t).strip() for t in problem.tags or [] if str(t).strip()}:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.get_or_create(name=name)[0].id
+            links.append(
+                ProblemTag(
+                    problem_id=problem.id,
+                    tag_id=tag_ids[name],
+                    difficulty=problem.difficulty,
+                )
+            )
+    ProblemTag.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_testcase_blob_store"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProblemTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "difficulty",
+                    models.CharField(
+                        choices=[
+                            ("Easy", "Easy"),
+                            ("Medium", "Medium"),
+                            ("Hard", "Hard"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "problem",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tag_links",
+                        to="core.problem",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="problem_links",
+                        to="core.tag",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["tag", "difficulty"], name="problemtag_tag_difficulty"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("tag", "problem"), name="unique_problem_tag"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_tag_index, migrations.RunPython.noop),
+    ]
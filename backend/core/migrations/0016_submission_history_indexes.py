@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_tag_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["user", "-submitted_at"], name="submission_user_recent"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["user", "problem", "-submitted_at"],
+                name="submission_user_problem_recent",
+            ),
+        ),
+    ]
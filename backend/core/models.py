@@ -24,12 +24,24 @@ class Problem(models.Model):
         ('Medium', 'Medium'),
         ('Hard', 'Hard'),
     )
+    CHECKER_CHOICES = (
+        ('token', 'Tokens (whitespace-insensitive)'),
+        ('exact', 'Exact'),
+        ('line', 'Line by line'),
+        ('float', 'Floating point tolerance'),
+        ('custom', 'Custom checker'),
+    )
     title = models.CharField(max_length=200)
     description = models.TextField()
     constrains = models.TextField()
     difficulty = models.CharField(max_length = 10, choices=DIFFICULTY_CHOICES, default='Easy')
     tags = models.JSONField(default=list, blank=True)
     time_limit = models.FloatField(default=2.0, help_text="Time limit in seconds for code execution")
+    memory_limit = models.PositiveIntegerField(default=256, help_text="Memory limit in MB for code execution")
+    checker = models.CharField(max_length=10, choices=CHECKER_CHOICES, default='token')
+    float_tolerance = models.FloatField(default=1e-6, help_text="Absolute or relative error allowed by the float checker")
+    checker_code = models.TextField(blank=True, help_text="Python script for the custom checker: checker.py <input> <expected> <output>, exit 0 to accept")
+    test_set_version = models.PositiveIntegerField(default=0, editable=False, help_text="Bumped whenever a test case of the problem changes")
     starter_code = models.TextField()
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -37,14 +49,61 @@ class Problem(models.Model):
     def __str__(self):
         return self.title
 
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+class ProblemTag(models.Model):
+    """
+    Normalized index of Problem.tags (which stays the editable source), kept in
+    sync by core/tag_index.py. difficulty is copied from the problem so facet
+    counts per tag and difficulty never touch the problem table.
+    """
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='problem_links')
+    difficulty = models.CharField(max_length=10, choices=Problem.DIFFICULTY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'problem'], name='unique_problem_tag')
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'difficulty'], name='problemtag_tag_difficulty'),
+        ]
+
 class TestCase(models.Model):
+    # Payloads live in the blob store (core/blob_store.py); rows only hold
+    # the SHA-256 and size of each file
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
-    input_data = models.TextField()
-    expected_output = models.TextField()
+    input_blob = models.CharField(max_length=64, help_text="SHA-256 of the input file in the blob store")
+    input_size = models.PositiveBigIntegerField(default=0)
+    expected_blob = models.CharField(max_length=64, help_text="SHA-256 of the expected output file in the blob store")
+    expected_size = models.PositiveBigIntegerField(default=0)
     is_hidden = models.BooleanField(default=False)
 
+    def set_input(self, source):
+        """
+        Store bytes, str or a binary file as this test's input (call save() afterwards)
+        """
+        from .blob_store import get_blob_store
+        self.input_blob, self.input_size = get_blob_store().put(source)
+
+    def set_expected_output(self, source):
+        from .blob_store import get_blob_store
+        self.expected_blob, self.expected_size = get_blob_store().put(source)
+
+    def open_input(self):
+        from .blob_store import get_blob_store
+        return get_blob_store().open(self.input_blob)
+
+    def open_expected_output(self):
+        from .blob_store import get_blob_store
+        return get_blob_store().open(self.expected_blob)
+
     def __str__(self):
-        return f"Test Case for {self.problem.title} (Hidden: {self.is_hidden})"
+        return f"Test Case {self.pk} for problem {self.problem_id} (Hidden: {self.is_hidden})"
     
 class Submission(models.Model):
     VERDICT_CHOICES = (
@@ -53,6 +112,8 @@ class Submission(models.Model):
         ('Wrong Answer', 'Wrong Answer'),
         ('Time Limit Exceeded', 'Time Limit Exceeded'),
         ('Compiler Error', 'Compilation Error'),
+        ('Runtime Error', 'Runtime Error'),
+        ('Output Limit Exceeded', 'Output Limit Exceeded'),
     )
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='submissions')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submission')
@@ -61,10 +122,19 @@ class Submission(models.Model):
     verdict = models.CharField(max_length=30, choices=VERDICT_CHOICES, default='Pending')
     execution_time = models.FloatField(null=True, blank=True)
     memory = models.IntegerField(null=True, blank=True)
+    failed_test = models.PositiveIntegerField(null=True, blank=True, help_text="1-based number of the first failing test case (visible tests first)")
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of a user's history, optionally for one problem
+            models.Index(fields=['user', '-submitted_at'], name='submission_user_recent'),
+            models.Index(fields=['user', 'problem', '-submitted_at'], name='submission_user_problem_recent'),
+        ]
+
     def __str__(self):
-        return f"Submission by {self.user.username} for  {self.problem.title} ({self.verdict})" 
+        # Ids only, so printing a submission never queries users or problems
+        return f"Submission {self.pk} by user {self.user_id} for problem {self.problem_id} ({self.verdict})"
     
 class SolvedProblem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='solved_problems')
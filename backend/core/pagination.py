@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ProblemCursorPagination(CursorPagination):
+    """
+    Newest problems first. Cursors keep pages stable while problems are added
+    and cost the same at any depth, unlike OFFSET.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class SubmissionCursorPagination(CursorPagination):
+    """
+    Keyset pagination on submitted_at, newest first; with ?user= it walks the
+    (user, submitted_at) index
+    """
+    ordering = '-submitted_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
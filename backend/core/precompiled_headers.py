@@ -0,0 +1,137 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Precompiled headers for the subprocess executor. Most C++ submissions
+# include <bits/stdc++.h>, and parsing it is most of their compile time. The
+# headers a descriptor lists in precompiled_headers are compiled once per host,
+# compiler and set of flags into PCH_DIR/<key>/<header>.gch when the worker
+# starts (`manage.py build_runtimes`, run by start-celery.sh), next to a copy of
+# the header, and that directory goes first on the include path (-I), where
+# g++ picks the .gch up. A PCH is only used with the exact flags it was built
+# with, so the flags come from the descriptor's own compile command.
+# Until they are built, or without a compiler that can build them, compilation
+# just parses the header.
+PCH_ENABLED = os.environ.get('PCH_ENABLED', 'true').lower() == 'true'
+PCH_DIR = os.environ.get('PCH_DIR', os.path.join(tempfile.gettempdir(), 'algozen-pch'))
+
+
+def compile_flags(language):
+    """
+    Flags of the descriptor's compile command, without the source and output
+    """
+    flags = []
+    skip = False
+    for part in language.compile[1:]:
+        if skip:
+            skip = False
+        elif part == '-o':
+            skip = True
+        elif '{' not in part:
+            flags.append(part)
+    return flags
+
+
+def _find_header(compiler, flags, header):
+    result = subprocess.run(
+        [compiler, *flags, '-x', 'c++', '-M', '-'],
+        input=f'#include <{header}>\n', capture_output=True, text=True, check=True, timeout=60)
+    for path in result.stdout.replace('\\\n', ' ').split():
+        if path.endswith('/' + header):
+            return path
+    raise FileNotFoundError(header)
+
+
+def _build(language, compiler, flags, build_dir):
+    for header in language.precompiled_headers:
+        source = _find_header(compiler, flags, header)
+        target = os.path.join(build_dir, header)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        subprocess.run(
+            [compiler, *flags, '-x', 'c++-header', source, '-o', f'{target}.gch'],
+            check=True, capture_output=True, timeout=300)
+
+
+def _pch_path(language):
+    """
+    (compiler, flags, directory) of the language's precompiled headers
+    """
+    compiler = language.compile[0]
+    flags = compile_flags(language)
+    version = subprocess.run([compiler, '--version'], capture_output=True, text=True, timeout=30).stdout
+    key = hashlib.sha256('\0'.join([version, *flags, *language.precompiled_headers]).encode()).hexdigest()[:16]
+    return compiler, flags, os.path.join(PCH_DIR, f'{language.name}-{key}')
+
+
+_include_dirs = {}
+_include_dirs_lock = threading.Lock()
+
+
+def _cache_key(language):
+    return (language.name, *language.compile, *language.precompiled_headers)
+
+
+def build_precompiled_headers(language):
+    """
+    Build the language's precompiled headers unless they are already there.
+    Run once at worker startup; concurrent builders on the host wait for the
+    first one. Returns the include directory as include_dir does, or None.
+    """
+    if not PCH_ENABLED or not language.precompiled_headers:
+        return None
+    value = None
+    try:
+        compiler, flags, path = _pch_path(language)
+        os.makedirs(PCH_DIR, exist_ok=True)
+        with open(f'{path}.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.isdir(path):
+                build_dir = tempfile.mkdtemp(prefix='build-', dir=PCH_DIR)
+                try:
+                    started = time.monotonic()
+                    _build(language, compiler, flags, build_dir)
+                    os.chmod(build_dir, 0o755)
+                    os.rename(build_dir, path)
+                    logger.info('Precompiled %s headers in %s (%.1fs)',
+                                language.name, path, time.monotonic() - started)
+                finally:
+                    shutil.rmtree(build_dir, ignore_errors=True)
+        value = path
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning('Precompiled headers for %s unavailable: %s', language.name, e)
+    with _include_dirs_lock:
+        _include_dirs[_cache_key(language)] = value
+    return value
+
+
+def include_dir(language):
+    """
+    Directory to put first on the include path for the language's precompiled
+    headers, or None when build_precompiled_headers has not built them for
+    this compiler and flags: compilations never wait for a build.
+    """
+    if not PCH_ENABLED or not language.precompiled_headers:
+        return None
+    with _include_dirs_lock:
+        if _cache_key(language) in _include_dirs:
+            return _include_dirs[_cache_key(language)]
+        value = None
+        try:
+            _, _, path = _pch_path(language)
+            if os.path.isdir(path):
+                value = path
+            else:
+                logger.warning('Precompiled headers for %s not built (manage.py build_runtimes)', language.name)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning('Precompiled headers for %s unavailable: %s', language.name, e)
+        _include_dirs[_cache_key(language)] = value
+        return value
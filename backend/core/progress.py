@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import time
+
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Progress events of running tasks (an /api/compile/ run, the judging of a
+# submission), so clients can wait for changes instead of polling.
+# Each topic has a Redis list of JSON events, numbered from 1 in the order
+# they were published. Each event also sends its number on a pub/sub channel
+# as a wake-up call. A reader subscribes first, then reads the list, so an
+# event published in between is never missed. Clients either long-poll
+# (?wait=<seconds>&after=<last seq seen>) or read a Server-Sent Events stream
+# (Accept: text/event-stream) that ends with the 'done' event.
+PROGRESS_TTL = int(os.environ.get('PROGRESS_TTL', 3600))
+# Longest a long-poll request may block
+PROGRESS_WAIT_MAX = int(os.environ.get('PROGRESS_WAIT_MAX', 30))
+# SSE streams send a comment this often so proxies keep the connection open,
+# and are closed after PROGRESS_STREAM_MAX seconds (clients reconnect with Last-Event-ID).
+# Under a sync server, an open stream (or a long-poll) holds a worker thread
+# for as long as it lasts, so serve with threads, gevent or ASGI and keep
+# these short.
+PROGRESS_HEARTBEAT = int(os.environ.get('PROGRESS_HEARTBEAT', 15))
+PROGRESS_STREAM_MAX = int(os.environ.get('PROGRESS_STREAM_MAX', 60))
+LOG_KEY = 'progress:{}:log'
+CHANNEL = 'progress:{}'
+
+_PUBLISH_SCRIPT = """
+local seq = redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+redis.call('PUBLISH', KEYS[2], seq)
+return seq
+"""
+
+_publish = None
+
+
+def publish(topic, event):
+    """
+    Append an event (a dict with 'type' and, for status changes, 'status') to
+    a topic and wake up its readers. Fails open: progress is best effort.
+    """
+    global _publish
+    try:
+        client = get_redis()
+        if _publish is None:
+            _publish = client.register_script(_PUBLISH_SCRIPT)
+        return _publish(keys=[LOG_KEY.format(topic), CHANNEL.format(topic)],
+                        args=[json.dumps(event), PROGRESS_TTL], client=client)
+    except Exception:
+        logger.warning('Could not publish progress of %s', topic, exc_info=True)
+
+
+def read_events(topic):
+    """
+    Every event of a topic so far, as [(seq, event)]
+    """
+    return [(seq, json.loads(raw))
+            for seq, raw in enumerate(get_redis().lrange(LOG_KEY.format(topic), 0, -1), start=1)]
+
+
+def wait_for_events(topic, after, timeout, pubsub=None):
+    """
+    Every event of a topic once there is one numbered above after, or at timeout
+    """
+    own = pubsub is None
+    if own:
+        pubsub = subscribe(topic)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            events = read_events(topic)
+            remaining = deadline - time.monotonic()
+            if (events and events[-1][0] > after) or remaining <= 0:
+                return events
+            pubsub.get_message(timeout=remaining)
+    finally:
+        if own:
+            pubsub.close()
+
+
+def subscribe(topic):
+    pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNEL.format(topic))
+    return pubsub
+
+
+def is_done(events):
+    return bool(events) and events[-1][1]['type'] == 'done'
+
+
+def current_state(events, initial_status):
+    """
+    Fields of the latest event carrying a status, e.g. a final result
+    """
+    state = {'status': initial_status}
+    for seq, event in events:
+        if 'status' in event:
+            state = {key: value for key, value in event.items() if key != 'type'}
+    return state
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views accept `Accept: text/event-stream`; they stream the body themselves
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def _sse(seq, event):
+    return f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _int_param(value, default=0):
+    return int(value) if value and value.isdigit() else default
+
+
+def _stream(topic, events, after, fallback):
+    if not events and fallback is not None:
+        done = fallback()
+        if done is not None:
+            yield _sse(1, done)
+            return
+    pubsub = subscribe(topic)
+    try:
+        deadline = time.monotonic() + PROGRESS_STREAM_MAX
+        while time.monotonic() < deadline:
+            events = wait_for_events(topic, after, PROGRESS_HEARTBEAT, pubsub)
+            new = [(seq, event) for seq, event in events if seq > after]
+            if not new:
+                yield ': keep-alive\n\n'
+                continue
+            for seq, event in new:
+                yield _sse(seq, event)
+            after = new[-1][0]
+            if is_done(events):
+                return
+    finally:
+        pubsub.close()
+
+
+def progress_response(request, topic, initial_status, fallback=None):
+    """
+    Serve a topic's progress as long-poll JSON or, when the client accepts
+    text/event-stream, as an SSE stream. fallback() returns the final 'done'
+    event for tasks whose events are gone (expired, or finished before any
+    were published), or None while the task may still publish.
+
+    JSON: {'status', ..., 'done', 'seq', 'events': [events numbered above ?after]}
+    """
+    after = _int_param(request.GET.get('after'))
+    try:
+        events = read_events(topic)
+    except Exception:
+        logger.warning('Progress of %s unavailable', topic, exc_info=True)
+        done = fallback() if fallback is not None else None
+        state = current_state([(1, done)] if done else [], initial_status)
+        return JsonResponse({**state, 'done': done is not None, 'seq': 0, 'events': []})
+
+    if getattr(request, 'accepted_renderer', None) and request.accepted_renderer.format == 'sse':
+        after = _int_param(request.headers.get('Last-Event-ID'), after)
+        response = StreamingHttpResponse(_stream(topic, events, after, fallback), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    wait = min(_int_param(request.GET.get('wait')), PROGRESS_WAIT_MAX)
+    if not events and fallback is not None:
+        done = fallback()
+        if done is not None:
+            events = [(1, done)]
+    if wait and not is_done(events) and not (events and events[-1][0] > after):
+        events = wait_for_events(topic, after, wait)
+    return JsonResponse({
+        **current_state(events, initial_status),
+        'done': is_done(events),
+        'seq': events[-1][0] if events else 0,
+        'events': [{'seq': seq, **event} for seq, event in events if seq > after],
+    })
@@ -0,0 +1,229 @@
+import json
+import os
+import queue
+import select
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from .sandbox import (
+    Execution, Cancelled, wall_timeout, cpu_time_exceeded, sandbox_user, CANCEL_POLL_INTERVAL,
+    DEFAULT_TIME_LIMIT, DEFAULT_MEMORY_LIMIT_MB, OUTPUT_LIMIT_BYTES,
+)
+from .workspace import get_workspace_pool
+
+# Pool of pre-started Python interpreters (see core/python_runner.py).
+# Runners are recycled after PYTHON_POOL_MAX_USES requests; 1 means every
+# execution gets a brand-new interpreter that was started ahead of time.
+# A reused runner only resets builtins, __main__ and a few sys settings
+# between programs, so keep 1 wherever submissions must not see each other.
+PYTHON_POOL_SIZE = int(os.environ.get('PYTHON_POOL_SIZE', 2))
+PYTHON_POOL_MAX_USES = int(os.environ.get('PYTHON_POOL_MAX_USES', 1))
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python_runner.py')
+
+
+class RunnerLimitsError(Exception):
+    pass
+
+
+def process_cpu_time(pid):
+    """
+    User+sys CPU seconds of a running or not yet reaped process, or None
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the parenthesised command name, starting at the state (field 3)
+            fields = f.read().rsplit(')', 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class PythonRunner:
+    def __init__(self, max_uses):
+        self.max_uses = max_uses
+        self.uses = 0
+        # Every runner gets its own scratch directory as cwd, next to the workspaces
+        root = get_workspace_pool().root
+        self.work_dir = tempfile.mkdtemp(prefix=f'{os.getpid()}-py-', dir=root)
+        args = ['python', '-I', RUNNER_PATH, str(max_uses), str(OUTPUT_LIMIT_BYTES)]
+        self.user = sandbox_user()
+        if self.user:
+            os.chown(self.work_dir, *self.user)
+            args.append('%d:%d' % self.user)
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=self.work_dir,
+            start_new_session=True
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def exhausted(self):
+        return self.uses >= self.max_uses or not self.alive()
+
+    def execute(self, code, stdin_path, stdout_path, stderr_path, time_limit, memory_limit_mb, cpu=None,
+                cancel=None):
+        """
+        Send one request and wait for the response line. Returns a sandbox.Execution;
+        CPU time and the limits are enforced inside the runner, the wall-clock
+        timeout (sandbox.wall_timeout) here. Raises RunnerLimitsError when this
+        runner can no longer apply the requested limits, and Cancelled (after
+        killing the runner) once cancel is set.
+        """
+        self.uses += 1
+        if cpu is not None:
+            try:
+                os.sched_setaffinity(self.proc.pid, {cpu})
+            except ProcessLookupError:
+                # Runner is gone; the write below fails with BrokenPipeError
+                pass
+        request = json.dumps({
+            'code': code,
+            'stdin_path': stdin_path,
+            'stdout_path': stdout_path,
+            'stderr_path': stderr_path,
+            'time_limit': time_limit,
+            'memory_limit_mb': memory_limit_mb,
+        }).encode() + b'\n'
+        if self.user:
+            # The runner opens the output files itself, as the sandbox user
+            for path in (stdout_path, stderr_path):
+                open(path, 'wb').close()
+                os.chown(path, *self.user)
+        started = time.monotonic()
+        cpu_before = process_cpu_time(self.proc.pid)
+        self.proc.stdin.write(request)
+        self.proc.stdin.flush()
+
+        fd = self.proc.stdout.fileno()
+        deadline = started + wall_timeout(time_limit)
+        chunks = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                return Execution(None, 0.0, time.monotonic() - started, 0, 'wall')
+            ready, _, _ = select.select([fd], [], [], remaining if cancel is None
+                                        else min(remaining, CANCEL_POLL_INTERVAL))
+            if not ready:
+                if cancel is not None and cancel.is_set():
+                    self.close()
+                    raise Cancelled()
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                # Runner died (e.g. killed by a resource limit or os._exit in user code).
+                # Its CPU time is read before it is reaped, so a SIGKILL from the
+                # RLIMIT_CPU hard limit can be told from one sent by anything else.
+                cpu_after = process_cpu_time(self.proc.pid)
+                returncode = self.proc.wait()
+                self.close()
+                wall_time = time.monotonic() - started
+                cpu_time = cpu_after - cpu_before if None not in (cpu_before, cpu_after) else 0.0
+                timeout = 'cpu' if cpu_time_exceeded(returncode, cpu_time, time_limit) else None
+                return Execution(returncode or 1, cpu_time, wall_time, 0, timeout)
+            chunks.append(chunk)
+            if chunk.endswith(b'\n'):
+                break
+
+        wall_time = time.monotonic() - started
+        response = json.loads(b''.join(chunks))
+        if 'error' in response:
+            raise RunnerLimitsError(response['error'])
+        if not response['reusable']:
+            # The runner exits after this reply
+            self.uses = self.max_uses
+        timeout = 'cpu' if cpu_time_exceeded(response['returncode'], response['cpu_time'], time_limit) else None
+        return Execution(response['returncode'], response['cpu_time'], wall_time, response['memory'], timeout)
+
+    def close(self):
+        if self.alive():
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.proc.wait()
+        for stream in (self.proc.stdin, self.proc.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class PythonWorkerPool:
+    def __init__(self, size=PYTHON_POOL_SIZE, max_uses=PYTHON_POOL_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(PythonRunner(max_uses))
+
+    def _acquire(self):
+        while True:
+            try:
+                runner = self._idle.get_nowait()
+            except queue.Empty:
+                # Pool drained by concurrent requests: fall back to a cold start
+                return PythonRunner(self.max_uses)
+            if runner.alive():
+                return runner
+            runner.close()
+
+    def _replenish(self):
+        if self._idle.qsize() < self.size:
+            self._idle.put(PythonRunner(self.max_uses))
+
+    def run(self, code, stdin_path, stdout_path, stderr_path,
+            time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+        """
+        Execute code on a warm interpreter with its standard streams bound to the
+        given files, optionally pinned to one cpu. Returns a sandbox.Execution;
+        raises sandbox.Cancelled when cancel is set first.
+        """
+        args = (code, stdin_path, stdout_path, stderr_path, time_limit, memory_limit_mb, cpu, cancel)
+        runner = self._acquire()
+        try:
+            try:
+                result = runner.execute(*args)
+            except (BrokenPipeError, RunnerLimitsError):
+                # The idle runner died between the liveness check and the write,
+                # or a reused runner's hard limits are tighter than this request
+                runner.close()
+                runner = PythonRunner(self.max_uses)
+                result = runner.execute(*args)
+        finally:
+            if runner.exhausted():
+                runner.close()
+                # Start the replacement off the request path
+                threading.Thread(target=self._replenish, daemon=True).start()
+            else:
+                self._idle.put(runner)
+        return result
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def python_pool_enabled():
+    return PYTHON_POOL_SIZE > 0
+
+
+def get_python_pool():
+    """
+    Process-wide pool, created on first use (after Celery forks its workers)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PythonWorkerPool()
+        return _pool
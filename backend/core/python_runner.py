@@ -0,0 +1,198 @@
+"""
+Warm Python runner used by core.python_pool.
+
+Started ahead of time by the pool; each request arrives as one JSON line on
+the process stdin ({"code", "stdin_path", "stdout_path", "stderr_path",
+"time_limit", "memory_limit_mb"}) and the result is written back as one JSON
+line ({"returncode", "cpu_time", "memory", "reusable"}), or {"error": "limits"} when the
+requested rlimits cannot be applied to this runner any more.
+Program input and output go through the given files, never through the pipe;
+they are also put on fds 0-2 for programs that use os.read/os.write.
+The user program executes as a fresh __main__ module and, as at interpreter
+exit, its non-daemon threads are joined and atexit handlers run before the
+reply. A runner whose program started threads or registered atexit handlers
+is not reused ("reusable": false in the reply); otherwise builtins, __main__
+and the sys/threading settings programs commonly change are restored
+between requests. Modules the program imported keep any changes it made to
+them. The runner exits after serving max_uses requests so the pool can
+replace it with a clean interpreter.
+The runner caps the size of files it writes itself (argv[2], in bytes) and
+switches to the sandbox user (argv[3], uid:gid) when given.
+
+This file is executed as a script; it must not import Django or anything from core.
+"""
+import atexit
+import builtins
+import json
+import math
+import os
+import resource
+import sys
+import threading
+import traceback
+import types
+
+
+def apply_limits(request):
+    """
+    CPU time is counted over the runner's whole life, so the CPU limit is set
+    relative to what was used so far. Hard limits can only go down, which is
+    fine for single-use runners; a reused runner that cannot honour a request
+    reports it and the pool starts a fresh one.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    try:
+        if request.get('time_limit') is not None:
+            seconds = math.ceil(used + request['time_limit'])
+            resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 1))
+        if request.get('memory_limit_mb') is not None:
+            limit = request['memory_limit_mb'] * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        return False
+    return True
+
+
+def peak_rss():
+    """
+    Peak RSS in KB since this interpreter was exec'd. ru_maxrss would also
+    count the pages of the worker that forked the runner.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def save_state():
+    """
+    Interpreter state a program commonly changes, put back by restore_state
+    before the runner serves the next request
+    """
+    return {
+        'builtins': dict(vars(builtins)),
+        'main': sys.modules['__main__'],
+        'recursion_limit': sys.getrecursionlimit(),
+        'int_max_str_digits': sys.get_int_max_str_digits() if hasattr(sys, 'get_int_max_str_digits') else None,
+        'stack_size': threading.stack_size(),
+    }
+
+
+def restore_state(state):
+    vars(builtins).clear()
+    vars(builtins).update(state['builtins'])
+    sys.modules['__main__'] = state['main']
+    sys.setrecursionlimit(state['recursion_limit'])
+    if state['int_max_str_digits'] is not None:
+        sys.set_int_max_str_digits(state['int_max_str_digits'])
+    threading.stack_size(state['stack_size'])
+
+
+def finish_program():
+    """
+    What interpreter exit does after the main module returns: wait for
+    non-daemon threads (and the atexit hooks of the threading module, which
+    shut down concurrent.futures pools), then run atexit handlers. Returns
+    False when this left the runner unfit to serve another program.
+    """
+    if threading.active_count() == 1 and not threading._threading_atexits and not atexit._ncallbacks():
+        return True
+    threading._shutdown()
+    atexit._run_exitfuncs()
+    atexit._clear()
+    return False
+
+
+def run_request(request, devnull):
+    stdin = open(request['stdin_path'], 'r', encoding='utf-8')
+    stdout = open(request['stdout_path'], 'w', encoding='utf-8')
+    stderr = open(request['stderr_path'], 'w', encoding='utf-8')
+    for fd, stream in enumerate((stdin, stdout, stderr)):
+        os.dup2(stream.fileno(), fd)
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+
+    state = save_state()
+    # A real module, so pickle and anything else that looks classes up in __main__ finds them
+    main_module = types.ModuleType('__main__')
+    main_module.__file__ = 'user_code.py'
+    main_module.__builtins__ = builtins
+    sys.modules['__main__'] = main_module
+    returncode = 0
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        exec(compile(request['code'], 'user_code.py', 'exec'), main_module.__dict__)
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            print(e.code, file=stderr)
+            returncode = 1
+    except BaseException as e:
+        # Drop the runner's own frame so the traceback starts in user_code.py
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        returncode = 1
+    reusable = finish_program()
+
+    for stream in (stdin, stdout, stderr):
+        try:
+            stream.close()
+        except Exception:
+            # e.g. EFBIG when the final flush hits the output limit
+            returncode = returncode or 1
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    sys.stdin, sys.stdout, sys.stderr = sys.__stdin__, sys.__stdout__, sys.__stderr__
+    if reusable:
+        restore_state(state)
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    return {
+        'returncode': returncode,
+        'cpu_time': (after.ru_utime + after.ru_stime) - (before.ru_utime + before.ru_stime),
+        # Peak RSS of the runner (KB), which includes the interpreter itself just like a cold start would
+        'memory': peak_rss(),
+        'reusable': reusable,
+    }
+
+
+def main():
+    max_uses = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    if len(sys.argv) > 2:
+        output_limit = int(sys.argv[2])
+        resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit, output_limit))
+    if len(sys.argv) > 3:
+        uid, gid = (int(part) for part in sys.argv[3].split(':'))
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+    # Keep the protocol pipes private so user code writing to fd 0/1 cannot corrupt them
+    proto_in = os.fdopen(os.dup(0), 'rb')
+    proto_out = os.fdopen(os.dup(1), 'wb')
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    for _ in range(max_uses):
+        line = proto_in.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        if not apply_limits(request):
+            proto_out.write(json.dumps({'error': 'limits'}).encode() + b'\n')
+            proto_out.flush()
+            return
+        response = run_request(request, devnull)
+        proto_out.write(json.dumps(response).encode() + b'\n')
+        proto_out.flush()
+        if not response['reusable']:
+            return
+
+
+if __name__ == '__main__':
+    main()
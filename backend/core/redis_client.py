@@ -0,0 +1,27 @@
+import threading
+
+import redis
+from django.conf import settings
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Process-wide Redis client (connection pooled) for limiter, caches and pub/sub
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(settings.REDIS_URL)
+        return _client
+
+
+def set_redis(client):
+    """
+    Swap the shared client, e.g. for a fakeredis.FakeRedis() in tests
+    """
+    global _client
+    with _client_lock:
+        _client = client
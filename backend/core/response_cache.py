@@ -0,0 +1,105 @@
+import hashlib
+import json
+import logging
+import os
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Redis cache of rendered API responses. Every cached body records the cache
+# generation it was rendered under; bumping a namespace's generation (one INCR)
+# invalidates all of its pages at once, and a lookup reads the generation and
+# the entry in a single round trip. Redis errors fall back to rendering.
+RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+GENERATION_KEY = 'cache:{}:generation'
+ENTRY_KEY = 'cache:{}:entry:{}'
+
+
+def _entry_key(namespace, request):
+    digest = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+    return ENTRY_KEY.format(namespace, digest)
+
+
+def get_cached_response(namespace, request):
+    """
+    Return (generation, cached) where cached is the (body, etag) stored for this
+    URL or None. Pass generation on to cache_response() so a body rendered
+    before an invalidation is never stored as current.
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.get(GENERATION_KEY.format(namespace))
+        pipe.hgetall(_entry_key(namespace, request))
+        generation, entry = pipe.execute()
+    except Exception:
+        logger.warning('Response cache unavailable', exc_info=True)
+        return None, None
+    generation = generation or b'0'
+    if not entry or entry.get(b'generation') != generation:
+        return generation, None
+    return generation, (entry[b'body'], entry[b'etag'].decode())
+
+
+def cache_response(namespace, request, body, generation):
+    """
+    Cache a rendered body for this URL; returns (body, etag)
+    """
+    etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+    if generation is None:
+        return body, etag
+    key = _entry_key(namespace, request)
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, mapping={'generation': generation, 'body': body, 'etag': etag})
+        pipe.expire(key, RESPONSE_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning('Response cache unavailable', exc_info=True)
+    return body, etag
+
+
+def invalidate_responses(namespace):
+    try:
+        get_redis().incr(GENERATION_KEY.format(namespace))
+    except Exception:
+        logger.warning('Could not invalidate cached %s responses', namespace, exc_info=True)
+
+
+def etag_matches(request, etag):
+    """
+    True when the request's If-None-Match already names etag
+    """
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in etags or etag in etags
+
+
+def cached_json_response(namespace, request, render, personalize=None):
+    """
+    Serve a JSON response from the cache, calling render() for the data on a
+    miss. Adds the ETag and answers a matching If-None-Match with 304.
+    personalize(data) may return per-user data derived from the shared cached
+    data; the ETag then covers the personalized body.
+    """
+    generation, cached = get_cached_response(namespace, request)
+    if cached is None:
+        body = JSONRenderer().render(render())
+        cached = cache_response(namespace, request, body, generation)
+    body, etag = cached
+    if personalize is not None:
+        body = JSONRenderer().render(personalize(json.loads(body)))
+        etag = quote_etag(hashlib.sha256(body).hexdigest()[:32])
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Clients may keep the response but must revalidate it
+    response['Cache-Control'] = 'no-cache'
+    if personalize is not None:
+        response['Vary'] = 'Authorization'
+    return response
@@ -0,0 +1,188 @@
+import math
+import os
+import signal
+import subprocess
+import time
+from collections import namedtuple
+
+# Largest file a program may write: stdout/stderr go to files in the workspace,
+# so this bounds both disk use and what the worker ever reads back
+OUTPUT_LIMIT_BYTES = int(os.environ.get('OUTPUT_LIMIT_BYTES', 64 * 1024 * 1024))
+# Defaults for runs that are not tied to a problem (/api/compile/)
+DEFAULT_TIME_LIMIT = 10
+DEFAULT_MEMORY_LIMIT_MB = 256
+# A program that is blocked or sleeping uses no CPU; it is stopped once the
+# wall clock passes WALL_TIME_FACTOR x its CPU time limit (plus a second of slack)
+WALL_TIME_FACTOR = float(os.environ.get('WALL_TIME_FACTOR', 3))
+# Programs are started by a small exec helper rather than forked from the
+# worker; the helper is killed if it outlives the wall timeout by this much
+EXEC_HELPER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_exec.py')
+EXEC_HELPER_GRACE = 5
+# How often a run checks whether it was cancelled, in seconds
+CANCEL_POLL_INTERVAL = 0.05
+# uid (and gid, default the same) programs run as. Unset keeps the worker's;
+# set it, with the worker running as root, so programs cannot write anything
+# the worker owns, such as the compile cache.
+SANDBOX_UID = os.environ.get('SANDBOX_UID')
+SANDBOX_GID = os.environ.get('SANDBOX_GID') or SANDBOX_UID
+
+# returncode, user+sys CPU seconds, wall seconds, peak RSS in KB, and
+# timeout: None, 'cpu' (used up its CPU time) or 'wall' (idle past the wall clock)
+Execution = namedtuple('Execution', ['returncode', 'cpu_time', 'wall_time', 'memory', 'timeout'])
+
+
+class Cancelled(Exception):
+    """
+    A run was stopped through its cancel event because its result is no longer needed
+    """
+
+
+def available_cpus():
+    """
+    CPUs this worker may use: its affinity mask, capped by a cgroup v2 CPU quota
+    (what a Kubernetes CPU limit becomes inside the container)
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == 'max':
+        return cpus
+    return cpus[:max(1, int(int(quota) / int(period)))]
+
+
+def sandbox_user():
+    """
+    (uid, gid) programs run as, or None to run them as the worker
+    """
+    if not SANDBOX_UID:
+        return None
+    return int(SANDBOX_UID), int(SANDBOX_GID)
+
+
+def wall_timeout(time_limit):
+    return time_limit * WALL_TIME_FACTOR + 1
+
+
+def cpu_time_exceeded(returncode, cpu_time, time_limit):
+    if cpu_time > time_limit or returncode == -signal.SIGXCPU:
+        return True
+    # SIGKILL from the RLIMIT_CPU hard limit, one second past the soft one
+    return returncode == -signal.SIGKILL and cpu_time >= math.ceil(time_limit)
+
+
+def run_measured(cmd, stdin_path, stdout_path, stderr_path, work_dir,
+                 time_limit=DEFAULT_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, cpu=None, cancel=None):
+    """
+    Run cmd through the exec helper (core/sandbox_exec.py), which applies the
+    rlimits, pins it to cpu, switches to the sandbox user, kills its process group at the wall timeout and
+    whenever it exits, and accounts for it with wait4(): user+sys CPU time and
+    peak RSS come from the kernel for exactly this program, unaffected by the
+    worker or anything else running on the node. Peak RSS never reads below
+    the helper's own few MB.
+    memory_limit_mb caps the address space; pass None for runtimes such as the
+    JVM that reserve far more virtual memory than they use.
+    Setting cancel (a threading.Event) kills the program and raises Cancelled.
+    """
+    wall = wall_timeout(time_limit)
+    user = sandbox_user()
+    report_r, report_w = os.pipe()
+    helper = [
+        'python', '-I', '-S', EXEC_HELPER_PATH, str(report_w), repr(wall),
+        str(math.ceil(time_limit)) if time_limit is not None else '-',
+        str(memory_limit_mb * 1024 * 1024) if memory_limit_mb is not None else '-',
+        str(OUTPUT_LIMIT_BYTES),
+        str(cpu) if cpu is not None else '-',
+        '%d:%d' % user if user else '-',
+        *cmd,
+    ]
+    try:
+        with open(stdin_path, 'rb') as stdin, open(stdout_path, 'wb') as stdout, open(stderr_path, 'wb') as stderr:
+            start = time.perf_counter()
+            proc = subprocess.Popen(
+                helper,
+                stdin=stdin,
+                stdout=stdout,
+                stderr=stderr,
+                cwd=work_dir,
+                start_new_session=True,
+                pass_fds=(report_w,)
+            )
+    except BaseException:
+        os.close(report_r)
+        raise
+    finally:
+        os.close(report_w)
+
+    deadline = time.monotonic() + wall + EXEC_HELPER_GRACE
+    cancelled = False
+    with os.fdopen(report_r, 'rb') as report:
+        while True:
+            remaining = max(0, deadline - time.monotonic())
+            try:
+                proc.wait(timeout=remaining if cancel is None else min(remaining, CANCEL_POLL_INTERVAL))
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if remaining == 0:
+                # The helper itself is stuck; take it down with the program
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+                break
+            if cancel.is_set() and not cancelled:
+                # The helper kills the program's group and reports as usual
+                cancelled = True
+                proc.send_signal(signal.SIGTERM)
+        lines = dict(line.split(b' ', 1) for line in report.read().splitlines())
+    wall_time = time.perf_counter() - start
+
+    if b'exit' not in lines and b'pid' in lines:
+        # The helper died before it could clean up after the program
+        try:
+            os.killpg(int(lines[b'pid']), signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    if cancelled:
+        raise Cancelled()
+    if b'exit' not in lines:
+        if b'error' in lines:
+            errno = int(lines[b'error'])
+            raise OSError(errno, os.strerror(errno), cmd[0])
+        return Execution(None, 0.0, wall_time, 0, 'wall')
+
+    status, cpu_time, wall_time, memory, expired = lines[b'exit'].split()
+    returncode = os.waitstatus_to_exitcode(int(status))
+    cpu_time = float(cpu_time)
+    if expired == b'1':
+        timeout = 'wall'
+    elif cpu_time_exceeded(returncode, cpu_time, time_limit):
+        timeout = 'cpu'
+    else:
+        timeout = None
+    return Execution(returncode, cpu_time, float(wall_time), int(memory), timeout)
+
+
+def output_limit_exceeded(returncode, stdout_path):
+    """
+    Native programs die with SIGXFSZ at the limit; Python ignores that signal and
+    gets EFBIG instead, so also treat an output file that reached the cap as exceeded.
+    """
+    if returncode == -signal.SIGXFSZ:
+        return True
+    try:
+        return os.path.getsize(stdout_path) >= OUTPUT_LIMIT_BYTES
+    except OSError:
+        return False
+
+
+def read_bounded(path, limit=OUTPUT_LIMIT_BYTES):
+    """
+    Read at most limit bytes of a text file written by a program
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read(limit).decode('utf-8', errors='replace')
+    except FileNotFoundError:
+        return ''
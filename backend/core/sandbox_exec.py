@@ -0,0 +1,129 @@
+"""
+Exec helper used by core.sandbox.run_measured.
+
+    python -I -S sandbox_exec.py REPORT_FD WALL CPU MEMORY FSIZE CORE USER CMD...
+
+Forks CMD as its own process group with the rlimits applied (CPU seconds,
+address space and output file size in bytes, '-' for none), pinned to CORE
+when given and running as USER (uid:gid) when given, and waits for it with
+wait4(). Runs are started from this small process rather than from the
+worker, so the peak RSS the kernel reports is the program's own instead of
+the pages it would inherit from a forked Celery worker (programs smaller
+than this helper, a few MB, report the helper's size).
+Limits are applied here in a single-threaded process between fork and exec,
+never in the worker, whose judging threads start runs concurrently.
+
+Lines written to REPORT_FD:
+    pid <pid>                               once the program is forked
+    error <errno>                           CMD could not be executed
+    exit <status> <cpu> <wall> <maxrss> <0|1>  wait status, CPU and wall seconds,
+                                            peak RSS (KB), 1 if WALL expired
+The program's process group is killed when it exits, WALL seconds pass or
+the helper gets SIGTERM, so nothing it started in the background outlives the run.
+
+This file is executed as a script; it must not import Django or anything from core.
+"""
+import os
+import resource
+import signal
+import sys
+import time
+
+
+def resolve(name):
+    """
+    Path of the executable, looked up on PATH before the child drops to USER
+    (execvp imports modules, which that user may not be able to read)
+    """
+    if '/' in name:
+        return name
+    for directory in os.environ.get('PATH', os.defpath).split(os.pathsep):
+        path = os.path.join(directory, name)
+        if os.access(path, os.X_OK) and not os.path.isdir(path):
+            return path
+    return name
+
+
+def child(path, cmd, cpu_seconds, memory, fsize, core, user, errors):
+    try:
+        # Python ignores these and exec keeps ignored signals ignored; restored
+        # so a program past the output limit dies of SIGXFSZ instead of writing
+        # on into EFBIG until it runs out of CPU time
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+        signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+        os.setpgid(0, 0)
+        if core != '-':
+            os.sched_setaffinity(0, {int(core)})
+        resource.setrlimit(resource.RLIMIT_FSIZE, (int(fsize), int(fsize)))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if cpu_seconds != '-':
+            # SIGXCPU at the soft limit, SIGKILL one second later
+            resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds), int(cpu_seconds) + 1))
+        if memory != '-':
+            resource.setrlimit(resource.RLIMIT_AS, (int(memory), int(memory)))
+        if user != '-':
+            uid, gid = (int(part) for part in user.split(':'))
+            os.setgroups([])
+            os.setgid(gid)
+            os.setuid(uid)
+        os.execv(path, cmd)
+    except OSError as e:
+        os.write(errors, b'%d' % (e.errno or 0))
+    finally:
+        os._exit(127)
+
+
+def kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def main():
+    report = int(sys.argv[1])
+    wall = float(sys.argv[2])
+    cpu_seconds, memory, fsize, core, user = sys.argv[3:8]
+    cmd = sys.argv[8:]
+    path = resolve(cmd[0])
+
+    # Closed by a successful exec, so a read returns nothing unless exec failed
+    errors_r, errors_w = os.pipe()
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(errors_r)
+        os.close(report)
+        child(path, cmd, cpu_seconds, memory, fsize, core, user, errors_w)
+    os.close(errors_w)
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        # Already exec'd (and in its own group) or gone
+        pass
+    os.write(report, b'pid %d\n' % pid)
+
+    expired = []
+
+    def expire(signum, frame):
+        expired.append(True)
+        kill_group(pid)
+
+    signal.signal(signal.SIGALRM, expire)
+    signal.signal(signal.SIGTERM, lambda signum, frame: kill_group(pid))
+    signal.setitimer(signal.ITIMER_REAL, wall)
+    error = os.read(errors_r, 16)
+    _, status, rusage = os.wait4(pid, 0)
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    wall_time = time.monotonic() - start
+    kill_group(pid)
+
+    if error:
+        os.write(report, b'error %s\n' % error)
+        return
+    os.write(report, b'exit %d %r %r %d %d\n' % (
+        status, rusage.ru_utime + rusage.ru_stime, wall_time, rusage.ru_maxrss, 1 if expired else 0))
+
+
+if __name__ == '__main__':
+    main()
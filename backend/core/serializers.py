@@ -13,7 +13,7 @@ class ProblemDetailSerializer(serializers.ModelSerializer):
         model = Problem
         fields = [
             'id', 'title', 'description', 'constrains', 'difficulty',
-            'tags', 'starter_code', 'created_by', 'created_at'
+            'tags', 'time_limit', 'memory_limit', 'starter_code', 'created_by', 'created_at'
         ]
 
 class SubmissionSerializer(serializers.ModelSerializer):
@@ -21,24 +21,33 @@ class SubmissionSerializer(serializers.ModelSerializer):
         model = Submission
         fields = [
             'id', 'problem', 'user', 'code', 'language', 'verdict',
-            'execution_time', 'memory', 'submitted_at'
+            'execution_time', 'memory', 'failed_test', 'submitted_at'
         ]
+        # Set by the server: the submitter and what judging decides
+        read_only_fields = ['user', 'verdict', 'execution_time', 'memory', 'failed_test']
         extra_kwargs = {
             'problem': {'required': False, 'allow_null': True},
-            'user': {'required': False, 'allow_null': True},
         }
 
     def create(self, validated_data):
-        # Set user from request if not provided
-        request = self.context.get('request')
-        if request and not validated_data.get('user'):
-            validated_data['user'] = request.user
+        validated_data['user'] = self.context['request'].user
         # Set a default problem if not provided (for testing)
         if not validated_data.get('problem'):
             from .models import Problem
             validated_data['problem'] = Problem.objects.first()
         return super().create(validated_data)
 
+class SubmissionListSerializer(serializers.ModelSerializer):
+    """
+    Submission history rows, without the code
+    """
+    class Meta:
+        model = Submission
+        fields = [
+            'id', 'problem', 'user', 'language', 'verdict',
+            'execution_time', 'memory', 'failed_test', 'submitted_at'
+        ]
+
 User = get_user_model()
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -80,4 +89,4 @@ class SolvedProblemSerializer(serializers.ModelSerializer):
     class Meta:
         model = SolvedProblem
         fields = ['id', 'user', 'problem', 'solved_at']
-        read_only_fields = ['id', 'solved_at']
\ No newline at end of file
+        read_only_fields = ['id', 'user', 'solved_at']
\ No newline at end of file
@@ -0,0 +1,77 @@
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Problem, TestCase, SolvedProblem, User
+from .test_data import test_data_cache
+from .response_cache import invalidate_responses
+from .tag_index import sync_problem_tags
+from .leaderboard import record_solve, remove_user
+from .solved_cache import mark_solved, forget_solved
+from .jobs import TASK_HEADER, get_correlation_id, set_correlation_id, clear_correlation_id
+
+
+@receiver(post_save, sender=TestCase)
+@receiver(post_delete, sender=TestCase)
+def bump_test_set_version(sender, instance, **kwargs):
+    """
+    A changed test set gets a new version, so every worker's cache misses on it.
+    QuerySet.update() and bulk_create() send no signals; bump the version by
+    hand after using them on test cases.
+    """
+    Problem.objects.filter(pk=instance.problem_id).update(test_set_version=F('test_set_version') + 1)
+    test_data_cache.invalidate(instance.problem_id)
+
+
+@receiver(post_save, sender=Problem)
+def index_problem_tags(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_problem_tags(instance)
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def invalidate_problem_list(sender, instance, **kwargs):
+    # After commit, so a request racing the change cannot cache the old rows as current
+    transaction.on_commit(lambda: invalidate_responses('problems'))
+
+
+@receiver(post_save, sender=SolvedProblem)
+def score_solved_problem(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(lambda: record_solve(instance.user_id, 1))
+        transaction.on_commit(lambda: mark_solved(instance.user_id, instance.problem_id))
+
+
+@receiver(post_delete, sender=SolvedProblem)
+def unscore_solved_problem(sender, instance, **kwargs):
+    transaction.on_commit(lambda: record_solve(instance.user_id, -1))
+    transaction.on_commit(lambda: forget_solved(instance.user_id))
+
+
+@receiver(post_delete, sender=User)
+def remove_from_leaderboards(sender, instance, **kwargs):
+    transaction.on_commit(lambda: remove_user(instance))
+
+
+@before_task_publish.connect
+def add_correlation_header(headers=None, **kwargs):
+    # Tasks queued from a request or from another task carry its correlation id
+    correlation_id = get_correlation_id()
+    if correlation_id and headers is not None:
+        headers.setdefault(TASK_HEADER, correlation_id)
+
+
+@task_prerun.connect
+def start_task_correlation(task_id=None, task=None, **kwargs):
+    # Tasks nobody queued from a request (beat) are correlated by their own id
+    # Custom headers are request attributes on workers, and under headers when applied eagerly
+    headers = task.request.get('headers') or {}
+    set_correlation_id(task.request.get(TASK_HEADER) or headers.get(TASK_HEADER) or task_id)
+
+
+@task_postrun.connect
+def end_task_correlation(**kwargs):
+    clear_correlation_id()
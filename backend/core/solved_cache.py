@@ -0,0 +1,76 @@
+import logging
+import os
+
+from .models import SolvedProblem
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Per-user Redis bitmap of solved problems: bit N is set when the user has
+# solved problem N. Problem ids start at 1, so bit 0 marks a bitmap loaded
+# from the database; a key without it only holds bits set by new solves and is
+# completed from the database on the next read. Bits are only ever OR-ed in,
+# so a load racing a new solve cannot lose it; deleting a SolvedProblem drops
+# the whole bitmap. Without Redis, flags come straight from the
+# (user, problem) unique index.
+SOLVED_CACHE_TTL = int(os.environ.get('SOLVED_CACHE_TTL', 24 * 3600))
+SOLVED_KEY = 'solved:{}'
+LOADED_BIT = 0
+
+
+def _load(client, user_id):
+    problem_ids = list(SolvedProblem.objects.filter(user_id=user_id).values_list('problem_id', flat=True))
+    key = SOLVED_KEY.format(user_id)
+    pipe = client.pipeline()
+    for problem_id in problem_ids:
+        pipe.setbit(key, problem_id, 1)
+    pipe.setbit(key, LOADED_BIT, 1)
+    pipe.expire(key, SOLVED_CACHE_TTL)
+    pipe.execute()
+    return set(problem_ids)
+
+
+def solved_problem_ids(user_id, problem_ids):
+    """
+    The subset of problem_ids the user has solved; one Redis round trip when
+    the user's bitmap is loaded
+    """
+    problem_ids = list(problem_ids)
+    if not problem_ids:
+        return set()
+    key = SOLVED_KEY.format(user_id)
+    try:
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        pipe.getbit(key, LOADED_BIT)
+        for problem_id in problem_ids:
+            pipe.getbit(key, problem_id)
+        loaded, *bits = pipe.execute()
+        if loaded:
+            return {problem_id for problem_id, bit in zip(problem_ids, bits) if bit}
+        return _load(client, user_id) & set(problem_ids)
+    except Exception:
+        logger.warning('Solved cache unavailable, reading solved flags from the database', exc_info=True)
+    return set(SolvedProblem.objects.filter(
+        user_id=user_id, problem_id__in=problem_ids).values_list('problem_id', flat=True))
+
+
+def mark_solved(user_id, problem_id):
+    key = SOLVED_KEY.format(user_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.setbit(key, problem_id, 1)
+        pipe.expire(key, SOLVED_CACHE_TTL)
+        pipe.execute()
+    except Exception:
+        logger.warning('Solved cache unavailable, user %s not updated', user_id, exc_info=True)
+
+
+def forget_solved(user_id):
+    """
+    Drop a user's bitmap so it is reloaded from the database on the next read
+    """
+    try:
+        get_redis().delete(SOLVED_KEY.format(user_id))
+    except Exception:
+        logger.warning('Solved cache unavailable, user %s not reset', user_id, exc_info=True)
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Problem, ProblemTag, Tag
+
+# Problem.tags is a JSON list, which no database can index for "has tag X"
+# without a full scan (SQLite) or a backend-specific GIN index (PostgreSQL).
+# Every problem's tags are therefore mirrored into ProblemTag rows, indexed on
+# (tag, problem) and (tag, difficulty), which works the same on every backend.
+
+
+def normalize_tags(tags):
+    return sorted({str(t).strip() for t in tags or [] if str(t).strip()})
+
+
+def _tag_ids(names):
+    """
+    Map tag names to Tag ids, creating missing tags
+    """
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=n) for n in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def sync_problem_tags(problem):
+    """
+    Bring a problem's ProblemTag rows in line with problem.tags and difficulty
+    """
+    tag_ids = _tag_ids(normalize_tags(problem.tags))
+    with transaction.atomic():
+        links = ProblemTag.objects.filter(problem_id=problem.id)
+        links.exclude(tag_id__in=tag_ids.values()).delete()
+        links.exclude(difficulty=problem.difficulty).update(difficulty=problem.difficulty)
+        existing = set(links.values_list('tag_id', flat=True))
+        ProblemTag.objects.bulk_create(
+            [ProblemTag(problem_id=problem.id, tag_id=tag_id, difficulty=problem.difficulty)
+             for tag_id in tag_ids.values() if tag_id not in existing],
+            ignore_conflicts=True
+        )
+
+
+def rebuild_tag_index(batch_size=1000):
+    """
+    Rebuild every ProblemTag row, e.g. after QuerySet.update() or bulk_create()
+    on problems, which send no signals
+    """
+    with transaction.atomic():
+        ProblemTag.objects.all().delete()
+        problems = Problem.objects.only('id', 'tags', 'difficulty').iterator(chunk_size=batch_size)
+        batch = []
+        for problem in problems:
+            batch.append(problem)
+            if len(batch) >= batch_size:
+                _index_batch(batch)
+                batch = []
+        _index_batch(batch)
+
+
+def _index_batch(problems):
+    tag_ids = _tag_ids(sorted({name for p in problems for name in normalize_tags(p.tags)}))
+    ProblemTag.objects.bulk_create([
+        ProblemTag(problem_id=p.id, tag_id=tag_ids[name], difficulty=p.difficulty)
+        for p in problems for name in normalize_tags(p.tags)
+    ])
+
+
+def filter_by_tags(queryset, tags, match='all'):
+    """
+    Restrict a Problem queryset to problems with all (or, with match='any', at
+    least one) of tags. Resolved through the ProblemTag index as a subquery.
+    """
+    links = ProblemTag.objects.filter(tag__name__in=tags)
+    if match == 'any':
+        return queryset.filter(id__in=links.values('problem_id'))
+    matching = (links.values('problem_id')
+                .annotate(matched=Count('tag_id'))
+                .filter(matched=len(set(tags)))
+                .values('problem_id'))
+    return queryset.filter(id__in=matching)
+
+
+def tag_facets(queryset):
+    """
+    Facet counts for a (possibly filtered) Problem queryset:
+    {'difficulty': {difficulty: n}, 'tags': [{'tag', 'count', 'difficulty': {difficulty: n}}]}
+    with tags ordered by count
+    """
+    difficulty = dict(queryset.order_by().values_list('difficulty').annotate(n=Count('id')))
+    links = ProblemTag.objects.all()
+    if queryset.query.has_filters():
+        links = links.filter(problem_id__in=queryset.order_by().values('id'))
+    rows = links.values_list('tag__name', 'difficulty').annotate(n=Count('id'))
+    tags = {}
+    for name, tag_difficulty, n in rows:
+        facet = tags.setdefault(name, {'tag': name, 'count': 0, 'difficulty': {}})
+        facet['count'] += n
+        facet['difficulty'][tag_difficulty] = n
+    return {
+        'difficulty': difficulty,
+        'tags': sorted(tags.values(), key=lambda f: (-f['count'], f['tag'])),
+    }
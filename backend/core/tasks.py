@@ -1,297 +1,318 @@
+import contextvars
+import itertools
+import logging
 import os
-import tempfile
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from celery import shared_task
-from .models import Submission, Problem
-import subprocess
+from django.conf import settings
+from .models import Submission, Problem, SolvedProblem
+from .limiter import hold_execution_slot
+from .sandbox import Cancelled, output_limit_exceeded, available_cpus
+from .comparator import output_file_matches
+from .test_data import test_data_cache
+from .leaderboard import reconcile_leaderboards as rebuild_leaderboards
+from .progress import publish
+from .workspace import workspace
+from .languages import get_language
+from .executors import get_executor, run_code
 
-LANGUAGE_CONFIG = {
-    'python': {
-        'image': 'python:3.10-slim',
-        'run_cmd': 'python /code/user_code.py',
-        'file_name': 'user_code.py',
-    },
-    'cpp': {
-        'image': 'gcc:latest',
-        'run_cmd': 'g++ /code/user_code.cpp -o /code/a.out && /code/a.out',
-        'file_name': 'user_code.cpp',
-    },
-    'java': {
-        'image': 'openjdk:latest',
-        'run_cmd': 'javac /code/UserCode.java && java -cp /code UserCode',
-        'file_name': 'UserCode.java',
-    },
-}
+logger = logging.getLogger(__name__)
 
-@shared_task
-def run_code_job(language, code, stdin, shared_dir):
+@shared_task(bind=True)
+def run_code_job(self, language, code, stdin, shared_dir=None, lease=None):
     """
     Hybrid code execution that can switch between subprocess and Kubernetes
-    based on USE_KUBERNETES environment variable
+    based on USE_KUBERNETES environment variable (see executors.get_executor).
+    lease is an execution slot taken by the caller; it is renewed during the
+    run and released when the run ends.
+    The run gets its files from core.workspace; shared_dir is ignored and only
+    kept for tasks queued by older web processes.
+    Runs queued through Celery publish their progress under task:<task id>.
+    """
+    topic = f'task:{self.request.id}' if self.request.id else None
+    if topic:
+        publish(topic, {'type': 'status', 'status': 'STARTED'})
+    logger.info('Running %s job %s', language, self.request.id or 'inline')
+
+    result = None
+    try:
+        with hold_execution_slot(lease):
+            result = run_code(language, code, stdin)
+        return result
+    finally:
+        logger.info('Job %s finished: %s', self.request.id or 'inline',
+                    'failed' if result is None else ('error' if 'error' in result else 'ok'))
+        if topic:
+            if result is None:
+                publish(topic, {'type': 'done', 'status': 'FAILURE', 'error': 'Execution failed'})
+            else:
+                publish(topic, {'type': 'done', 'status': 'SUCCESS', 'result': result})
+
+def judge_test_case(executor, program, test_case, work_dir, problem, cpu=None, cancel=None):
     """
-    # Check if we should use Kubernetes execution
-    use_kubernetes = os.environ.get('USE_KUBERNETES', 'false').lower() == 'true'
-    
-    if use_kubernetes:
-        return run_code_job_kubernetes(language, code, stdin, shared_dir)
+    Run a compiled program (see executors.Executor.compile) against a single test case (a test_data.CachedTestCase)
+    under the problem's limits.
+    Returns the verdict with CPU time, wall time and peak memory (KB); timeout
+    tells a program that used up its CPU time ('cpu') from one that sat idle
+    past the wall-clock limit ('wall').
+    work_dir belongs to this test alone, so several tests can run at once.
+    Output is streamed from the output file into the problem's checker.
+    Raises sandbox.Cancelled when cancel is set while the program runs.
+    """
+    input_path = os.path.join(work_dir, 'input.txt')
+    test_case.write_input(input_path)
+    output_path = os.path.join(work_dir, 'output.txt')
+    error_path = os.path.join(work_dir, 'error.txt')
+
+    result = executor.run(program, input_path, output_path, error_path, work_dir,
+                          time_limit=problem.time_limit, memory_limit_mb=problem.memory_limit, cpu=cpu,
+                          cancel=cancel)
+    # A program that kept writing past the limit may also have run out of time
+    if output_limit_exceeded(result.returncode, output_path):
+        verdict = 'Output Limit Exceeded'
+    elif result.timeout:
+        verdict = 'Time Limit Exceeded'
+    elif result.returncode != 0:
+        verdict = 'Runtime Error'
     else:
-        return run_code_job_subprocess(language, code, stdin, shared_dir)
+        with test_case.open_expected() as expected:
+            matches = output_file_matches(output_path, expected, problem, input_path)
+        verdict = 'Accepted' if matches else 'Wrong Answer'
+    return {
+        'verdict': verdict,
+        'time': result.cpu_time,
+        'wall_time': result.wall_time,
+        'memory': result.memory,
+        'timeout': result.timeout,
+    }
 
-def run_code_job_subprocess(language, code, stdin, shared_dir):
+def judge_test_cases(executor, program, test_cases, work_dir, problem, fail_fast, on_result=None):
     """
-    Execute code using subprocess (for Render, local development, etc.)
+    Judge test cases concurrently, JUDGE_PARALLELISM at a time (by default one per
+    CPU available to the worker, and no more than the executor allows for the
+    program), all sharing the one compiled program. Every
+    run is a child process, so threads are enough to drive them and they also
+    work inside Celery's daemonic pool processes. Each test gets its own
+    directory and, with JUDGE_PIN_CPUS, its own core for the duration of the run.
+    Visible tests run as one batch and hidden tests as the next, so with
+    fail_fast no hidden test starts before every visible one has passed.
+    Returns (results, skipped): results in test order and the number of tests
+    that never started. With fail_fast the results end at the first failing
+    test; once a test fails, later tests do not start and those running are killed.
+    on_result(number, case) is called as each result is known, in test order.
     """
-    config_obj = LANGUAGE_CONFIG.get(language.lower())
-    if not config_obj:
-        return {'error': 'Unsupported language'}
-    
-    try:
-        # Create temporary directory for code execution
-        with tempfile.TemporaryDirectory() as temp_dir:
-            code_path = os.path.join(temp_dir, config_obj['file_name'])
-            with open(code_path, 'w') as f:
-                f.write(code)
-            
-            input_path = os.path.join(temp_dir, 'input.txt')
-            with open(input_path, 'w') as f:
-                f.write(stdin)
-            
-            # Execute code based on language
-            if language.lower() == 'python':
-                result = subprocess.run(
-                    ['python', code_path],
-                    input=stdin,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    cwd=temp_dir
-                )
-            elif language.lower() == 'cpp':
-                # Compile C++ code
-                compile_result = subprocess.run(
-                    ['g++', code_path, '-o', os.path.join(temp_dir, 'a.out')],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    cwd=temp_dir
-                )
-                if compile_result.returncode != 0:
-                    return {'error': f'Compilation error: {compile_result.stderr}'}
-                
-                # Run compiled code
-                result = subprocess.run(
-                    [os.path.join(temp_dir, 'a.out')],
-                    input=stdin,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    cwd=temp_dir
-                )
-            elif language.lower() == 'java':
-                # Compile Java code
-                compile_result = subprocess.run(
-                    ['javac', code_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    cwd=temp_dir
-                )
-                if compile_result.returncode != 0:
-                    return {'error': f'Compilation error: {compile_result.stderr}'}
-                
-                # Run compiled Java code
-                class_name = config_obj['file_name'].replace('.java', '')
-                result = subprocess.run(
-                    ['java', class_name],
-                    input=stdin,
-                    capture_output=True,
-                    text=True,
-                    timeout=10,
-                    cwd=temp_dir
-                )
-            else:
-                return {'error': 'Unsupported language'}
-            
-            # Return results
-            if result.returncode == 0:
-                return {'output': result.stdout}
-            else:
-                return {'error': f'Runtime error: {result.stderr}'}
-                
-    except subprocess.TimeoutExpired:
-        return {'error': 'Time limit exceeded'}
-    except Exception as e:
-        return {'error': f'Execution error: {str(e)}'}
+    cpus = available_cpus()
+    workers = settings.JUDGE_PARALLELISM or len(cpus)
+    if program is not None and executor.max_parallel_runs(program):
+        workers = min(workers, executor.max_parallel_runs(program))
+    workers = max(1, min(workers, len(test_cases)))
+    slots = queue.Queue()
+    for cpu in (cpus[:workers] if settings.JUDGE_PIN_CPUS else [None] * workers):
+        slots.put(cpu)
+
+    lock = threading.Lock()
+    # Number of the first failing test under fail_fast (len + 1 while none
+    # has failed), the cancel events of tests running now, and how many started
+    state = {'stop': len(test_cases) + 1, 'started': 0}
+    running = {}
+
+    def stop_after(number):
+        with lock:
+            if number < state['stop']:
+                state['stop'] = number
+                for other, cancel in running.items():
+                    if other > number:
+                        cancel.set()
+
+    def judge(number, test_case):
+        with lock:
+            if number > state['stop']:
+                return None
+            state['started'] += 1
+            cancel = running[number] = threading.Event()
+        test_dir = os.path.join(work_dir, f'test-{number}')
+        cpu = slots.get()
+        try:
+            os.mkdir(test_dir)
+            case = judge_test_case(executor, program, test_case, test_dir, problem, cpu, cancel)
+        except Cancelled:
+            return None
+        finally:
+            slots.put(cpu)
+            with lock:
+                del running[number]
+        if fail_fast and case['verdict'] != 'Accepted':
+            stop_after(number)
+        return case
 
-def run_code_job_kubernetes(language, code, stdin, shared_dir):
+    # Consecutive runs of visible and hidden tests (visible ones come first)
+    batches = [list(batch) for _, batch in itertools.groupby(
+        enumerate(test_cases, start=1), key=lambda numbered: numbered[1].is_hidden)]
+    results = []
+    stopped = False
+    with ThreadPoolExecutor(max_workers=slots.qsize()) as pool:
+        try:
+            for batch in batches:
+                if stopped:
+                    break
+                # Each test runs in a copy of this context, so its logs and Jobs keep the correlation id
+                futures = [pool.submit(contextvars.copy_context().run, judge, number, test_case)
+                           for number, test_case in batch]
+                for future in futures:
+                    case = future.result()
+                    # None only comes after a failing test, where judging stops anyway
+                    if case is None:
+                        stopped = True
+                        break
+                    results.append(case)
+                    if on_result is not None:
+                        on_result(len(results), case)
+                    if fail_fast and case['verdict'] != 'Accepted':
+                        stopped = True
+                        break
+        finally:
+            # Nothing else starts, and tests still running are killed before
+            # the workspace is removed
+            stop_after(0)
+    return results, len(test_cases) - state['started']
+
+@shared_task
+def evaluate_submission(submission_id, fail_fast=None, lease=None):
     """
-    Execute code using Kubernetes pods (for production, GKE, etc.)
+    Judge a submission against every TestCase of its problem on the
+    JUDGE_EXECUTOR executor. The program is compiled once and the same binary is shared by tests judged
+    in parallel (see judge_test_cases). Visible tests come before hidden ones.
+    A problem without test cases is not judged and the submission stays Pending.
+    With fail_fast (default JUDGE_FAIL_FAST) judging stops at the first failing
+    test and the remaining ones are skipped.
+    lease is an execution slot taken at submission time, renewed while judging
+    and released here.
     """
+    with hold_execution_slot(lease):
+        return judge_submission(submission_id, fail_fast)
+
+@shared_task
+def rejudge_problem(problem_id):
+    """
+    Re-run every submission of a problem (e.g. after its test cases changed).
+    Each submission is judged as its own task on the low-priority rejudge queue.
+    """
+    submission_ids = list(
+        Submission.objects.filter(problem_id=problem_id).values_list('id', flat=True))
+    Submission.objects.filter(id__in=submission_ids).update(verdict='Pending', failed_test=None)
+    for submission_id in submission_ids:
+        evaluate_submission.apply_async((submission_id,), queue='rejudge', priority=6)
+    return {'problem_id': problem_id, 'queued': len(submission_ids)}
+
+@shared_task
+def reconcile_leaderboards():
+    """
+    Periodic rebuild of the Redis leaderboards from SolvedProblem (see CELERY_BEAT_SCHEDULE)
+    """
+    return rebuild_leaderboards()
+
+def judge_submission(submission_id, fail_fast=None):
+    """
+    Body of evaluate_submission; writes the verdict back to the Submission row
+    """
+    if fail_fast is None:
+        fail_fast = settings.JUDGE_FAIL_FAST
     try:
-        # Import Kubernetes libraries only when needed
-        from kubernetes import client, config
-        import time
-    except ImportError:
-        return {'error': 'Kubernetes libraries not installed. Install with: pip install kubernetes'}
-    
-    config_obj = LANGUAGE_CONFIG.get(language.lower())
-    if not config_obj:
-        return {'error': 'Unsupported language'}
-    
+        submission = Submission.objects.select_related('problem').get(pk=submission_id)
+    except Submission.DoesNotExist:
+        return {'error': 'Submission not found'}
+
+    problem = submission.problem
+    # Visible cases first; served from the worker's cache after the first submission
+    test_cases = test_data_cache.get(problem)
+    topic = f'submission:{submission.id}'
+    if not test_cases:
+        # Nothing to judge against; the submission stays Pending until the
+        # problem has tests (adding them and rejudging judges it)
+        logger.warning('Submission %s not judged: problem %s has no test cases', submission.id, problem.id)
+        publish(topic, {'type': 'done', 'status': submission.verdict, 'error': 'Problem has no test cases'})
+        return {'submission_id': submission.id, 'error': 'Problem has no test cases'}
+
+    verdict = 'Accepted'
+    failed_test = None
+    execution_time = None
+    memory = None
+    results = []
+    skipped = 0
+    # Watched through /api/submissions/<id>/progress/
+    publish(topic, {'type': 'status', 'status': 'Running', 'tests': len(test_cases)})
+    logger.info('Judging submission %s against %d tests', submission.id, len(test_cases))
+
+    def report(number, case):
+        if test_cases[number - 1].is_hidden:
+            # Progress only: how a hidden test went is never published
+            publish(topic, {'type': 'test', 'test': number, 'hidden': True})
+            return
+        publish(topic, {
+            'type': 'test',
+            'test': number,
+            'hidden': False,
+            'verdict': case['verdict'],
+            'time': case['time'],
+            'memory': case['memory'],
+        })
+
+    executor = get_executor(settings.JUDGE_EXECUTOR)
     try:
-        # Create shared directory
-        os.makedirs(shared_dir, exist_ok=True)
-        code_path = os.path.join(shared_dir, config_obj['file_name'])
-        with open(code_path, 'w') as f:
-            f.write(code)
-        input_path = os.path.join(shared_dir, 'input.txt')
-        with open(input_path, 'w') as f:
-            f.write(stdin)
-        
-        # Load Kubernetes config
-        try:
-            config.load_kube_config()
-        except Exception:
+        with workspace() as temp_dir:
+            language = get_language(submission.language)
+            if language is None:
+                program = {'error': 'Unsupported language'}
+            else:
+                program = executor.compile(language, submission.code, temp_dir)
+            if 'error' in program:
+                verdict = 'Compiler Error' if program.get('compile_error') else 'Runtime Error'
+                results.append({'error': program['error']})
+                test_cases = []
+                program = None
+
             try:
-                config.load_incluster_config()
-            except Exception as e:
-                return {'error': f'Kubernetes config error: {str(e)}'}
-        
-        batch_v1 = client.BatchV1Api()
-        job_name = f"oj-job-{int(time.time()*1000)}"
-        
-        # Security context for the container
-        security_context = client.V1SecurityContext(
-            run_as_user=1000,
-            run_as_group=3000,
-            allow_privilege_escalation=False,
-            capabilities=client.V1Capabilities(drop=["ALL"]),
-            read_only_root_filesystem=True
-        )
-        
-        run_cmd = config_obj['run_cmd']
-        container = client.V1Container(
-            name="runner",
-            image=config_obj['image'],
-            command=["/bin/sh", "-c", run_cmd],
-            resources=client.V1ResourceRequirements(
-                limits={"cpu": "1", "memory": "256Mi"},
-                requests={"cpu": "0.2", "memory": "128Mi"}
-            ),
-            volume_mounts=[client.V1VolumeMount(
-                mount_path="/code",
-                name="code-volume"
-            )],
-            security_context=security_context,
-            stdin=True,
-            tty=False
-        )
-        
-        volume = client.V1Volume(
-            name="code-volume",
-            host_path=client.V1HostPathVolumeSource(
-                path=shared_dir
-            )
-        )
-        
-        pod_spec = client.V1PodSpec(
-            containers=[container],
-            restart_policy="Never",
-            volumes=[volume],
-            security_context=client.V1PodSecurityContext(
-                run_as_non_root=True,
-                seccomp_profile=client.V1SeccompProfile(type="RuntimeDefault")
-            )
-        )
-        
-        template = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(labels={"job-name": job_name}),
-            spec=pod_spec
-        )
-        
-        job_spec = client.V1JobSpec(
-            template=template,
-            backoff_limit=0,
-            active_deadline_seconds=10
-        )
-        
-        job = client.V1Job(
-            api_version="batch/v1",
-            kind="Job",
-            metadata=client.V1ObjectMeta(name=job_name),
-            spec=job_spec
-        )
-        
-        # Create the job
-        batch_v1.create_namespaced_job(
-            body=job,
-            namespace="default"
-        )
-        
-        core_v1 = client.CoreV1Api()
-        pod_name = None
-        
-        # Wait for pod to be created
-        for _ in range(30):
-            pods = core_v1.list_namespaced_pod(
-                namespace="default",
-                label_selector=f"job-name={job_name}"
-            )
-            if pods.items:
-                pod_name = pods.items[0].metadata.name
-                pod_phase = pods.items[0].status.phase
-                if pod_phase in ['Running', 'Succeeded', 'Failed']:
-                    break
-            time.sleep(1)
-        
-        if not pod_name:
-            batch_v1.delete_namespaced_job(
-                name=job_name,
-                namespace="default",
-                body=client.V1DeleteOptions(propagation_policy='Foreground')
-            )
-            return {'error': 'Pod not created'}
-        
-        # Wait for job completion
-        for _ in range(15):
-            job_status = batch_v1.read_namespaced_job_status(job_name, "default")
-            pods = core_v1.list_namespaced_pod(
-                namespace="default",
-                label_selector=f"job-name={job_name}"
-            )
-            pod_phase = pods.items[0].status.phase if pods.items else None
-            
-            if job_status.status.succeeded:
-                try:
-                    logs = core_v1.read_namespaced_pod_log(
-                        name=pod_name, namespace="default")
-                except Exception:
-                    logs = ''
-                batch_v1.delete_namespaced_job(
-                    name=job_name,
-                    namespace="default",
-                    body=client.V1DeleteOptions(propagation_policy='Foreground')
-                )
-                return {'output': logs}
-            elif job_status.status.failed:
-                try:
-                    logs = core_v1.read_namespaced_pod_log(
-                        name=pod_name, namespace="default")
-                except Exception:
-                    logs = ''
-                batch_v1.delete_namespaced_job(
-                    name=job_name,
-                    namespace="default",
-                    body=client.V1DeleteOptions(propagation_policy='Foreground')
-                )
-                return {'error': 'Runtime Error', 'logs': logs}
-            time.sleep(1)
-        
-        batch_v1.delete_namespaced_job(
-            name=job_name,
-            namespace="default",
-            body=client.V1DeleteOptions(propagation_policy='Foreground')
-        )
-        return {'error': 'Time Limit Exceeded'}
-        
+                cases, skipped = judge_test_cases(executor, program, test_cases, temp_dir, problem, fail_fast, report)
+            finally:
+                if program is not None:
+                    executor.cleanup(program)
+            for number, (test_case, case) in enumerate(zip(test_cases, cases), start=1):
+                # Reported as the slowest test's CPU time and the largest peak RSS
+                execution_time = max(execution_time or 0.0, case['time'])
+                memory = max(memory or 0, case['memory'])
+                results.append({'test': number, 'hidden': test_case.is_hidden, **case})
+
+                # The first failing test decides the submission verdict
+                if case['verdict'] != 'Accepted' and failed_test is None:
+                    verdict = case['verdict']
+                    failed_test = number
     except Exception as e:
-        return {'error': f'Kubernetes execution error: {str(e)}'}
\ No newline at end of file
+        verdict = 'Runtime Error'
+        results.append({'error': f'Execution error: {str(e)}'})
+
+    judged = sum(1 for r in results if 'test' in r)
+    logger.info('Submission %s: %s after %d tests', submission.id, verdict, judged)
+    submission.verdict = verdict
+    submission.failed_test = failed_test
+    submission.execution_time = execution_time
+    submission.memory = memory
+    submission.save(update_fields=['verdict', 'failed_test', 'execution_time', 'memory'])
+    if verdict == 'Accepted' and judged:
+        # First accepted submission marks the problem solved; its signal moves the leaderboards
+        SolvedProblem.objects.get_or_create(user_id=submission.user_id, problem_id=problem.id)
+    publish(topic, {
+        'type': 'done',
+        'status': verdict,
+        'failed_test': failed_test,
+        'execution_time': execution_time,
+        'memory': memory,
+    })
+    return {
+        'submission_id': submission.id,
+        'verdict': verdict,
+        'failed_test': failed_test,
+        'skipped': skipped,
+        'results': results,
+    }
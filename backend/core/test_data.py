@@ -0,0 +1,120 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from .blob_store import get_blob_store
+from .models import TestCase
+
+# Per-worker cache of problem test sets, keyed by (problem id, test_set_version).
+# Problem.test_set_version is bumped by the TestCase signals in core/signals.py,
+# so a changed test set is simply a new key on every worker; stale entries age
+# out of the LRU. Test cases only carry blob metadata; payloads are fetched from
+# the blob store when a test runs. Test sets up to TEST_DATA_CACHE_MAX_BYTES in
+# total are kept in memory once read, larger ones are always streamed from the
+# blob files.
+TEST_DATA_CACHE_MAX_BYTES = int(os.environ.get('TEST_DATA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class CachedTestCase:
+    """
+    Blob metadata of one TestCase; with inline set, payloads are kept in memory
+    after their first use
+    """
+    __slots__ = ('id', 'is_hidden', 'input_blob', 'input_size', 'expected_blob', 'expected_size',
+                 'inline', '_payloads')
+
+    def __init__(self, id, is_hidden, input_blob, input_size, expected_blob, expected_size, inline=False):
+        self.id = id
+        self.is_hidden = is_hidden
+        self.input_blob = input_blob
+        self.input_size = input_size
+        self.expected_blob = expected_blob
+        self.expected_size = expected_size
+        self.inline = inline
+        self._payloads = {}
+
+    @property
+    def size(self):
+        return self.input_size + self.expected_size
+
+    def _payload(self, digest):
+        data = self._payloads.get(digest)
+        if data is None:
+            with get_blob_store().open(digest) as f:
+                data = f.read()
+            self._payloads[digest] = data
+        return data
+
+    def write_input(self, path):
+        if self.inline:
+            with open(path, 'wb') as f:
+                f.write(self._payload(self.input_blob))
+        else:
+            get_blob_store().fetch(self.input_blob, path)
+
+    def open_expected(self):
+        """
+        Binary stream over the expected output; close it when done
+        """
+        if self.inline:
+            return io.BytesIO(self._payload(self.expected_blob))
+        return get_blob_store().open(self.expected_blob)
+
+
+def load_test_cases(problem_id):
+    """
+    Read a problem's test set metadata from the database, visible cases first
+    """
+    rows = TestCase.objects.filter(problem_id=problem_id).order_by('is_hidden', 'id').values_list(
+        'id', 'is_hidden', 'input_blob', 'input_size', 'expected_blob', 'expected_size')
+    return [CachedTestCase(*row) for row in rows]
+
+
+class TestDataCache:
+    def __init__(self, max_bytes=TEST_DATA_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, problem):
+        """
+        Test set of problem at its current test_set_version
+        """
+        key = (problem.id, problem.test_set_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        test_cases = load_test_cases(problem.id)
+        size = sum(t.size for t in test_cases)
+        inline = size <= self.max_bytes
+        for test_case in test_cases:
+            test_case.inline = inline
+        with self._lock:
+            if key not in self._entries:
+                # Streamed test sets only cost their metadata
+                self._entries[key] = (test_cases, size if inline else 0)
+                self._bytes += size if inline else 0
+                while self._bytes > self.max_bytes:
+                    old_key, (old_cases, old_size) = self._entries.popitem(last=False)
+                    self._bytes -= old_size
+        return test_cases
+
+    def invalidate(self, problem_id):
+        """
+        Drop every cached version of a problem's test set held by this worker
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == problem_id]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+test_data_cache = TestDataCache()
@@ -1,3 +1,753 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import redis
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import blob_store, comparator, java_runtime, precompiled_headers
+from .blob_store import LocalBlobStore, S3BlobStore, set_blob_store
+from .executors import Executor, KubernetesJobExecutor, SubprocessExecutor
+from .kube_client import set_kube_clients
+from .languages import get_language
+from .limiter import (
+    acquire_execution_slot, release_execution_slot, renew_execution_slot, hold_execution_slot, GLOBAL_KEY, USER_KEY,
+)
+from .models import User, Problem, Submission, SolvedProblem, TestCase as ProblemTestCase
+from .python_pool import PythonWorkerPool
+from .redis_client import set_redis
+from .sandbox import Cancelled, Execution, run_measured, output_limit_exceeded
+from .tasks import judge_test_case, judge_test_cases, judge_submission
+
+try:
+    # The limiter is a Lua script; fakeredis runs it with lupa (pip install 'fakeredis[lua]')
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipUnless(fakeredis, "needs fakeredis[lua]")
+@override_settings(EXECUTION_GLOBAL_LIMIT=3, EXECUTION_USER_LIMIT=2, EXECUTION_LEASE_TTL=120, EXECUTION_QUEUE_TTL=900)
+class ExecutionLimiterTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+        set_redis(self.redis)
+
+    def tearDown(self):
+        set_redis(None)
+
+    def test_acquire_takes_a_global_and_a_user_slot(self):
+        lease = acquire_execution_slot(1)
+        self.assertIsNotNone(lease)
+        self.assertEqual(lease['user'], 1)
+        self.assertEqual(self.redis.zcard(GLOBAL_KEY), 1)
+        self.assertEqual(self.redis.zcard(USER_KEY.format(1)), 1)
+
+    def test_release_frees_both_slots_and_is_idempotent(self):
+        lease = acquire_execution_slot(1)
+        release_execution_slot(lease)
+        release_execution_slot(lease)
+        release_execution_slot(None)
+        self.assertEqual(self.redis.zcard(GLOBAL_KEY), 0)
+        self.assertEqual(self.redis.zcard(USER_KEY.format(1)), 0)
+
+    def test_per_user_cap(self):
+        first, second = acquire_execution_slot(1), acquire_execution_slot(1)
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(second)
+        self.assertIsNone(acquire_execution_slot(1))
+        # Other users are not held back by user 1
+        self.assertIsNotNone(acquire_execution_slot(2))
+        release_execution_slot(first)
+        self.assertIsNotNone(acquire_execution_slot(1))
+
+    def test_global_cap(self):
+        leases = [acquire_execution_slot(user) for user in (1, 2, 3)]
+        self.assertTrue(all(leases))
+        self.assertIsNone(acquire_execution_slot(4))
+        release_execution_slot(leases[0])
+        self.assertIsNotNone(acquire_execution_slot(4))
+
+    def test_expired_leases_are_dropped(self):
+        # Leases of holders that crashed without releasing, already past their expiry
+        self.redis.zadd(GLOBAL_KEY, {'crashed-a': 0, 'crashed-b': 0, 'crashed-c': 0})
+        self.redis.zadd(USER_KEY.format(1), {'crashed-a': 0, 'crashed-b': 0})
+        self.assertIsNotNone(acquire_execution_slot(1))
+        self.assertEqual(self.redis.zcard(GLOBAL_KEY), 1)
+        self.assertEqual(self.redis.zcard(USER_KEY.format(1)), 1)
+        self.assertGreater(self.redis.ttl(GLOBAL_KEY), 0)
+
+    def test_new_lease_lasts_through_the_queue(self):
+        lease = acquire_execution_slot(1)
+        expires = self.redis.zscore(GLOBAL_KEY, lease['token'])
+        self.assertGreater(expires, time.time() + 600)
+
+    def test_renewal_keeps_an_expired_lease_counted(self):
+        first, second = acquire_execution_slot(1), acquire_execution_slot(1)
+        # Both tasks ran past their lease without renewing
+        for lease in (first, second):
+            self.redis.zadd(GLOBAL_KEY, {lease['token']: 0})
+            self.redis.zadd(USER_KEY.format(1), {lease['token']: 0})
+        renew_execution_slot(first)
+        renew_execution_slot(second)
+        self.assertIsNone(acquire_execution_slot(1))
+        expires = self.redis.zscore(USER_KEY.format(1), first['token'])
+        self.assertAlmostEqual(expires, time.time() + 120, delta=5)
+        # Renewing shortens a lease but never the key holding longer ones
+        self.assertGreater(self.redis.ttl(GLOBAL_KEY), 600)
+
+    def test_running_task_holds_its_slot_until_done(self):
+        lease = acquire_execution_slot(1)
+        with hold_execution_slot(lease, interval=0.01):
+            self.redis.zadd(GLOBAL_KEY, {lease['token']: 0})
+            time.sleep(0.1)
+            self.assertGreater(self.redis.zscore(GLOBAL_KEY, lease['token']), time.time())
+        self.assertEqual(self.redis.zcard(GLOBAL_KEY), 0)
+        self.assertEqual(self.redis.zcard(USER_KEY.format(1)), 0)
+
+    def test_fails_open_without_redis(self):
+        set_redis(redis.Redis(host='127.0.0.1', port=1, socket_connect_timeout=0.1))
+        with self.assertLogs('core.limiter', 'WARNING'):
+            lease = acquire_execution_slot(1)
+        self.assertIsNotNone(lease)
+        with self.assertLogs('core.limiter', 'WARNING'):
+            release_execution_slot(lease)
+
+    def test_anonymous_user_has_no_bucket(self):
+        with self.assertRaises(ValueError):
+            acquire_execution_slot(None)
+
+    def test_anonymous_requests_take_no_slot(self):
+        client = APIClient()
+        response = client.post('/api/submissions/', {'code': 'print(1)', 'language': 'python'})
+        self.assertEqual(response.status_code, 401)
+        response = client.post('/api/compile/', {'code': 'print(1)', 'language': 'python'}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.redis.zcard(GLOBAL_KEY), 0)
+
+
+class InlineTestCase:
+    """
+    Stand-in for test_data.CachedTestCase with its payloads in memory
+    """
+    def __init__(self, input_data, expected, is_hidden=False):
+        self.input_data = input_data
+        self.expected = expected
+        self.is_hidden = is_hidden
+
+    def write_input(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.input_data)
+
+    def open_expected(self):
+        return io.BytesIO(self.expected)
+
+
+FLOOD_CPP = """
+#include <cstdio>
+int main() { for (;;) putchar('x'); }
+"""
+
+
+@mock.patch('core.sandbox.OUTPUT_LIMIT_BYTES', 1024 * 1024)
+class OutputLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.stdin = os.path.join(self.work_dir, 'input.txt')
+        open(self.stdin, 'wb').close()
+        self.stdout = os.path.join(self.work_dir, 'output.txt')
+        self.stderr = os.path.join(self.work_dir, 'error.txt')
+
+    def test_flooding_program_dies_of_sigxfsz(self):
+        result = run_measured(['yes'], self.stdin, self.stdout, self.stderr, self.work_dir, time_limit=2)
+        self.assertEqual(result.returncode, -signal.SIGXFSZ)
+        self.assertIsNone(result.timeout)
+        self.assertEqual(os.path.getsize(self.stdout), 1024 * 1024)
+        self.assertTrue(output_limit_exceeded(result.returncode, self.stdout))
+
+    @unittest.skipUnless(shutil.which('g++'), "needs g++")
+    def test_flooding_cpp_program_is_output_limit_exceeded(self):
+        language = get_language('cpp')
+        with open(os.path.join(self.work_dir, language.source_file), 'w') as f:
+            f.write(FLOOD_CPP)
+        subprocess.run(['g++', '-O2', '-o', 'a.out', language.source_file], cwd=self.work_dir, check=True)
+        program = {'language': language, 'work_dir': self.work_dir}
+        problem = SimpleNamespace(time_limit=2, memory_limit=256)
+        case = judge_test_case(SubprocessExecutor(), program, InlineTestCase(b'', b''), self.work_dir, problem)
+        self.assertEqual(case['verdict'], 'Output Limit Exceeded')
+        self.assertIsNone(case['timeout'])
+
+
+THREADED_MAIN = """
+import sys
+import threading
+import time
+
+
+def main():
+    time.sleep(0.2)
+    print(sum(map(int, sys.stdin.read().split())))
+
+
+threading.stack_size(64 * 1024 * 1024)
+threading.Thread(target=main).start()
+"""
+
+PICKLE_CLASS = """
+import pickle
+
+
+class Point:
+    def __init__(self, x):
+        self.x = x
+
+
+print(pickle.loads(pickle.dumps(Point(7))).x)
+"""
+
+
+class WarmPythonRunnerTests(SimpleTestCase):
+    """
+    Programs must behave on a warm runner as they do under a cold `python user_code.py`
+    """
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.stdin = os.path.join(self.work_dir, 'input.txt')
+        with open(self.stdin, 'w') as f:
+            f.write('1 2 3\n')
+        self.stdout = os.path.join(self.work_dir, 'output.txt')
+        self.stderr = os.path.join(self.work_dir, 'error.txt')
+
+    def run_on(self, pool, code, time_limit=2):
+        result = pool.run(code, self.stdin, self.stdout, self.stderr, time_limit, 256)
+        with open(self.stdout) as f:
+            return result, f.read()
+
+    def pool(self, max_uses=1):
+        pool = PythonWorkerPool(size=1, max_uses=max_uses)
+        self.addCleanup(lambda: [runner.close() for runner in list(pool._idle.queue)])
+        return pool
+
+    def test_waits_for_non_daemon_threads(self):
+        result, output = self.run_on(self.pool(), THREADED_MAIN)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(output, '6\n')
+
+    def test_pickles_classes_from_main(self):
+        result, output = self.run_on(self.pool(), PICKLE_CLASS)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(output, '7\n')
+
+    def test_raw_file_descriptors(self):
+        code = "import os\nos.write(1, os.read(0, 100))\n"
+        result, output = self.run_on(self.pool(), code)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(output, '1 2 3\n')
+
+    def test_reused_runner_restores_builtins(self):
+        pool = self.pool(max_uses=2)
+        self.run_on(pool, "import builtins\nbuiltins.print = None\nbuiltins.leak = 1\n")
+        result, output = self.run_on(pool, "print('leak' in dir(__builtins__))\n")
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(output, 'False\n')
+
+    def test_runner_that_ran_threads_is_not_reused(self):
+        pool = self.pool(max_uses=2)
+        self.run_on(pool, "import threading, time\n"
+                          "threading.Thread(target=time.sleep, args=(60,), daemon=True).start()\n")
+        result, output = self.run_on(pool, "import threading\nprint(threading.active_count())\n")
+        self.assertEqual(output, '1\n')
+
+    def test_sigkill_is_not_a_cpu_timeout(self):
+        result, _ = self.run_on(self.pool(), "import os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n")
+        self.assertEqual(result.returncode, -signal.SIGKILL)
+        self.assertIsNone(result.timeout)
+
+    def test_cpu_limit(self):
+        result, _ = self.run_on(self.pool(), "while True:\n    pass\n", time_limit=1)
+        self.assertEqual(result.timeout, 'cpu')
+
+
+@mock.patch('core.tasks.publish')
+class EmptyProblemTests(TestCase):
+    def test_problem_without_test_cases_is_not_judged(self, publish):
+        user = User.objects.create_user('solver', password='x')
+        problem = Problem.objects.create(title='Empty', description='-', constrains='-', starter_code='',
+                                         created_by=user)
+        submission = Submission.objects.create(problem=problem, user=user, code='print(1)', language='python')
+        result = judge_submission(submission.id)
+        self.assertIn('error', result)
+        submission.refresh_from_db()
+        self.assertEqual(submission.verdict, 'Pending')
+        self.assertFalse(SolvedProblem.objects.filter(user=user, problem=problem).exists())
+
+
+class EchoExecutor(Executor):
+    """
+    Runs nothing: the "program" copies its input to its output after a short
+    pause, recording the order runs start in and how many overlap
+    """
+    def __init__(self, parallel=None):
+        self.parallel = parallel
+        self.started = []
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+
+    def run(self, program, stdin_path, stdout_path, stderr_path, work_dir,
+            time_limit=None, memory_limit_mb=None, cpu=None, cancel=None):
+        with self.lock:
+            self.started.append(os.path.basename(work_dir))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.05)
+        shutil.copyfile(stdin_path, stdout_path)
+        with self.lock:
+            self.running -= 1
+        return Execution(0, 0.01, 0.05, 1024, None)
+
+    def max_parallel_runs(self, program):
+        return self.parallel
+
+
+@override_settings(JUDGE_PARALLELISM=4, JUDGE_PIN_CPUS=False)
+class ParallelJudgeTests(SimpleTestCase):
+    problem = SimpleNamespace(time_limit=1, memory_limit=256, checker='token')
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+
+    def test_hidden_tests_wait_for_visible_ones(self):
+        executor = EchoExecutor()
+        test_cases = [InlineTestCase(b'1', b'1'), InlineTestCase(b'2', b'0'),
+                      InlineTestCase(b'3', b'3', is_hidden=True), InlineTestCase(b'4', b'4', is_hidden=True)]
+        results, skipped = judge_test_cases(executor, {}, test_cases, self.work_dir, self.problem, True)
+        self.assertEqual([case['verdict'] for case in results], ['Accepted', 'Wrong Answer'])
+        self.assertEqual(sorted(executor.started), ['test-1', 'test-2'])
+        self.assertEqual(skipped, 2)
+
+    def test_hidden_tests_run_after_visible_ones_pass(self):
+        executor = EchoExecutor()
+        test_cases = [InlineTestCase(b'1', b'1'), InlineTestCase(b'2', b'2', is_hidden=True),
+                      InlineTestCase(b'3', b'3', is_hidden=True)]
+        results, skipped = judge_test_cases(executor, {}, test_cases, self.work_dir, self.problem, True)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(executor.started[0], 'test-1')
+        self.assertEqual(skipped, 0)
+
+    def test_executor_caps_parallel_runs(self):
+        executor = EchoExecutor(parallel=1)
+        test_cases = [InlineTestCase(b'1', b'1') for _ in range(4)]
+        results, _ = judge_test_cases(executor, {}, test_cases, self.work_dir, self.problem, True)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(executor.most_running, 1)
+
+
+class JavaRuntimeTests(SimpleTestCase):
+    def setUp(self):
+        runtime_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, runtime_dir)
+        for patcher in (mock.patch.object(java_runtime, 'JAVA_RUNTIME_DIR', runtime_dir),
+                        mock.patch.object(java_runtime, '_jdk_key', return_value='jdk'),
+                        mock.patch.object(java_runtime, '_runtime', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.runtime_dir = os.path.join(runtime_dir, 'jdk')
+
+    def test_submissions_never_build_the_runtime(self):
+        with mock.patch.object(java_runtime, '_build') as build:
+            self.assertIsNone(java_runtime.get_runtime())
+        build.assert_not_called()
+
+    def test_runtime_built_at_startup_is_used(self):
+        with mock.patch.object(java_runtime, '_build') as build:
+            java_runtime.build_runtime()
+            java_runtime._runtime.clear()
+            self.assertEqual(java_runtime.get_runtime(), {'dir': self.runtime_dir, 'archive': None})
+        build.assert_called_once()
+
+
+class PrecompiledHeaderTests(SimpleTestCase):
+    def setUp(self):
+        pch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pch_dir)
+        for patcher in (mock.patch.object(precompiled_headers, 'PCH_DIR', pch_dir),
+                        mock.patch.object(precompiled_headers, 'PCH_ENABLED', True),
+                        mock.patch.object(precompiled_headers, '_include_dirs', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.language = get_language('cpp')
+
+    def test_compilations_never_build_headers(self):
+        with mock.patch.object(precompiled_headers, '_build') as build:
+            self.assertIsNone(precompiled_headers.include_dir(self.language))
+        build.assert_not_called()
+
+    def test_headers_built_at_startup_are_used(self):
+        with mock.patch.object(precompiled_headers, '_build') as build:
+            path = precompiled_headers.build_precompiled_headers(self.language)
+            precompiled_headers._include_dirs.clear()
+            self.assertEqual(precompiled_headers.include_dir(self.language), path)
+        build.assert_called_once()
+
+
+class FakeS3Client:
+    """
+    Stands in for boto3's S3 client (or MinIO behind it) with objects in a dict
+    """
+    def __init__(self, objects):
+        self.objects = objects
+        self.downloads = []
+
+    def download_file(self, bucket, key, path):
+        self.downloads.append(key)
+        with open(path, 'wb') as f:
+            f.write(self.objects[key])
+
+
+class S3BlobStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.store = S3BlobStore(bucket='test', prefix='', cache_dir=self.cache_dir, cache_max_bytes=10)
+        self.store._client = FakeS3Client({})
+
+    def add(self, digest, data):
+        self.store.client.objects[self.store._key(digest)] = data
+
+    def read(self, digest):
+        with self.store.open(digest) as f:
+            return f.read()
+
+    def test_mirrored_blob_is_downloaded_once(self):
+        self.add('aa01', b'12345')
+        self.assertEqual(self.read('aa01'), b'12345')
+        self.assertEqual(self.read('aa01'), b'12345')
+        self.assertEqual(len(self.store.client.downloads), 1)
+
+    def test_blob_larger_than_the_mirror_stays_after_download(self):
+        self.add('aa01', b'x' * 100)
+        self.assertEqual(self.read('aa01'), b'x' * 100)
+        self.assertEqual(self.read('aa01'), b'x' * 100)
+        self.assertEqual(len(self.store.client.downloads), 1)
+
+    def test_open_blob_is_not_evicted(self):
+        self.add('aa01', b'a' * 8)
+        self.add('bb02', b'b' * 8)
+        self.add('cc03', b'c' * 8)
+        with self.store.open('aa01') as held:
+            self.read('bb02')
+            self.assertTrue(os.path.exists(self.store._mirror_path('aa01')))
+            self.assertEqual(held.read(), b'a' * 8)
+        self.read('cc03')
+        self.assertFalse(os.path.exists(self.store._mirror_path('aa01')))
+        self.assertFalse(os.path.exists(self.store._mirror_path('bb02')))
+
+    def test_blob_evicted_before_it_is_pinned_is_downloaded_again(self):
+        self.add('aa01', b'12345')
+        self.read('aa01')
+        path = self.store._mirror_path('aa01')
+        flock = blob_store.fcntl.flock
+        calls = []
+
+        def evict_first(f, operation):
+            # evict() wins the race between open() and the shared lock once
+            calls.append(operation)
+            if len(calls) == 1:
+                self.assertTrue(blob_store._remove_unpinned(path))
+            flock(f, operation)
+
+        with mock.patch.object(blob_store.fcntl, 'flock', side_effect=evict_first):
+            self.assertEqual(self.read('aa01'), b'12345')
+        self.assertEqual(len(self.store.client.downloads), 2)
+
+    def test_fetch_copies_the_blob(self):
+        self.add('aa01', b'12345')
+        dest = os.path.join(self.cache_dir, 'input.txt')
+        self.store.fetch('aa01', dest)
+        with open(dest, 'rb') as f:
+            self.assertEqual(f.read(), b'12345')
+
+
+class TestCaseModelTests(TestCase):
+    def test_str_does_not_load_the_problem(self):
+        user = User.objects.create_user('setter', password='x')
+        problem = Problem.objects.create(title='Sum', description='-', constrains='-', starter_code='',
+                                         created_by=user)
+        test_case = ProblemTestCase.objects.create(problem=problem)
+        test_case = ProblemTestCase.objects.get(pk=test_case.pk)
+        with self.assertNumQueries(0):
+            self.assertIn(str(problem.pk), str(test_case))
+
+
+def fake_pod(phase, exit_code=None):
+    terminated = SimpleNamespace(exit_code=exit_code) if exit_code is not None else None
+    return SimpleNamespace(
+        metadata=SimpleNamespace(name='runner-pod'),
+        status=SimpleNamespace(phase=phase, container_statuses=[SimpleNamespace(
+            state=SimpleNamespace(terminated=terminated))]))
+
+
+class FakeBatchV1:
+    def __init__(self):
+        self.jobs = []
+        self.deleted = []
+
+    def create_namespaced_job(self, body, namespace):
+        self.jobs.append(body)
+
+    def delete_namespaced_job(self, name, namespace, body):
+        self.deleted.append((name, body.propagation_policy))
+
+
+class FakeCoreV1:
+    """
+    Pod events are replayed by FakeWatch; with wait_for_delete, the last one
+    only comes once the job's pods have been deleted (cancellation)
+    """
+    def __init__(self, events, logs='', wait_for_delete=False):
+        self.events = events
+        self.logs = logs
+        self.wait_for_delete = wait_for_delete
+        self.pods_deleted = threading.Event()
+
+    def list_namespaced_pod(self, namespace, label_selector, timeout_seconds):
+        for event in self.events[:-1] if self.wait_for_delete else self.events:
+            yield event
+        if self.wait_for_delete and self.pods_deleted.wait(10):
+            yield self.events[-1]
+
+    def read_namespaced_pod_log(self, name, namespace):
+        return self.logs
+
+    def delete_collection_namespaced_pod(self, namespace, label_selector, grace_period_seconds):
+        self.pods_deleted.set()
+
+
+class FakeWatch:
+    def stream(self, func, **kwargs):
+        return func(**kwargs)
+
+    def stop(self):
+        pass
+
+
+@mock.patch('kubernetes.watch.Watch', FakeWatch)
+class KubernetesJobExecutorTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.addCleanup(set_kube_clients, None, None)
+        self.batch_v1 = FakeBatchV1()
+        self.stdin_path = os.path.join(self.work_dir, 'input.txt')
+        self.stdout_path = os.path.join(self.work_dir, 'output.txt')
+        self.stderr_path = os.path.join(self.work_dir, 'error.txt')
+        with open(self.stdin_path, 'w') as f:
+            f.write('1 2\n')
+
+    def pod_events(self, *events, **kwargs):
+        core_v1 = FakeCoreV1([{'type': kind, 'object': pod} for kind, pod in events], **kwargs)
+        set_kube_clients(self.batch_v1, core_v1)
+        return core_v1
+
+    def run_program(self, cancel=None):
+        program = {'language': get_language('python'), 'work_dir': self.work_dir}
+        return KubernetesJobExecutor().run(program, self.stdin_path, self.stdout_path, self.stderr_path,
+                                           self.work_dir, time_limit=1, cancel=cancel)
+
+    def assert_job_cleaned_up(self):
+        job_name = self.batch_v1.jobs[0].metadata.name
+        self.assertEqual(self.batch_v1.deleted, [(job_name, 'Foreground')])
+
+    def test_successful_job(self):
+        self.pod_events(('ADDED', fake_pod('Pending')), ('MODIFIED', fake_pod('Running')),
+                        ('MODIFIED', fake_pod('Succeeded', 0)), logs='3\n')
+        result = self.run_program()
+        self.assertEqual(result.returncode, 0)
+        self.assertIsNone(result.timeout)
+        with open(self.stdout_path) as f:
+            self.assertEqual(f.read(), '3\n')
+        job = self.batch_v1.jobs[0]
+        self.assertEqual(job.spec.backoff_limit, 0)
+        self.assertIn('< /code/input.txt', job.spec.template.spec.containers[0].command[2])
+        self.assert_job_cleaned_up()
+
+    def test_limits_enforced_in_the_pod_are_timeouts(self):
+        for exit_code, timeout in ((124, 'wall'), (128 + signal.SIGXCPU, 'cpu'), (1, None)):
+            self.batch_v1 = FakeBatchV1()
+            self.pod_events(('MODIFIED', fake_pod('Failed', exit_code)), logs='error\n')
+            result = self.run_program()
+            self.assertEqual((result.returncode, result.timeout), (exit_code, timeout))
+            self.assert_job_cleaned_up()
+
+    def test_job_past_its_deadline_is_a_timeout(self):
+        self.pod_events(('ADDED', fake_pod('Running')), ('DELETED', fake_pod('Running')))
+        result = self.run_program()
+        self.assertIsNone(result.returncode)
+        self.assertEqual(result.timeout, 'wall')
+        self.assert_job_cleaned_up()
+
+    def test_job_is_deleted_when_no_pod_appears(self):
+        self.pod_events()
+        with self.assertRaises(RuntimeError):
+            self.run_program()
+        self.assert_job_cleaned_up()
+
+    def test_cancelled_run_deletes_its_pods_and_job(self):
+        core_v1 = self.pod_events(('ADDED', fake_pod('Running')), ('DELETED', fake_pod('Running')),
+                                  wait_for_delete=True)
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(Cancelled):
+            self.run_program(cancel)
+        self.assertTrue(core_v1.pods_deleted.is_set())
+        self.assert_job_cleaned_up()
+
+    @mock.patch('core.executors.COMPILE_CACHE_ENABLED', False)
+    def test_compile_in_a_job(self):
+        cpp = get_language('cpp')
+        self.pod_events(('MODIFIED', fake_pod('Failed', 1)), logs='error: expected ;')
+        program = KubernetesJobExecutor().compile(cpp, 'int main() {}', self.work_dir)
+        self.assertIn('expected ;', program['error'])
+        self.assert_job_cleaned_up()
+
+        self.batch_v1 = FakeBatchV1()
+        self.pod_events(('MODIFIED', fake_pod('Failed', 124)))
+        with self.assertRaises(subprocess.TimeoutExpired):
+            KubernetesJobExecutor().compile(cpp, 'int main() {}', self.work_dir)
+        self.assert_job_cleaned_up()
+
+
+class ShortReads(io.RawIOBase):
+    """
+    A stream whose reads return at most a few bytes, like a pipe or socket
+    """
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.data.read(min(len(buffer), 7))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class ComparatorTests(SimpleTestCase):
+    def test_exact_match_with_short_reads(self):
+        data = bytes(range(256)) * 1000
+        self.assertTrue(comparator.exact_match(ShortReads(data), data))
+        self.assertFalse(comparator.exact_match(ShortReads(data), data[:-1] + b'x'))
+        self.assertFalse(comparator.exact_match(ShortReads(data[:-1]), data))
+
+    def test_lines_cut_inside_trailing_whitespace(self):
+        # A cut right after the space must not leave a blank line behind
+        self.assertEqual(list(comparator.iter_lines(io.BytesIO(b'abc \nx\n'), chunk_size=4)), [b'abc', b'x'])
+        self.assertEqual(list(comparator.iter_lines(io.BytesIO(b'ab' + b' ' * 9 + b'\nx'), chunk_size=4)),
+                         [b'ab', b'x'])
+
+    def test_lines_cut_are_not_line_breaks(self):
+        self.assertEqual(list(comparator.iter_lines(io.BytesIO(b'abcdef\n'), chunk_size=2)), [b'abcdef'])
+        self.assertNotEqual(list(comparator.iter_lines(io.BytesIO(b'abcd\n'), chunk_size=2)),
+                            list(comparator.iter_lines(io.BytesIO(b'ab\ncd\n'), chunk_size=2)))
+
+    def test_long_lines_match_across_chunks(self):
+        line = b'x' * (comparator.CHUNK_SIZE - 1)
+        self.assertTrue(comparator.lines_match(line + b'  \n\n', line + b'\n'))
+        self.assertTrue(comparator.lines_match(line + b'\t\ny\n', line + b'\ny \n'))
+        self.assertFalse(comparator.lines_match(line + b' \n\ny\n', line + b'\ny\n'))
+
+
+@mock.patch('core.comparator.CHECKER_TIMEOUT', 1)
+class CustomCheckerTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.input_path = os.path.join(self.work_dir, 'input.txt')
+        self.output_path = os.path.join(self.work_dir, 'output.txt')
+        with open(self.input_path, 'w') as f:
+            f.write('2 3\n')
+        with open(self.output_path, 'w') as f:
+            f.write('5\n')
+
+    def check(self, code):
+        return comparator.run_custom_checker(code, self.input_path, self.output_path, b'5\n')
+
+    def test_checker_decides_by_exit_status(self):
+        accept = ('import sys\n'
+                  'a, b = map(int, open(sys.argv[1]).read().split())\n'
+                  'sys.exit(0 if int(open(sys.argv[3]).read()) == a + b == int(open(sys.argv[2]).read()) else 1)\n')
+        self.assertTrue(self.check(accept))
+        self.assertFalse(self.check('raise SystemExit(1)'))
+
+    def test_checker_ignores_links_left_by_the_program(self):
+        target = os.path.join(self.work_dir, 'target')
+        os.symlink(target, os.path.join(self.work_dir, 'checker.py'))
+        os.symlink(target, os.path.join(self.work_dir, 'expected.txt'))
+        self.assertTrue(self.check('pass'))
+        self.assertFalse(os.path.exists(target))
+
+    def test_output_replaced_by_a_link_is_rejected(self):
+        os.remove(self.output_path)
+        os.symlink(self.input_path, self.output_path)
+        self.assertFalse(self.check('pass'))
+
+    def test_checker_runs_under_limits(self):
+        self.assertFalse(self.check('while True: pass'))
+        self.assertFalse(self.check('x = bytearray(2 * 1024 ** 3)'))
+
+
+@unittest.skipUnless(fakeredis, "needs fakeredis[lua]")
+class SubmissionProgressTests(TestCase):
+    def setUp(self):
+        set_redis(fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+        self.addCleanup(set_redis, None)
+        blob_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, blob_dir)
+        set_blob_store(LocalBlobStore(blob_dir))
+        self.addCleanup(set_blob_store, None)
+        self.owner = User.objects.create_user('owner', password='x', university_name='R1')
+        problem = Problem.objects.create(title='Echo', description='-', constrains='-', starter_code='',
+                                         created_by=self.owner)
+        for data, hidden in (('1', False), ('2', True)):
+            test_case = ProblemTestCase(problem=problem, is_hidden=hidden)
+            test_case.set_input(f'{data}\n')
+            test_case.set_expected_output(f'{data}\n')
+            test_case.save()
+        self.submission = Submission.objects.create(problem=problem, user=self.owner, code='print(input())',
+                                                    language='python')
+        self.url = f'/api/submissions/{self.submission.id}/progress/'
+
+    def test_only_the_owner_sees_progress(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.url).status_code, 401)
+        client.force_authenticate(User.objects.create_user('other', password='x', university_name='R2'))
+        self.assertEqual(client.get(self.url).status_code, 404)
+        client.force_authenticate(self.owner)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'Pending')
+
+    def test_hidden_tests_publish_no_details(self):
+        judge_submission(self.submission.id)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        events = client.get(self.url).json()['events']
+        tests = [event for event in events if event['type'] == 'test']
+        self.assertEqual(tests[0]['verdict'], 'Accepted')
+        self.assertEqual(tests[1], {'seq': tests[1]['seq'], 'type': 'test', 'test': 2, 'hidden': True})
+        self.assertEqual(events[-1]['status'], 'Accepted')
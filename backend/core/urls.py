@@ -1,19 +1,21 @@
 from .views import ProblemListView
 from django.urls import path
 from rest_framework.generics import ListAPIView
-from .views import ProblemListView, ProblemDetailView
+from .views import ProblemListView, ProblemDetailView, ProblemFacetsView
 from .views import SubmissionListCreateView
 from .views import RegisterView
-from .views import SubmissionDetailView
+from .views import SubmissionDetailView, SubmissionProgressView
 from rest_framework.generics import RetrieveAPIView
 from .models import Submission
 from .serializers import SubmissionSerializer
 from .views_compile import compile_code, compile_result
 from .views import CustomLoginView
 from .views import SolvedProblemView
+from .views import LeaderboardView, LeaderboardRankView
 
 urlpatterns = [
     path('problems/', ProblemListView.as_view(), name='problem-list'),
+    path('problems/facets/', ProblemFacetsView.as_view(), name='problem-facets'),
     path('problems/<int:id>/', ProblemDetailView.as_view(), name='problem-detail'),
     path('submissions/', SubmissionListCreateView.as_view(), name='submission-list-create'),
     path('auth/register/', RegisterView.as_view(), name='register'),
@@ -21,6 +23,7 @@ urlpatterns = [
 
 urlpatterns += [
     path('submissions/<int:id>/', SubmissionDetailView.as_view(), name='submission-detail'),
+    path('submissions/<int:id>/progress/', SubmissionProgressView.as_view(), name='submission-progress'),
 ]
 
 urlpatterns += [
@@ -34,4 +37,9 @@ urlpatterns += [
 
 urlpatterns += [
     path('solved/', SolvedProblemView.as_view(), name='solved-problem'),
+]
+
+urlpatterns += [
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/rank/', LeaderboardRankView.as_view(), name='leaderboard-rank'),
 ]
\ No newline at end of file
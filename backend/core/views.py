@@ -26,15 +26,71 @@ from rest_framework.views import APIView
 from .models import SolvedProblem
 from .serializers import SolvedProblemSerializer
 from rest_framework import generics
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from .limiter import acquire_execution_slot, release_execution_slot
+from .pagination import ProblemCursorPagination, SubmissionCursorPagination
+from .serializers import SubmissionListSerializer
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from .response_cache import cached_json_response
+from .tag_index import filter_by_tags, tag_facets
+from . import leaderboard
+from .solved_cache import solved_problem_ids
+from .progress import progress_response, EventStreamRenderer
+from rest_framework.renderers import JSONRenderer
 
 
 User = get_user_model()
 
+def filter_problems(queryset, params):
+    """
+    Apply ?difficulty=Easy,Medium and ?tags=dp,graphs (&match=any) to a Problem queryset
+    """
+    difficulty = params.get('difficulty')
+    if difficulty:
+        queryset = queryset.filter(difficulty__in=difficulty.split(','))
+    tags = [t.strip() for t in params.get('tags', '').split(',') if t.strip()]
+    if tags:
+        queryset = filter_by_tags(queryset, tags, match='any' if params.get('match') == 'any' else 'all')
+    return queryset
+
 class ProblemListView(ListAPIView):
-    queryset = Problem.objects.all()
+    """
+    Cursor-paginated problem list, filterable with ?difficulty=Easy,Medium and
+    ?tags=dp,graphs (all tags must match, or any of them with &match=any).
+    Rendered pages are cached in Redis until a Problem changes and carry an
+    ETag for conditional GETs. For a signed-in user each problem also carries
+    a solved flag, read from the user's solved bitmap (see core.solved_cache).
+    """
     serializer_class = ProblemSerializer
+    pagination_class = ProblemCursorPagination
+
+    def get_queryset(self):
+        # Only the columns ProblemSerializer emits, not the large TEXT ones
+        queryset = Problem.objects.only('id', 'title', 'difficulty', 'tags', 'created_at')
+        return filter_problems(queryset, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        render = super().list
+        personalize = self.add_solved_flags if request.user.is_authenticated else None
+        return cached_json_response(
+            'problems', request, lambda: render(request, *args, **kwargs).data, personalize)
+
+    def add_solved_flags(self, data):
+        solved = solved_problem_ids(self.request.user.id, [p['id'] for p in data['results']])
+        for problem in data['results']:
+            problem['solved'] = problem['id'] in solved
+        return data
+
+class ProblemFacetsView(APIView):
+    """
+    Problem counts per difficulty and per tag (split by difficulty) for the
+    problems matching the same filters as the problem list
+    """
+    def get(self, request):
+        queryset = filter_problems(Problem.objects.all(), request.query_params)
+        return cached_json_response('problems', request, lambda: tag_facets(queryset))
 
 class ProblemDetailView(RetrieveAPIView):
     queryset = Problem.objects.all()
@@ -42,13 +98,58 @@ class ProblemDetailView(RetrieveAPIView):
     lookup_field = 'id'
 
 class SubmissionListCreateView(ListCreateAPIView):
-    queryset = Submission.objects.all()
+    """
+    GET lists submissions newest first, keyset-paginated and without code.
+    ?user=me (or a user id) and ?problem=<id> narrow it to one user's history.
+    POST submits code as the signed-in user.
+    """
     serializer_class = SubmissionSerializer
+    pagination_class = SubmissionCursorPagination
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET':
+            return SubmissionListSerializer
+        return SubmissionSerializer
+
+    def get_queryset(self):
+        queryset = Submission.objects.only(*SubmissionListSerializer.Meta.fields)
+        user = self.request.query_params.get('user')
+        if user == 'me':
+            if not self.request.user.is_authenticated:
+                raise NotAuthenticated()
+            queryset = queryset.filter(user_id=self.request.user.id)
+        elif user:
+            queryset = queryset.filter(user_id=self._id_param('user', user))
+        problem = self.request.query_params.get('problem')
+        if problem:
+            queryset = queryset.filter(problem_id=self._id_param('problem', problem))
+        return queryset
+
+    def _id_param(self, name, value):
+        if not value.isdigit():
+            raise ValidationError({name: 'Expected an id' + (' or "me"' if name == 'user' else '')})
+        return int(value)
+
+    def create(self, request, *args, **kwargs):
+        # Judging shares the execution limiter with /api/compile/
+        self.lease = acquire_execution_slot(request.user.id)
+        if self.lease is None:
+            return Response(
+                {'error': 'Too many concurrent executions, please retry shortly'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(settings.EXECUTION_RETRY_AFTER)}
+            )
+        try:
+            return super().create(request, *args, **kwargs)
+        except Exception:
+            release_execution_slot(self.lease)
+            raise
 
     def perform_create(self, serializer):
         submission = serializer.save()
         from .tasks import evaluate_submission
-        evaluate_submission.delay(submission.id)
+        evaluate_submission.delay(submission.id, lease=self.lease)
 
 
 
@@ -57,6 +158,34 @@ class RegisterView(generics.CreateAPIView):
 
 from rest_framework.generics import RetrieveAPIView
 
+class SubmissionProgressView(APIView):
+    """
+    Judging progress of one of the signed-in user's submissions, one event per
+    judged test case (hidden ones carry no verdict, time or memory).
+    ?wait=<seconds>&after=<seq> long-polls; `Accept: text/event-stream` streams.
+    """
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        # Other users' submissions look the same as missing ones
+        if not Submission.objects.filter(pk=id, user=request.user).exists():
+            return Response({'error': 'Submission not found'}, status=status.HTTP_404_NOT_FOUND)
+        return progress_response(request, f'submission:{id}', 'Pending', lambda: self.finished_event(id))
+
+    def finished_event(self, id):
+        submission = Submission.objects.filter(pk=id).only(
+            'id', 'verdict', 'failed_test', 'execution_time', 'memory').first()
+        if submission is None or submission.verdict == 'Pending':
+            return None
+        return {
+            'type': 'done',
+            'status': submission.verdict,
+            'failed_test': submission.failed_test,
+            'execution_time': submission.execution_time,
+            'memory': submission.memory,
+        }
+
 class SubmissionDetailView(RetrieveAPIView):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
@@ -104,38 +233,72 @@ class CustomLoginView(APIView):
         }, status=status.HTTP_200_OK)
 
 class SolvedProblemView(generics.CreateAPIView):
+    """
+    Record that the signed-in user solved a problem. Judging already records
+    it on an Accepted verdict; this only confirms a solve backed by one of the
+    user's accepted submissions, since SolvedProblem rows feed the leaderboards.
+    """
     queryset = SolvedProblem.objects.all()
     serializer_class = SolvedProblemSerializer
-    permission_classes = [AllowAny]
+    permission_classes = [IsAuthenticated]
 
     def create(self, request, *args, **kwargs):
-        user = request.data.get('user')
         problem = request.data.get('problem_id') or request.data.get('problem')
-        if not user or not problem:
-            return Response({'error': 'user and problem_id are required'}, status=status.HTTP_400_BAD_REQUEST)
+        if not problem:
+            return Response({'error': 'problem_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+        accepted = Submission.objects.filter(user=request.user, problem_id=problem, verdict='Accepted')
+        if not accepted.exists():
+            return Response({'error': 'No accepted submission for this problem'}, status=status.HTTP_403_FORBIDDEN)
         # Prevent duplicates
-        obj, created = SolvedProblem.objects.get_or_create(user_id=user, problem_id=problem)
-        if created:
-            serializer = self.get_serializer(obj)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            serializer = self.get_serializer(obj)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        obj, created = SolvedProblem.objects.get_or_create(user=request.user, problem_id=problem)
+        serializer = self.get_serializer(obj)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
-# If not already present, add a compile_result endpoint
-@api_view(['GET'])
-def compile_result(request, task_id):
-    # Dummy implementation, replace with your actual task result logic
-    # Example: fetch from Celery/Redis
-    # Here, just return a fake result for demonstration
-    # Replace this with your actual result fetching logic
-    import random
-    import time
-    # Simulate a finished task
-    return Response({
-        'status': 'SUCCESS',
-        'results': [
-            {'output': 'Sample output', 'expected_output': 'Sample output', 'passed': True},
-            {'output': 'Sample output', 'expected_output': 'Sample output', 'passed': True},
-        ]
-    })
\ No newline at end of file
+class LeaderboardView(APIView):
+    """
+    Top users by problems solved. ?scope=global (default), university or year,
+    with ?value=<university or year of passing> for the last two; ?limit= up to 200.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        scope = request.query_params.get('scope', 'global')
+        if scope not in leaderboard.SCOPES:
+            return Response({'error': f'scope must be one of {", ".join(leaderboard.SCOPES)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        value = request.query_params.get('value', '').strip()
+        if scope != 'global' and not value:
+            return Response({'error': 'value is required for this scope'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = request.query_params.get('limit', '50')
+        if not limit.isdigit() or not 1 <= int(limit) <= 200:
+            return Response({'error': 'limit must be between 1 and 200'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = leaderboard.top(scope, value, int(limit))
+        except Exception:
+            return Response({'error': 'Leaderboard unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'scope': scope, 'value': value or None, 'results': results})
+
+class LeaderboardRankView(APIView):
+    """
+    A user's rank on the global, university and year boards; ?user=me (default) or a user id
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        user_param = request.query_params.get('user', 'me')
+        if user_param == 'me':
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            user = request.user
+        elif user_param.isdigit():
+            user = User.objects.filter(pk=int(user_param)).only(
+                'id', 'username', 'university', 'year_of_passing').first()
+            if user is None:
+                return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            raise ValidationError({'user': 'Expected an id or "me"'})
+        try:
+            ranks = leaderboard.user_ranks(user)
+        except Exception:
+            return Response({'error': 'Leaderboard unavailable'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'user_id': user.pk, 'username': user.username, **ranks})
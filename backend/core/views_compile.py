@@ -1,7 +1,8 @@
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 import json
@@ -9,52 +10,26 @@ import tempfile
 import os
 import time
 from kubernetes import client, config
-from threading import Lock
 import shlex
 import traceback
 import shutil
 import subprocess
 import getpass
 from core.tasks import run_code_job
+from core.limiter import acquire_execution_slot, release_execution_slot
+from core.progress import progress_response, EventStreamRenderer
+from core.jobs import new_job_id
+from core.languages import get_language
 from celery.result import AsyncResult
 from django.conf import settings
+import logging
 
-LANGUAGE_CONFIG = {
-    'python': {
-        'image': 'python:3.10-slim',
-        'run_cmd': 'python /code/user_code.py',
-        'file_name': 'user_code.py',
-    },
-    'cpp': {
-        'image': 'gcc:latest',
-        'run_cmd': 'g++ /code/user_code.cpp -o /code/a.out && /code/a.out',
-        'file_name': 'user_code.cpp',
-    },
-    'java': {
-        'image': 'openjdk:latest',
-        'run_cmd': 'javac /code/UserCode.java && java -cp /code UserCode',
-        'file_name': 'UserCode.java',
-    },
-}
+logger = logging.getLogger(__name__)
 
-# Simple in-memory rate limiter (per-process, not distributed)
-RATE_LIMIT = 20  # max concurrent jobs
-active_jobs = 0
-rate_limit_lock = Lock()
-
-def acquire_job_slot():
-    global active_jobs
-    with rate_limit_lock:
-        if active_jobs >= RATE_LIMIT:
-            return False
-        active_jobs += 1
-        return True
-
-def release_job_slot():
-    global active_jobs
-    with rate_limit_lock:
-        if active_jobs > 0:
-            active_jobs -= 1
+def too_many_executions():
+    response = JsonResponse({'error': 'Too many concurrent executions, please retry shortly'}, status=429)
+    response['Retry-After'] = str(settings.EXECUTION_RETRY_AFTER)
+    return response
 
 @csrf_exempt
 @api_view(['POST'])
@@ -66,63 +41,65 @@ def compile_code(request):
         language = data.get('language')
         code = data.get('code')
         stdin = data.get('input', '')
-        config_obj = LANGUAGE_CONFIG.get(language.lower())
-        if not config_obj:
+        if get_language(language) is None:
             return JsonResponse({'error': 'Unsupported language'}, status=400)
-        # Use Minikube shared folder for all code files on Windows
-        if os.name == 'nt':
-            import getpass
-            user = getpass.getuser()
-            shared_base = f'C:/Users/{user}/.minikube/files/code'
-        else:
-            shared_base = '/tmp/code'
-        os.makedirs(shared_base, exist_ok=True)
-        job_name = f"oj-job-{int(time.time()*1000)}"
-        shared_dir = f'{shared_base}/{job_name}'
-        os.makedirs(shared_dir, exist_ok=True)
-        code_path = f'{shared_dir}/user_code.py' if language.lower() == 'python' else (
-            f'{shared_dir}/user_code.cpp' if language.lower() == 'cpp' else f'{shared_dir}/UserCode.java')
-        with open(code_path, 'w') as f:
-            f.write(code)
-        input_path = f'{shared_dir}/input.txt'
-        with open(input_path, 'w') as f:
-            f.write(stdin)
+        # Source and input travel in the task message; the executor writes them
+        # into its own workspace (core.workspace), never on the web tier
+
+        # Also the Celery task id, so the job is traceable from the response onwards
+        job_id = new_job_id()
+
         # Check if we should use Celery or run synchronously
         use_celery = os.environ.get('USE_CELERY', 'false').lower() == 'true'
         
+        # Global and per-user backpressure shared by all processes
+        lease = acquire_execution_slot(request.user.id)
+        if lease is None:
+            return too_many_executions()
+        
         if use_celery:
-            # Submit to Celery, passing the shared_dir
-            task = run_code_job.delay(language, code, stdin, shared_dir)
+            # Submit to Celery; the task releases the slot
+            try:
+                task = run_code_job.apply_async((language, code, stdin), {'lease': lease}, task_id=job_id)
+            except Exception:
+                release_execution_slot(lease)
+                raise
+            logger.info('Queued %s job %s', language, task.id)
             return JsonResponse({'task_id': task.id, 'status': 'PENDING'})
         else:
             # Run synchronously (better for Render)
             try:
-                result = run_code_job(language, code, stdin, shared_dir)
-                return JsonResponse({'task_id': f'sync-{int(time.time()*1000)}', 'status': 'SUCCESS', 'result': result})
+                result = run_code_job(language, code, stdin)
+                return JsonResponse({'task_id': f'sync-{job_id}', 'status': 'SUCCESS', 'result': result})
             except Exception as e:
-                return JsonResponse({'task_id': f'sync-{int(time.time()*1000)}', 'status': 'FAILURE', 'error': str(e)})
+                return JsonResponse({'task_id': f'sync-{job_id}', 'status': 'FAILURE', 'error': str(e)})
+            finally:
+                release_execution_slot(lease)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+def finished_task_event(task_id):
+    """
+    Final progress event of a Celery run from the result backend, or None while it runs
+    """
+    result = AsyncResult(task_id)
+    if result.state == 'SUCCESS':
+        return {'type': 'done', 'status': 'SUCCESS', 'result': result.result}
+    if result.state == 'FAILURE':
+        return {'type': 'done', 'status': 'FAILURE', 'error': str(result.result)}
+    return None
+
 @csrf_exempt
 @api_view(['GET'])
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
 def compile_result(request, task_id):
-    try:
-        # Check if this is a synchronous task
-        if task_id.startswith('sync-'):
-            return JsonResponse({'error': 'Synchronous tasks are completed immediately'}, status=400)
-        
-        # Handle Celery tasks
-        result = AsyncResult(task_id)
-        if result.state == 'PENDING':
-            return JsonResponse({'status': 'PENDING'})
-        elif result.state == 'SUCCESS':
-            return JsonResponse({'status': 'SUCCESS', 'result': result.result})
-        elif result.state == 'FAILURE':
-            return JsonResponse({'status': 'FAILURE', 'error': str(result.result)})
-        else:
-            return JsonResponse({'status': result.state})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
+    """
+    State of a Celery run. ?wait=<seconds> blocks until the run publishes
+    something new (after ?after=<seq>); `Accept: text/event-stream` streams
+    the events instead. See core.progress.
+    """
+    if task_id.startswith('sync-'):
+        return JsonResponse({'error': 'Synchronous tasks are completed immediately'}, status=400)
+    return progress_response(request, f'task:{task_id}', 'PENDING', lambda: finished_task_event(task_id))
@@ -0,0 +1,147 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+
+def _default_root():
+    if os.name == 'nt':
+        # Minikube's shared folder, mounted into the cluster node
+        return os.path.join(os.path.expanduser('~'), '.minikube', 'files', 'code')
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm/algozen'
+    return os.path.join(tempfile.gettempdir(), 'algozen')
+
+
+# Scratch directories for executions (source, input, output, compiled
+# program). They live under WORKSPACE_ROOT, by default on the memory-backed
+# /dev/shm when there is one, so runs never touch the disk. Each process keeps
+# up to WORKSPACE_POOL_SIZE slot directories and hands them out again once
+# emptied; extra concurrent workspaces are created and removed on demand.
+# A workspace is always emptied when its `with workspace()` block exits, and
+# slots left behind by dead processes are swept when a pool starts.
+# Workspaces are grouped per host under WORKSPACE_ROOT, so worker pods that
+# share a node directory never sweep each other's. In Kubernetes Job mode the
+# workspace is mounted into the runner pod as a hostPath, so WORKSPACE_ROOT
+# must be the same path on the node and in the worker.
+WORKSPACE_ROOT = os.environ.get('WORKSPACE_ROOT') or _default_root()
+WORKSPACE_POOL_SIZE = int(os.environ.get('WORKSPACE_POOL_SIZE', 8))
+# Readable by Kubernetes runner pods, which use their own uid
+WORKSPACE_MODE = 0o755
+
+
+def _make_writable(function, path, excinfo):
+    # Programs may leave read-only files or directories behind
+    os.chmod(os.path.dirname(path), stat.S_IRWXU)
+    if os.path.isdir(path) and not os.path.islink(path):
+        os.chmod(path, stat.S_IRWXU)
+    function(path)
+
+
+def _clear(path):
+    """
+    Remove everything inside path, keeping path itself
+    """
+    os.chmod(path, WORKSPACE_MODE)
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, onerror=_make_writable)
+        else:
+            os.remove(entry.path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkspacePool:
+    def __init__(self, root=WORKSPACE_ROOT, size=WORKSPACE_POOL_SIZE):
+        self.root = os.path.join(root, socket.gethostname())
+        self.size = size
+        self.pid = os.getpid()
+        self._idle = []
+        self._slots = 0
+        self._serial = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, mode=WORKSPACE_MODE, exist_ok=True)
+        self.sweep()
+
+    def sweep(self):
+        """
+        Remove slots and workspaces of processes that are gone
+        """
+        for entry in os.scandir(self.root):
+            owner = entry.name.split('-', 1)[0]
+            if entry.is_dir() and owner.isdigit() and not _pid_alive(int(owner)):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def acquire(self):
+        """
+        An empty directory for one execution; give it back with release()
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._slots < self.size:
+                self._slots += 1
+                self._serial += 1
+                path = os.path.join(self.root, f'{self.pid}-slot-{self._serial}')
+                os.makedirs(path, exist_ok=True)
+                _clear(path)
+                return path
+        path = tempfile.mkdtemp(prefix=f'{self.pid}-extra-', dir=self.root)
+        os.chmod(path, WORKSPACE_MODE)
+        return path
+
+    def release(self, path):
+        is_slot = os.path.basename(path).startswith(f'{self.pid}-slot-')
+        if is_slot:
+            try:
+                _clear(path)
+            except OSError:
+                # Could not be emptied; retire it and let the pool make a new one
+                shutil.rmtree(path, ignore_errors=True)
+                with self._lock:
+                    self._slots -= 1
+                return
+            with self._lock:
+                self._idle.append(path)
+        else:
+            shutil.rmtree(path, onerror=_make_writable)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_workspace_pool():
+    """
+    Workspace pool of this process (Celery forks get their own)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = WorkspacePool()
+        return _pool
+
+
+@contextmanager
+def workspace():
+    """
+    Empty scratch directory for the duration of the block
+    """
+    pool = get_workspace_pool()
+    path = pool.acquire()
+    try:
+        yield path
+    finally:
+        pool.release(path)
@@ -1,5 +1,51 @@
 #!/bin/bash
 
 # Start Celery worker
+#
+# CELERY_WORKER_PROFILE selects which queues this worker serves:
+#   interactive - /api/compile/ runs users are waiting on
+#   judge       - graded submissions
+#   rejudge     - bulk rejudges
+#   all         - every queue, interactive first (default; development only,
+#                 interactive runs can wait behind judging on it)
+#   beat        - the periodic task scheduler (run exactly one)
+# CELERY_CONCURRENCY and CELERY_PREFETCH override the profile defaults.
 cd /app/backend
-celery -A backend worker --loglevel=info 
\ No newline at end of file
+
+PROFILE=${CELERY_WORKER_PROFILE:-all}
+if [ "$PROFILE" = "beat" ]; then
+  exec celery -A backend beat --loglevel=info
+fi
+case "$PROFILE" in
+  interactive)
+    QUEUES=interactive
+    CONCURRENCY=${CELERY_CONCURRENCY:-8}
+    ;;
+  judge)
+    QUEUES=judge
+    CONCURRENCY=${CELERY_CONCURRENCY:-4}
+    ;;
+  rejudge)
+    QUEUES=rejudge
+    CONCURRENCY=${CELERY_CONCURRENCY:-2}
+    ;;
+  all)
+    QUEUES=interactive,judge,rejudge
+    CONCURRENCY=${CELERY_CONCURRENCY:-4}
+    ;;
+  *)
+    echo "Unknown CELERY_WORKER_PROFILE: $PROFILE" >&2
+    exit 1
+    ;;
+esac
+PREFETCH=${CELERY_PREFETCH:-1}
+
+# Per-host runtime files are built here, before any task arrives, so no
+# submission waits for them; a failed build only means the slower fallback
+python manage.py build_runtimes || echo "build_runtimes failed, continuing without prebuilt runtimes" >&2
+
+exec celery -A backend worker --loglevel=info \
+  -Q "$QUEUES" \
+  -n "$PROFILE@%h" \
+  --concurrency "$CONCURRENCY" \
+  --prefetch-multiplier "$PREFETCH"
@@ -14,14 +14,14 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
-from core.tasks import run_code_job_subprocess, run_code_job_kubernetes
+from core.executors import run_code, get_executor
 
 def test_subprocess_mode():
     """Test subprocess execution mode"""
     print("Testing Subprocess Mode...")
     
     # Test Python code
-    result = run_code_job_subprocess('python', 'print("Hello from subprocess!")', '', '/tmp')
+    result = run_code('python', 'print("Hello from subprocess!")', '', get_executor('subprocess'))
     print(f"Python result: {result}")
     
     # Test C++ code
@@ -32,7 +32,7 @@ int main() {
     return 0;
 }
 '''
-    result = run_code_job_subprocess('cpp', cpp_code, '', '/tmp')
+    result = run_code('cpp', cpp_code, '', get_executor('subprocess'))
     print(f"C++ result: {result}")
 
 def test_kubernetes_mode():
@@ -40,7 +40,7 @@ def test_kubernetes_mode():
     print("\nTesting Kubernetes Mode...")
     
     try:
-        result = run_code_job_kubernetes('python', 'print("Hello from Kubernetes!")', '', '/tmp')
+        result = run_code('python', 'print("Hello from Kubernetes!")', '', get_executor('kubernetes-job'))
         print(f"Kubernetes result: {result}")
     except Exception as e:
         print(f"Kubernetes test failed (expected without k8s cluster): {e}")
@@ -52,12 +52,12 @@ def test_hybrid_switch():
     # Test with USE_KUBERNETES=false
     os.environ['USE_KUBERNETES'] = 'false'
     from core.tasks import run_code_job
-    result = run_code_job('python', 'print("Hybrid test - subprocess")', '', '/tmp')
+    result = run_code_job('python', 'print("Hybrid test - subprocess")', '')
     print(f"Hybrid (subprocess) result: {result}")
     
     # Test with USE_KUBERNETES=true (will fall back to subprocess if k8s not available)
     os.environ['USE_KUBERNETES'] = 'true'
-    result = run_code_job('python', 'print("Hybrid test - kubernetes")', '', '/tmp')
+    result = run_code_job('python', 'print("Hybrid test - kubernetes")', '')
     print(f"Hybrid (kubernetes) result: {result}")
 
 if __name__ == "__main__":